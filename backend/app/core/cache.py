@@ -0,0 +1,143 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class TTLCache:
+    """Small in-process cache with per-entry expiry and an LRU size bound.
+
+    With ``persist_path`` the entries can be saved to and restored from a JSON file,
+    in which case keys must be strings and values JSON-serializable.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024, persist_path: Optional[Union[str, Path]] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+        if self.persist_path:
+            self.load()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return default
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def load(self) -> None:
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            with open(self.persist_path, 'r') as f:
+                stored = json.load(f)
+            now = time.time()
+            # Stored oldest-first, so insertion order reproduces the LRU order
+            for key, expires_at, value in stored:
+                if expires_at >= now:
+                    self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"Loaded {len(self._entries)} cache entries from {self.persist_path}")
+        except Exception as e:
+            logger.error(f"Could not load cache from {self.persist_path}: {e}")
+
+    def snapshot(self) -> List[list]:
+        """Live entries as ``[key, expires_at, value]``, oldest first.
+
+        Take it on the event loop: ``get()`` and ``set()`` reorder the entries, so a
+        thread must not iterate them while requests are being served.
+        """
+        now = time.time()
+        return [[key, expires_at, value] for key, (expires_at, value) in list(self._entries.items()) if expires_at >= now]
+
+    def save(self, stored: Optional[List[list]] = None) -> None:
+        """Write ``stored`` (default: a fresh ``snapshot()``) to ``persist_path``.
+
+        Blocking; from async code take the snapshot first and pass it to a thread.
+        """
+        if not self.persist_path:
+            return
+        try:
+            if stored is None:
+                stored = self.snapshot()
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix(self.persist_path.suffix + ".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            logger.error(f"Could not persist cache to {self.persist_path}: {e}")
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one in-flight computation.
+
+    The computation runs in its own task, so the caller that started it can go away
+    (client disconnect) without failing the others; it is only cancelled once every
+    caller waiting on it has been cancelled.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+
+        flight.waiters += 1
+        try:
+            # Shield so a cancelled caller does not cancel the shared work
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Nobody is left to use the answer
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -8,10 +8,102 @@ class Settings(BaseSettings):
     PEXELS_API_KEY: str = ""
     GEMINI_API_KEY: str = ""
     
+    # Overridable so benchmarks and tests can point providers at local stand-ins
+    UNSPLASH_BASE_URL: str = "https://api.unsplash.com"
+    PEXELS_BASE_URL: str = "https://api.pexels.com/v1"
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    GEMINI_API_ENDPOINT: str = "generativelanguage.googleapis.com"
+    
     MODEL_NAME: str = "gpt-4o"
+    GEMINI_VISION_MODEL: str = "gemini-2.5-flash"
+    
+    # Vision provider for analysis: openai | gemini | hedged. "hedged" sends each batch
+    # to the primary and, once it runs past the primary's AI_HEDGE_PERCENTILE latency
+    # (or fails), to the secondary too; the first valid answer wins.
+    AI_PROVIDER: str = "openai"
+    AI_HEDGE_PRIMARY: str = "openai"
+    AI_HEDGE_SECONDARY: str = "gemini"
+    AI_HEDGE_PERCENTILE: float = 95
+    AI_HEDGE_MIN_SAMPLES: int = 20  # below this, wait AI_HEDGE_DEFAULT_DELAY_SECONDS
+    AI_HEDGE_DEFAULT_DELAY_SECONDS: float = 10
+    AI_HEDGE_WINDOW: int = 200  # recent batches per provider the percentile is taken over
     MAX_IMAGE_SIZE: tuple = (1024, 1024)
     MAX_IMAGES_DOWNLOAD: int = 50
     DOWNLOAD_TIMEOUT: int = 30
+    MAX_GUIDELINE_SIZE_MB: int = 50
+    OPENAI_STRUCTURED_OUTPUT: bool = True
+    AI_HTTP_MAX_CONNECTIONS: int = 20
+
+    # How images are encoded for the vision APIs: "<jpeg|webp>-<max edge>-q<quality>",
+    # plus "-444"/"-422" for JPEG chroma subsampling (default 4:2:0), e.g. "webp-512-q70".
+    # Empty picks the provider's default for its detail level (see payload_profiles).
+    # Compare candidates with `python -m benchmarks.bench_payload_profiles`.
+    OPENAI_IMAGE_DETAIL: str = "low"  # low | high | auto
+    OPENAI_PAYLOAD_PROFILE: str = ""
+    GEMINI_PAYLOAD_PROFILE: str = ""
+    
+    # Near-duplicate images are rated once and share the rating
+    DEDUP_ENABLED: bool = True
+    DEDUP_HASH_ALGORITHM: str = "dhash"  # dhash | phash
+    DEDUP_MAX_DISTANCE: int = 6  # Hamming distance out of 64 bits
+    
+    # Local pre-scoring: images estimated below the threshold (or outside the top K)
+    # get a local score instead of a paid rating. 0 disables either limit. Off by
+    # default: the colour/brightness estimate has not been validated against model scores.
+    PRESCORE_MIN_SCORE: float = 0
+    PRESCORE_TOP_K: int = 0
+    PRESCORE_MIN_SIDE_PX: int = 300
+    
+    # Retries of upstream calls: exponential backoff with full jitter (or the server's
+    # Retry-After, up to RETRY_MAX_RETRY_AFTER_SECONDS), at most RETRY_BUDGET_PER_JOB
+    # retries across a whole job
+    RETRY_BASE_DELAY_SECONDS: float = 1
+    RETRY_MAX_DELAY_SECONDS: float = 20
+    RETRY_MAX_RETRY_AFTER_SECONDS: float = 60
+    RETRY_BUDGET_PER_JOB: int = 20
+    IMAGE_PROVIDER_MAX_ATTEMPTS: int = 3
+    # After this many consecutive outage-type failures an upstream is failed fast
+    # for CIRCUIT_RESET_SECONDS, then a single trial call decides
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30
+    
+    URL_CHECK_TIMEOUT_SECONDS: float = 3
+    URL_CHECK_CONCURRENCY: int = 10
+    URL_CHECK_TTL_SECONDS: int = 3600
+    URL_CHECK_NEGATIVE_TTL_SECONDS: int = 300
+    
+    # Where job images, guidelines and results live: local | memory | s3
+    STORAGE_PROVIDER: str = "local"
+    STORAGE_IO_WORKERS: int = 8
+    
+    # S3-compatible object storage (AWS, MinIO, R2...), path-style addressing
+    S3_ENDPOINT_URL: str = "https://s3.amazonaws.com"
+    S3_BUCKET: str = ""
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_KEY_PREFIX: str = ""
+    S3_MAX_CONNECTIONS: int = 32
+    S3_TIMEOUT_SECONDS: float = 60
+    S3_MULTIPART_THRESHOLD_MB: int = 16
+    S3_MULTIPART_PART_SIZE_MB: int = 8  # S3 requires at least 5 MB
+    S3_MULTIPART_CONCURRENCY: int = 4
+    S3_PRESIGN_EXPIRES_SECONDS: int = 3600
+    
+    # data/ quota: the compactor evicts least-recently-used jobs once usage passes
+    # the high watermark, down to the low watermark
+    STORAGE_QUOTA_GB: float = 20
+    STORAGE_HIGH_WATERMARK: float = 0.9
+    STORAGE_LOW_WATERMARK: float = 0.7
+    STORAGE_COMPACT_INTERVAL_SECONDS: int = 300
+    STORAGE_MIN_IDLE_SECONDS: int = 900
+    
+    # SQLite index of every rating, for queries across jobs (relative to the project root)
+    RESULTS_CATALOG_PATH: str = "data/results/catalog.db"
+    
+    INSPIRATION_CACHE_TTL_SECONDS: int = 86400
+    INSPIRATION_CACHE_MAX_ENTRIES: int = 256
+    INSPIRATION_CACHE_PATH: str = "data/cache/inspiration.json"
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,48 @@
+import asyncio
+import aiohttp
+from typing import Dict, Tuple
+from .config import get_settings
+
+# One pool per kind of traffic, so large storage transfers never hold the
+# connections AI batches are waiting for (and vice versa)
+_sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+
+class _ClientResponse(aiohttp.ClientResponse):
+    """Never pools a connection whose response was abandoned.
+
+    aiohttp 3.9 hands the connection back to the pool when a request is cancelled
+    while waiting for the reply; the next request on it then reads that late reply
+    as its own. Hedged AI batches cancel the losing request on purpose.
+    """
+
+    def close(self) -> None:
+        if self._connection is not None and self._connection.protocol is not None:
+            self._connection.protocol.force_close()
+        super().close()
+
+def _pool_limit(pool: str) -> int:
+    settings = get_settings()
+    return settings.S3_MAX_CONNECTIONS if pool == "storage" else settings.AI_HTTP_MAX_CONNECTIONS
+
+def get_http_session(pool: str = "ai") -> aiohttp.ClientSession:
+    """Pooled session for outbound calls, so requests reuse warm connections.
+
+    Created lazily on the running loop (and again if the loop changes, e.g. between
+    benchmark runs); callers set per-request timeouts.
+    """
+    loop = asyncio.get_running_loop()
+    session, session_loop = _sessions.get(pool, (None, None))
+    if session is None or session.closed or session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=_pool_limit(pool),
+            ttl_dns_cache=300
+        )
+        session = aiohttp.ClientSession(connector=connector, response_class=_ClientResponse)
+        _sessions[pool] = (session, loop)
+    return session
+
+async def close_http_session() -> None:
+    for session, _ in list(_sessions.values()):
+        if not session.closed:
+            await session.close()
+    _sessions.clear()
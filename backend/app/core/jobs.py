@@ -0,0 +1,66 @@
+"""Running download/analysis jobs, so they can be cancelled or given a deadline.
+
+Cancelling a job cancels its task: the CancelledError unwinds through whatever the
+job is awaiting (an HTTP request, a storage write, a batch backoff), which closes
+the connection instead of paying for a response nobody will read. Services record
+what they had finished with ``record_completed`` before re-raising, and the job's
+route reports it.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Coroutine, Dict, Optional
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class JobControl:
+    def __init__(self, job_id: str, task: asyncio.Task, deadline_seconds: Optional[float] = None):
+        self.job_id = job_id
+        self.task = task
+        self.reason: Optional[str] = None  # "cancelled" or "deadline" once cancel() was called
+        self.completed: Optional[Dict[str, Any]] = None
+        self.deadline_at = time.time() + deadline_seconds if deadline_seconds else None
+        self._timer = None
+        if deadline_seconds:
+            self._timer = asyncio.get_running_loop().call_later(deadline_seconds, self.cancel, "deadline")
+        task.add_done_callback(self._finished)
+
+    @property
+    def running(self) -> bool:
+        return not self.task.done()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the job's task; False if it already finished or is being cancelled."""
+        if not self.running or self.reason is not None:
+            return False
+        logger.info(f"Job {self.job_id}: {reason}, cancelling")
+        self.reason = reason
+        self.task.cancel()
+        return True
+
+    def _finished(self, task: asyncio.Task) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+
+_jobs = TTLCache(ttl=24 * 3600, max_entries=500)
+# Strong references: the event loop only keeps weak ones to running tasks
+_tasks = set()
+
+def start_job(job_id: str, coro: Coroutine, deadline_seconds: Optional[float] = None) -> JobControl:
+    """Run ``coro`` as the job's task, cancelled after ``deadline_seconds`` if given."""
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    control = JobControl(job_id, task, deadline_seconds)
+    _jobs.set(job_id, control)
+    return control
+
+def find_job(job_id: str) -> Optional[JobControl]:
+    return _jobs.get(job_id)
+
+def record_completed(job_id: str, result: Dict[str, Any]) -> None:
+    """What a cancelled job had finished, for its route to report."""
+    control = find_job(job_id)
+    if control is not None:
+        control.completed = result
@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+
+# Network-bound stages: from tens of milliseconds up to the 45s batch timeout
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 120)
+# CPU-bound per-image work
+CPU_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000, 25_000_000)
+# Encoded images sent to the vision APIs
+PAYLOAD_BUCKETS = (5_000, 10_000, 20_000, 40_000, 60_000, 100_000, 200_000, 500_000, 1_000_000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+PROVIDER_SEARCH_SECONDS = Histogram(
+    "image_provider_search_seconds", "Latency of image provider search requests",
+    ["provider", "outcome"], buckets=LATENCY_BUCKETS
+)
+IMAGE_DOWNLOAD_SECONDS = Histogram(
+    "image_download_seconds", "Latency of a single image download, including the write to disk",
+    ["provider", "outcome"], buckets=LATENCY_BUCKETS
+)
+IMAGE_DOWNLOAD_BYTES = Histogram(
+    "image_download_bytes", "Size of downloaded images",
+    ["provider"], buckets=SIZE_BUCKETS
+)
+IMAGE_PREPROCESS_SECONDS = Histogram(
+    "image_preprocess_seconds", "Time to decode, resize and encode one image for analysis",
+    ["outcome"], buckets=CPU_BUCKETS
+)
+IMAGE_PAYLOAD_BYTES = Histogram(
+    "image_payload_bytes", "Encoded size of one image sent for analysis (before base64), per payload profile",
+    ["profile"], buckets=PAYLOAD_BUCKETS
+)
+
+AI_REQUEST_SECONDS = Histogram(
+    "ai_request_seconds", "Latency of one vision API request (one batch attempt)",
+    ["provider", "outcome"], buckets=LATENCY_BUCKETS
+)
+AI_RETRIES_TOTAL = Counter(
+    "ai_batch_retries_total", "Batch attempts that were retried",
+    ["provider"]
+)
+AI_BATCHES_TOTAL = Counter(
+    "ai_batches_total", "Batches processed, by final outcome",
+    ["provider", "outcome"]
+)
+AI_BATCH_SECONDS = Histogram(
+    "ai_batch_seconds", "Latency of one batch including its retries, per provider",
+    ["provider", "outcome"], buckets=LATENCY_BUCKETS
+)
+AI_HEDGED_BATCHES_TOTAL = Counter(
+    "ai_hedged_batches_total", "Batches also sent to the secondary provider, by which one answered first",
+    ["primary", "secondary", "winner"]
+)
+AI_BATCH_TOKENS = Histogram(
+    "ai_batch_tokens", "Tokens used per successful batch",
+    ["provider", "kind"], buckets=TOKEN_BUCKETS
+)
+AI_TOKENS_TOTAL = Counter(
+    "ai_tokens_total", "Tokens used across all batches",
+    ["provider", "kind"]
+)
+
+UPSTREAM_RETRIES_TOTAL = Counter(
+    "upstream_retries_total", "Retried upstream calls (AI and image providers), by status or error type",
+    ["upstream", "reason"]
+)
+RETRY_BUDGET_EXHAUSTED_TOTAL = Counter(
+    "retry_budget_exhausted_total", "Retries skipped because the job had spent its retry budget",
+    ["upstream"]
+)
+CIRCUIT_BREAKER_OPEN = Gauge("circuit_breaker_open", "1 while the upstream's circuit is open", ["upstream"])
+CIRCUIT_BREAKER_REJECTED_TOTAL = Counter(
+    "circuit_breaker_rejected_total", "Calls failed fast because the upstream's circuit was open",
+    ["upstream"]
+)
+
+WEBSOCKET_CONNECTIONS = Gauge("websocket_connections", "Open job websocket connections")
+WEBSOCKET_QUEUE_DEPTH = Gauge(
+    "websocket_queue_depth", "Websocket messages waiting to be sent to clients"
+)
+
+JOBS_QUEUED = Gauge("jobs_queued", "Jobs accepted but not started yet", ["type"])
+JOBS_ACTIVE = Gauge("jobs_active", "Jobs currently running", ["type"])
+JOBS_CANCELLED_TOTAL = Counter(
+    "jobs_cancelled_total", "Jobs stopped by a cancel request or their deadline", ["type", "reason"]
+)
+
+STORAGE_BYTES = Gauge("storage_bytes", "Bytes used under data/, by entry kind", ["kind"])
+STORAGE_EVICTIONS_TOTAL = Counter("storage_evictions_total", "Entries evicted by the storage compactor", ["kind"])
+STORAGE_EVICTED_BYTES_TOTAL = Counter(
+    "storage_evicted_bytes_total", "Bytes freed by the storage compactor", ["kind"]
+)
+
+def record_usage(provider: str, usage: dict) -> None:
+    for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        value = usage.get(kind, 0)
+        if value:
+            AI_BATCH_TOKENS.labels(provider, kind).observe(value)
+            AI_TOKENS_TOTAL.labels(provider, kind).inc(value)
+
+@contextmanager
+def track_job(job_type: str):
+    """Move a job from queued to active for the duration of the block."""
+    JOBS_QUEUED.labels(job_type).dec()
+    JOBS_ACTIVE.labels(job_type).inc()
+    try:
+        yield
+    finally:
+        JOBS_ACTIVE.labels(job_type).dec()
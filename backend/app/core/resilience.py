@@ -0,0 +1,225 @@
+"""Retry policy shared by the AI and image providers.
+
+Only transient failures are retried (timeouts, connection errors, 408/425/429 and
+5xx), with exponential backoff and full jitter, or after the server's Retry-After.
+Retries across one job draw from a shared budget, and each upstream has a circuit
+breaker that fails calls fast while the upstream looks down instead of letting every
+job wait out its own timeouts.
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+import aiohttp
+from .cache import TTLCache
+from .config import get_settings
+from .metrics import (
+    CIRCUIT_BREAKER_OPEN, CIRCUIT_BREAKER_REJECTED_TOTAL, RETRY_BUDGET_EXHAUSTED_TOTAL, UPSTREAM_RETRIES_TOTAL
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+class UpstreamError(Exception):
+    """A failed upstream call, classified for the retry policy.
+
+    ``retryable`` defaults to whether ``status`` is worth another attempt; ``outage``
+    (counts toward the circuit breaker) to whether it is a 5xx. A 429 is retryable
+    but not an outage: the upstream is up, just asking us to slow down.
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: Optional[bool] = None, outage: Optional[bool] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        if retryable is None:
+            retryable = status is not None and (status in RETRYABLE_STATUSES or status >= 500)
+        if outage is None:
+            outage = status is not None and status >= 500
+        self.retryable = retryable
+        self.outage = outage
+
+class CircuitOpenError(Exception):
+    pass
+
+def classify(error: BaseException) -> Tuple[bool, bool]:
+    """(retryable, outage) for an exception raised by an upstream call."""
+    if isinstance(error, UpstreamError):
+        return error.retryable, error.outage
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return True, True
+    return False, False
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Delay before retry number ``attempt`` (1-based).
+
+    Full jitter spreads retries from many jobs instead of having them hit a
+    recovering upstream in lockstep; a Retry-After replaces the computed delay.
+    """
+    settings = get_settings()
+    if retry_after is not None:
+        return retry_after + random.uniform(0, settings.RETRY_BASE_DELAY_SECONDS)
+    ceiling = min(settings.RETRY_MAX_DELAY_SECONDS, settings.RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+class RetryBudget:
+    """Retries one job may spend across all of its upstream calls."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.spent = 0
+
+    def spend(self) -> bool:
+        if self.spent >= self.limit:
+            return False
+        self.spent += 1
+        return True
+
+_budgets = TTLCache(ttl=24 * 3600, max_entries=500)
+_current_budget: ContextVar[Optional[RetryBudget]] = ContextVar("retry_budget", default=None)
+
+def get_retry_budget(job_id: str) -> RetryBudget:
+    budget = _budgets.get(job_id)
+    if budget is None:
+        budget = RetryBudget(get_settings().RETRY_BUDGET_PER_JOB)
+        _budgets.set(job_id, budget)
+    return budget
+
+@contextmanager
+def job_retry_budget(job_id: Optional[str]):
+    """Charge retries made inside the block (and tasks it starts) to ``job_id``."""
+    token = _current_budget.set(get_retry_budget(job_id) if job_id else None)
+    try:
+        yield
+    finally:
+        _current_budget.reset(token)
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive outages.
+
+    While open, calls fail immediately. After ``reset_seconds`` one trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != "closed":
+            logger.info(f"Circuit for {self.name} closed")
+            self.state = "closed"
+            CIRCUIT_BREAKER_OPEN.labels(self.name).set(0)
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            logger.warning(f"Circuit for {self.name} opened after {self.failures} failures; "
+                           f"failing fast for {self.reset_seconds:.0f}s")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            CIRCUIT_BREAKER_OPEN.labels(self.name).set(1)
+
+    def release(self) -> None:
+        """The call ended without a verdict (cancelled); let another trial through."""
+        self._probing = False
+
+@lru_cache(maxsize=None)
+def get_circuit_breaker(upstream: str) -> CircuitBreaker:
+    settings = get_settings()
+    return CircuitBreaker(upstream, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+
+async def call_with_retries(upstream: str, operation: Callable[[], Awaitable[T]], max_attempts: int,
+                            on_retry: Optional[Callable[[int, BaseException, float], None]] = None) -> T:
+    """Run ``operation`` under ``upstream``'s circuit breaker, retrying transient failures.
+
+    Raises the last error when it is not retryable, attempts run out, the job's retry
+    budget is spent or Retry-After asks for more than RETRY_MAX_RETRY_AFTER_SECONDS;
+    raises CircuitOpenError without calling ``operation`` while the circuit is open.
+    """
+    settings = get_settings()
+    breaker = get_circuit_breaker(upstream)
+    for attempt in range(1, max_attempts + 1):
+        if not breaker.allow():
+            CIRCUIT_BREAKER_REJECTED_TOTAL.labels(upstream).inc()
+            raise CircuitOpenError(f"{upstream} is unavailable (circuit open), failing fast")
+        try:
+            result = await operation()
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            retryable, outage = classify(e)
+            if outage:
+                breaker.record_failure()
+            elif isinstance(e, UpstreamError) and e.status is not None and e.status < 500:
+                # The upstream answered; it is reachable even if it did not like the request
+                breaker.record_success()
+            else:
+                # No verdict on the upstream (e.g. a bug parsing its answer)
+                breaker.release()
+            if not retryable or attempt == max_attempts:
+                raise
+
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after is not None and retry_after > settings.RETRY_MAX_RETRY_AFTER_SECONDS:
+                raise
+            budget = _current_budget.get()
+            if budget is not None and not budget.spend():
+                RETRY_BUDGET_EXHAUSTED_TOTAL.labels(upstream).inc()
+                raise
+
+            delay = backoff_delay(attempt, retry_after)
+            UPSTREAM_RETRIES_TOTAL.labels(upstream, str(getattr(e, "status", None) or type(e).__name__)).inc()
+            if on_retry:
+                on_retry(attempt, e, delay)
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,104 @@
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from .cache import TTLCache
+
+# (trace, span) currently open in this task; asyncio copies it into child tasks.
+_current: ContextVar[Optional[Tuple["JobTrace", "Span"]]] = ContextVar("current_span", default=None)
+
+class Span:
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, start: float, attrs: Dict[str, Any]):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+class _NullSpan:
+    """Returned when no trace is active, so callers never have to check."""
+
+    def set(self, **attrs) -> None:
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class JobTrace:
+    """Span-style timings for one job, shared by its download and analysis stages."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        current = _current.get()
+        parent_id = current[1].span_id if current and current[0] is self else None
+        span = Span(next(self._ids), parent_id, name, time.perf_counter(), attrs)
+        self.spans.append(span)
+        token = _current.set((self, span))
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current.reset(token)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Waterfall-ready view: offsets from the job start, children after parents."""
+        now = time.perf_counter()
+        depth: Dict[int, int] = {}
+        spans = []
+        for span in self.spans:
+            depth[span.span_id] = depth.get(span.parent_id, -1) + 1 if span.parent_id else 0
+            end = span.end if span.end is not None else now
+            spans.append({
+                "id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "depth": depth[span.span_id],
+                "start_ms": round((span.start - self._origin) * 1000, 3),
+                "duration_ms": round((end - span.start) * 1000, 3),
+                "in_progress": span.end is None,
+                "attrs": span.attrs
+            })
+
+        total_ms = max((s["start_ms"] + s["duration_ms"] for s in spans), default=0.0)
+        return {
+            "job_id": self.job_id,
+            "started_at": self.started_at,
+            "total_ms": round(total_ms, 3),
+            "spans": spans
+        }
+
+_traces = TTLCache(ttl=24 * 3600, max_entries=500)
+
+def get_trace(job_id: str) -> JobTrace:
+    trace = _traces.get(job_id)
+    if trace is None:
+        trace = JobTrace(job_id)
+        _traces.set(job_id, trace)
+    return trace
+
+def find_trace(job_id: str) -> Optional[JobTrace]:
+    return _traces.get(job_id)
+
+@contextmanager
+def trace_span(name: str, **attrs):
+    """Open a child span in whatever job trace is active, or do nothing."""
+    current = _current.get()
+    if current is None:
+        yield _NULL_SPAN
+        return
+    with current[0].span(name, **attrs) as span:
+        yield span
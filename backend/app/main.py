@@ -1,12 +1,14 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 import os
 import asyncio
 import json
 import logging
 from typing import Dict, Set
 from pathlib import Path
-from .routes import images, guidelines, status, inspiration
+from .routes import images, guidelines, status, inspiration, results
+from .core.metrics import WEBSOCKET_CONNECTIONS, WEBSOCKET_QUEUE_DEPTH
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -31,6 +33,7 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
     if job_id not in connections:
         connections[job_id] = set()
     connections[job_id].add(websocket)
+    WEBSOCKET_CONNECTIONS.inc()
     
     try:
         while True:
@@ -44,27 +47,38 @@ async def websocket_endpoint(websocket: WebSocket, job_id: str):
         logger.error(f"WebSocket error for job {job_id}: {e}")
         if websocket in connections.get(job_id, set()):
             connections[job_id].remove(websocket)
+    finally:
+        WEBSOCKET_CONNECTIONS.dec()
 
 async def broadcast_to_job(job_id: str, message: dict):
     logger.info(f"Broadcasting to job {job_id}: {message}")
     if job_id in connections:
         disconnected = set()
-        for websocket in connections[job_id]:
+        targets = list(connections[job_id])
+        WEBSOCKET_QUEUE_DEPTH.inc(len(targets))
+        for websocket in targets:
             try:
                 await websocket.send_text(json.dumps(message))
                 logger.info(f"Message sent to WebSocket for job {job_id}")
             except Exception as e:
                 logger.error(f"Error sending message to WebSocket: {e}")
                 disconnected.add(websocket)
+            finally:
+                WEBSOCKET_QUEUE_DEPTH.dec()
         
         for websocket in disconnected:
-            connections[job_id].remove(websocket)
+            connections[job_id].discard(websocket)
     else:
         logger.warning(f"No connections found for job {job_id}")
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
 app.include_router(images.router, prefix="/api")
 app.include_router(guidelines.router, prefix="/api")
 app.include_router(status.router, prefix="/api")
+app.include_router(results.router, prefix="/api")
 app.include_router(inspiration.router, prefix="/api", tags=["inspiration"])
 
 @app.on_event("startup")
@@ -81,6 +95,18 @@ async def startup_event():
     (project_root / "data" / "results").mkdir(parents=True, exist_ok=True)
     
     logger.info(f"Directories created successfully in: {project_root / 'data'}")
+    
+    from .services.storage_quota import get_storage_quota
+    get_storage_quota().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from .services.url_checker import get_url_checker
+    from .core.http_client import close_http_session
+    from .services.storage_quota import get_storage_quota
+    await get_url_checker().close()
+    await close_http_session()
+    await get_storage_quota().stop()
 
 if __name__ == "__main__":
     import uvicorn
@@ -26,6 +26,9 @@ class UploadResponse(BaseModel):
     filename: str
     file_path: str
     message: str
+    content_hash: Optional[str] = None
+    size: Optional[int] = None
+    deduplicated: bool = False
 
 class HealthResponse(BaseModel):
     status: str
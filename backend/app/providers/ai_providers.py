@@ -1,41 +1,110 @@
 import asyncio
 import os
 import json
-import requests
+import aiohttp
+import orjson
 import gc
+import math
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Awaitable, Optional, AsyncIterable, AsyncIterator, Tuple
+from .prompt_compiler import PromptCompiler, CompiledPrompt
+from .payload_builder import build_json_body, image_part, inline_image_part
+from .payload_profiles import LEGACY_PROFILE, get_payload_profile, parse_profile
+from ..core.metrics import (
+    AI_REQUEST_SECONDS, AI_RETRIES_TOTAL, AI_BATCHES_TOTAL, AI_BATCH_SECONDS, AI_HEDGED_BATCHES_TOTAL, record_usage
+)
+from ..core.tracing import trace_span
+from ..core.http_client import get_http_session
+from ..core.resilience import UpstreamError, call_with_retries, classify, parse_retry_after
+from .rating_schema import (
+    GEMINI_RATINGS_SCHEMA, RATINGS_RESPONSE_FORMAT, RatingValidationError, parse_structured_ratings
+)
+
+# Callback invocado al terminar cada lote: (batch_num, total_batches, filenames, batch_result)
+BatchCallback = Callable[[int, int, List[str], Dict[str, Any]], Awaitable[None]]
+# Imagen lista para enviar: (filename, base64 JPEG en bytes)
+EncodedImage = Tuple[str, bytes]
+ImageStream = AsyncIterable[EncodedImage]
+
+class BatchFailedError(UpstreamError):
+    """Un intento de lote fallido, clasificado a partir de su diccionario de resultado."""
+    
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result.get('error', 'Unknown error'), status=result.get('status'),
+                         retry_after=result.get('retry_after'), retryable=result.get('retryable'),
+                         outage=result.get('outage'))
+        self.result = result
 
 class AIProvider(ABC):
+    # Cómo hay que codificar las imágenes que recibe (formato, tamaño, calidad)
+    payload_profile = parse_profile(LEGACY_PROFILE)
+    
     @abstractmethod
-    async def analyze_images(self, images_base64: List[str], prompt: str, job_id: str = None) -> Dict[str, Any]:
+    async def analyze_images(self, images: ImageStream, prompt: str, job_id: str = None,
+                             on_batch: Optional[BatchCallback] = None,
+                             total_images: Optional[int] = None) -> Dict[str, Any]:
         pass
 
-class OpenAIProvider(AIProvider):
-    def __init__(self):
-        from ..core.config import get_settings
-        self.settings = get_settings()
-        self.api_key = self.settings.OPENAI_API_KEY
-        self.base_url = "https://api.openai.com/v1/chat/completions"
-        
-        # Configuración optimizada para OpenAI
-        self.BATCH_SIZE = 2  # Solo 2 imágenes por request
-        self.TIMEOUT_PER_BATCH = 45  # 45s por lote
-        self.MAX_RETRIES = 3  # 3 intentos por lote
-        self.DELAY_BETWEEN_BATCHES = 2  # 2s entre requests
-        
-        print("OpenAI provider initialized with batch processing strategy")
+async def batched(images: ImageStream, size: int) -> AsyncIterator[List[EncodedImage]]:
+    """Agrupa el stream en lotes sin materializar más de ``size`` imágenes."""
+    batch = []
+    async for image in images:
+        batch.append(image)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class LatencyWindow:
+    """Latencias recientes de lotes de un proveedor, para decidir cuándo lanzar un hedge."""
+    
+    def __init__(self, size: int):
+        self.samples = deque(maxlen=size)
+    
+    def __len__(self) -> int:
+        return len(self.samples)
+    
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+    
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.samples)
+        index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+@lru_cache(maxsize=None)
+def get_latency_window(provider: str) -> LatencyWindow:
+    # Compartida entre jobs: los proveedores se instancian por análisis
+    from ..core.config import get_settings
+    return LatencyWindow(get_settings().AI_HEDGE_WINDOW)
+
+class BatchAIProvider(AIProvider):
+    """Proveedor que analiza el stream de imágenes en lotes.
+
+    Las subclases implementan ``_run_batch`` (cómo se obtiene el resultado de un
+    lote) y ajustan BATCH_SIZE y DELAY_BETWEEN_BATCHES.
+    """
+    name = "base"
+    BATCH_SIZE = 2
+    DELAY_BETWEEN_BATCHES = 2
+    structured_output = True
     
-    async def analyze_images(self, images_base64: List[str], prompt: str, job_id: str = None) -> Dict[str, Any]:
+    async def analyze_images(self, images: ImageStream, prompt: str, job_id: str = None,
+                             on_batch: Optional[BatchCallback] = None,
+                             total_images: Optional[int] = None) -> Dict[str, Any]:
+        """Analiza las imágenes por lotes a medida que llegan del stream.
+
+        ``images`` produce pares (filename, base64) codificados bajo demanda; solo se
+        mantienen en memoria el lote en vuelo y el siguiente. ``total_images`` es una
+        estimación para el progreso (las imágenes que fallan al codificarse no llegan).
+        """
         try:
-            print(f"Starting batch analysis with {len(images_base64)} images")
-            
-            if len(images_base64) <= self.BATCH_SIZE:
-                # Procesamiento simple para lotes pequeños - usar prompt original
-                return await self._process_single_batch(images_base64, prompt, None)
-            else:
-                # Procesamiento por lotes para conjuntos grandes - necesitamos info de archivos
-                return await self._process_images_in_batches(images_base64, prompt, job_id)
+            print(f"Starting batch analysis with {total_images if total_images is not None else '?'} images")
+            return await self._process_images_in_batches(images, prompt, job_id, on_batch, total_images)
                 
         except Exception as e:
             error_msg = f"Analysis Error: {str(e)}"
@@ -46,32 +115,48 @@ class OpenAIProvider(AIProvider):
                 'response': None
             }
     
-    async def _process_images_in_batches(self, images_base64: List[str], prompt: str, job_id: str = None) -> Dict[str, Any]:
-        """Procesa imágenes en lotes pequeños para maximizar confiabilidad"""
+    async def _process_images_in_batches(self, images: ImageStream, prompt: str, job_id: str = None,
+                                         on_batch: Optional[BatchCallback] = None,
+                                         total_images: Optional[int] = None) -> Dict[str, Any]:
+        """Procesa imágenes en lotes pequeños para maximizar confiabilidad.
+
+        El siguiente lote se codifica mientras el actual está en la API, así que la
+        memoria depende del tamaño de lote y no del número de imágenes del job.
+        Si se pasa ``on_batch``, se invoca con el resultado de cada lote en cuanto
+        llega, para que el llamador pueda publicar ratings parciales.
+        
+        Si el job se cancela (o vence su plazo), la petición en curso se aborta y
+        su conexión se cierra, y los lotes pendientes ni se codifican ni se envían.
+        """
+        from ..main import broadcast_to_job
+        
+        batches = batched(images, self.BATCH_SIZE)
+        next_batch = None
+        batch_num = 0
         try:
-            from ..main import broadcast_to_job
-            
-            total_images = len(images_base64)
-            total_batches = (total_images + self.BATCH_SIZE - 1) // self.BATCH_SIZE
+            total_batches = max(1, (total_images + self.BATCH_SIZE - 1) // self.BATCH_SIZE) if total_images else 1
             all_responses = []
-            all_usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            all_usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'cached_tokens': 0}
             
             print(f"Processing {total_images} images in {total_batches} batches of {self.BATCH_SIZE}")
             
-            # Extraer nombres de archivo del prompt original
-            image_filenames = self._extract_filenames_from_prompt(prompt)
-            
-            # Crear un prompt base simplificado
-            base_prompt = self._create_simplified_prompt(prompt)
+            # Prefijo estático (guías + tarea) renderizado una sola vez por job, idéntico
+            # byte a byte en todos los lotes para aprovechar el prompt caching del proveedor
+            compiled = PromptCompiler().compile(prompt, structured=self.structured_output)
+            print(f"Compiled prompt prefix {compiled.prefix_hash} ({len(compiled.prefix)} chars)")
             
-            for i in range(0, total_images, self.BATCH_SIZE):
-                batch_num = (i // self.BATCH_SIZE) + 1
-                batch = images_base64[i:i + self.BATCH_SIZE]
+            batch = await anext(batches, None)
+            while batch is not None:
+                batch_num += 1
+                total_batches = max(total_batches, batch_num)
+                # Codificar el lote siguiente en paralelo con la llamada a la API
+                next_batch = asyncio.create_task(anext(batches, None))
                 
-                # Obtener nombres de archivo para este lote
-                batch_filenames = image_filenames[i:i + self.BATCH_SIZE]
+                batch_filenames = [filename for filename, _ in batch]
+                batch_images = [img_b64 for _, img_b64 in batch]
+                batch = None
                 
-                print(f"Processing batch {batch_num}/{total_batches} with {len(batch)} images")
+                print(f"Processing batch {batch_num}/{total_batches} with {len(batch_images)} images")
                 print(f"Batch filenames: {batch_filenames}")
                 
                 # Actualizar progreso
@@ -85,11 +170,16 @@ class OpenAIProvider(AIProvider):
                         "message": f"Analyzing batch {batch_num}/{total_batches}..."
                     })
                 
-                # Crear prompt específico para este lote con nombres de archivo
-                batch_prompt = self._create_batch_prompt_with_filenames(base_prompt, batch_filenames)
+                # Solo la cola del prompt (lista de imágenes) cambia entre lotes
+                batch_tail = compiled.batch_tail(batch_filenames)
                 
-                # Procesar lote con reintentos usando prompt específico
-                batch_result = await self._process_batch_with_retries(batch, batch_prompt, batch_num)
+                # Procesar lote con reintentos
+                with trace_span("batch", batch=batch_num, images=len(batch_images)):
+                    batch_result = await self._run_batch(
+                        batch_images, batch_tail, batch_num, compiled, batch_filenames
+                    )
+                # Liberar el base64 del lote en cuanto se ha enviado
+                del batch_images
                 
                 if batch_result['success']:
                     all_responses.append(batch_result['response'])
@@ -104,13 +194,30 @@ class OpenAIProvider(AIProvider):
                     print(f"Batch {batch_num} failed: {batch_result.get('error', 'Unknown error')}")
                     # Continuar con el siguiente lote en caso de error
                 
+                # Entregar el resultado del lote sin esperar al resto
+                if on_batch:
+                    await on_batch(batch_num, total_batches, batch_filenames, batch_result)
+                
+                batch = await next_batch
+                next_batch = None
+                
                 # Pausa entre lotes para respetar rate limits
-                if batch_num < total_batches:
+                if batch is not None:
                     await asyncio.sleep(self.DELAY_BETWEEN_BATCHES)
                 
                 # Liberar memoria
                 gc.collect()
             
+            if batch_num == 0:
+                return {
+                    'success': False,
+                    'error': 'No valid images to process',
+                    'response': None
+                }
+            
+            if all_usage['prompt_tokens']:
+                print(f"Prompt cache: {all_usage['cached_tokens']}/{all_usage['prompt_tokens']} prompt tokens served from cache")
+            
             # Combinar todas las respuestas
             if all_responses:
                 combined_response = "\n\n".join(all_responses)
@@ -119,7 +226,8 @@ class OpenAIProvider(AIProvider):
                     'response': combined_response,
                     'usage': all_usage,
                     'batches_processed': len(all_responses),
-                    'total_batches': total_batches
+                    'total_batches': batch_num,
+                    'prompt_prefix_hash': compiled.prefix_hash
                 }
             else:
                 return {
@@ -128,125 +236,175 @@ class OpenAIProvider(AIProvider):
                     'response': None
                 }
                 
+        except asyncio.CancelledError:
+            print(f"Batch processing cancelled during batch {batch_num}")
+            raise
         except Exception as e:
             return {
                 'success': False,
                 'error': f"Batch processing error: {str(e)}",
                 'response': None
             }
+        finally:
+            if next_batch is not None:
+                next_batch.cancel()
+                await asyncio.gather(next_batch, return_exceptions=True)
+            await batches.aclose()
     
-    def _extract_filenames_from_prompt(self, prompt: str) -> List[str]:
-        """Extrae los nombres de archivo del prompt original"""
+    @abstractmethod
+    async def _run_batch(self, batch: List[bytes], prompt: str, batch_num: int,
+                         compiled: Optional[CompiledPrompt] = None,
+                         filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Resultado de un lote: {'success', 'response', 'usage'[, 'ratings']} o {'success': False, 'error'}."""
+
+class RetryingBatchAIProvider(BatchAIProvider):
+    """Proveedor por lotes que llama él mismo a la API, con reintentos.
+
+    Las subclases solo implementan ``_process_single_batch`` (una llamada HTTP para
+    un lote) y ajustan TIMEOUT_PER_BATCH y MAX_RETRIES además del tamaño de lote.
+    """
+    TIMEOUT_PER_BATCH = 45
+    MAX_RETRIES = 3
+    
+    async def _run_batch(self, batch: List[bytes], prompt: str, batch_num: int,
+                         compiled: Optional[CompiledPrompt] = None,
+                         filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """``_process_batch_with_retries`` cronometrado por proveedor.
+
+        Alimenta AI_BATCH_SECONDS y la ventana de latencias que usa el hedging. Un
+        lote cancelado (perdió la carrera) cuenta con el tiempo que llevaba: es una
+        cota inferior, y descartarlo haría que el percentil solo viera lotes rápidos.
+        """
+        started = time.perf_counter()
         try:
-            filenames = []
-            lines = prompt.split('\n')
-            
-            for line in lines:
-                # Buscar líneas que contengan nombres de archivo
-                if '.jpg' in line.lower():
-                    # Extraer nombre de archivo de líneas como "Image 1: filename.jpg"
-                    parts = line.split(':')
-                    if len(parts) > 1:
-                        filename_part = parts[1].strip()
-                        if '.jpg' in filename_part.lower():
-                            filenames.append(filename_part)
-                    # También buscar líneas que empiecen con "- filename.jpg"
-                    elif line.strip().startswith('- ') and '.jpg' in line.lower():
-                        filename = line.strip()[2:].strip()
-                        filenames.append(filename)
-            
-            print(f"Extracted filenames: {filenames}")
-            return filenames
-            
-        except Exception as e:
-            print(f"Error extracting filenames: {e}")
-            return [f"image_{i+1}.jpg" for i in range(10)]  # Fallback
+            result = await self._process_batch_with_retries(batch, prompt, batch_num, compiled, filenames)
+        except asyncio.CancelledError:
+            elapsed = time.perf_counter() - started
+            AI_BATCH_SECONDS.labels(self.name, 'cancelled').observe(elapsed)
+            get_latency_window(self.name).add(elapsed)
+            raise
+        elapsed = time.perf_counter() - started
+        AI_BATCH_SECONDS.labels(self.name, 'success' if result['success'] else 'failed').observe(elapsed)
+        if result['success']:
+            get_latency_window(self.name).add(elapsed)
+        return result
     
-    def _create_simplified_prompt(self, original_prompt: str) -> str:
-        """Crea un prompt base simplificado"""
+    async def _process_batch_with_retries(self, batch: List[bytes], prompt: str, batch_num: int,
+                                          compiled: Optional[CompiledPrompt] = None,
+                                          filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Procesa un lote con la política de reintentos compartida (core/resilience).
+
+        Solo se reintentan los fallos transitorios (timeouts, conexión, 429, 5xx y
+        respuestas estructuradas inválidas), con backoff exponencial con jitter o lo
+        que pida Retry-After, contra el presupuesto de reintentos del job. Un 400/401
+        falla a la primera, y con el circuito del proveedor abierto el lote falla
+        sin llamar a la API.
+        """
+        attempts = 0
+        
+        async def attempt() -> Dict[str, Any]:
+            nonlocal attempts
+            attempts += 1
+            print(f"Batch {batch_num}, attempt {attempts}/{self.MAX_RETRIES}")
+            with trace_span("api_call", batch=batch_num, attempt=attempts) as span:
+                result = await self._process_single_batch(batch, prompt, batch_num, compiled, filenames)
+                span.set(success=result['success'])
+            if not result['success']:
+                raise BatchFailedError(result)
+            return result
+        
+        def on_retry(attempt_num: int, error: BaseException, delay: float) -> None:
+            print(f"Batch {batch_num} attempt {attempt_num} failed: {error}; retrying in {delay:.1f}s")
+            AI_RETRIES_TOTAL.labels(self.name).inc()
+        
         try:
-            # Extraer las brand guidelines
-            if "BRAND GUIDELINES:" in original_prompt and "TASK:" in original_prompt:
-                start = original_prompt.find("BRAND GUIDELINES:")
-                end = original_prompt.find("TASK:")
-                guidelines = original_prompt[start:end].strip()
+            result = await call_with_retries(self.name, attempt, self.MAX_RETRIES, on_retry)
+        except BatchFailedError as e:
+            AI_BATCHES_TOTAL.labels(self.name, 'failed').inc()
+            return {
+                **e.result,
+                'error': f"Batch {batch_num} failed after {attempts} attempt(s): {e.result.get('error', 'Unknown')}"
+            }
+        except Exception as e:
+            AI_BATCHES_TOTAL.labels(self.name, 'failed').inc()
+            return {
+                'success': False,
+                'error': f"Batch {batch_num} failed: {e}",
+                'response': None
+            }
+        
+        AI_BATCHES_TOTAL.labels(self.name, 'success').inc()
+        record_usage(self.name, result.get('usage', {}))
+        return result
+    
+    def _valid_inputs(self, images_base64: List[bytes], prompt: str, compiled: Optional[CompiledPrompt],
+                      filenames: Optional[List[str]]) -> Tuple[List[bytes], str, Optional[List[str]]]:
+        """Descarta las imágenes vacías o truncadas junto con su nombre.
+
+        La respuesta referencia las imágenes por posición, así que si se descarta
+        alguna la cola del prompt y los nombres que valida el parser se rehacen con
+        las que quedan; si no, el índice ``i`` apuntaría a otra imagen.
+        """
+        names = filenames if filenames is not None else [None] * len(images_base64)
+        kept = []
+        for i, (filename, img_b64) in enumerate(zip(names, images_base64)):
+            if img_b64 and len(img_b64) > 100:  # Verificación básica
+                kept.append((filename, img_b64))
+                print(f"Image {i+1}: {len(img_b64)} chars")
             else:
-                guidelines = "BRAND GUIDELINES:\n" + original_prompt[:800]
-            
-            return f"""{guidelines}
+                print(f"Image {i+1}: Invalid or empty base64")
+        
+        valid_images = [img_b64 for _, img_b64 in kept]
+        if filenames is None or len(kept) == len(images_base64):
+            return valid_images, prompt, filenames
+        valid_filenames = [filename for filename, _ in kept]
+        if compiled:
+            prompt = compiled.batch_tail(valid_filenames)
+        return valid_images, prompt, valid_filenames
+    
+    @abstractmethod
+    async def _process_single_batch(self, images_base64: List[bytes], prompt: str, batch_num: int = None,
+                                    compiled: Optional[CompiledPrompt] = None,
+                                    filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Envía un lote al proveedor; devuelve {'success', 'response', 'usage'[, 'ratings']}."""
 
-TASK:
-Rate each image from 0 to 10 based on brand compliance:
-- 0 = Completely inconsistent with guidelines  
-- 5 = Neutral/partially consistent
-- 10 = Perfect compliance with guidelines"""
-            
-        except Exception as e:
-            print(f"Error creating simplified prompt: {e}")
-            return "Rate these images from 0-10 based on brand compliance."
+class OpenAIProvider(RetryingBatchAIProvider):
+    name = "openai"
     
-    def _create_batch_prompt_with_filenames(self, base_prompt: str, filenames: List[str]) -> str:
-        """Crea un prompt específico para el lote actual con nombres de archivo"""
+    def __init__(self):
+        from ..core.config import get_settings
+        self.settings = get_settings()
+        self.api_key = self.settings.OPENAI_API_KEY
+        self.base_url = f"{self.settings.OPENAI_BASE_URL.rstrip('/')}/chat/completions"
         
-        # Crear lista de imágenes para este lote
-        images_list = "\n".join([f"Image {i+1}: {filename}" for i, filename in enumerate(filenames)])
+        # Configuración optimizada para OpenAI
+        self.BATCH_SIZE = 2  # Solo 2 imágenes por request
+        self.TIMEOUT_PER_BATCH = 45  # 45s por lote
+        self.MAX_RETRIES = 3  # 3 intentos por lote
+        self.DELAY_BETWEEN_BATCHES = 2  # 2s entre requests
         
-        batch_prompt = f"""{base_prompt}
-
-IMAGES IN THIS BATCH:
-{images_list}
-
-CRITICAL: I'm showing you {len(filenames)} images in the exact order listed above.
-
-RESPONSE FORMAT (REQUIRED):
-For each image, provide exactly this format:
-{filenames[0]}: [score] - [brief explanation]
-{filenames[1] if len(filenames) > 1 else "example.jpg"}: [score] - [brief explanation]
-
-Use the EXACT filenames listed above. Do not use generic names."""
+        # Respuestas JSON validadas contra un schema en lugar de texto libre
+        self.structured_output = self.settings.OPENAI_STRUCTURED_OUTPUT
         
-        print(f"Created batch prompt with {len(filenames)} filenames")
-        return batch_prompt
-    
-    async def _process_batch_with_retries(self, batch: List[str], prompt: str, batch_num: int) -> Dict[str, Any]:
-        """Procesa un lote con sistema de reintentos"""
-        for attempt in range(1, self.MAX_RETRIES + 1):
-            try:
-                print(f"Batch {batch_num}, attempt {attempt}/{self.MAX_RETRIES}")
-                
-                result = await self._process_single_batch(batch, prompt, batch_num)
-                
-                if result['success']:
-                    return result
-                else:
-                    print(f"Batch {batch_num} attempt {attempt} failed: {result.get('error', 'Unknown')}")
-                    
-                    if attempt < self.MAX_RETRIES:
-                        await asyncio.sleep(attempt * 2)  # Backoff exponencial
-                    
-            except Exception as e:
-                print(f"Batch {batch_num} attempt {attempt} exception: {str(e)}")
-                
-                if attempt < self.MAX_RETRIES:
-                    await asyncio.sleep(attempt * 2)
+        # Con detail "low" el modelo ve la imagen a 512px: no subir más píxeles de esos
+        self.image_detail = self.settings.OPENAI_IMAGE_DETAIL.lower()
+        self.payload_profile = get_payload_profile('openai', self.image_detail)
         
-        return {
-            'success': False,
-            'error': f'Batch {batch_num} failed after {self.MAX_RETRIES} attempts',
-            'response': None
-        }
+        print(f"OpenAI provider initialized with batch processing strategy ({self.payload_profile.name})")
     
-    async def _process_single_batch(self, images_base64: List[str], prompt: str, batch_num: int = None) -> Dict[str, Any]:
-        """Procesa un solo lote de imágenes"""
+    async def _process_single_batch(self, images_base64: List[bytes], prompt: str, batch_num: int = None,
+                                    compiled: Optional[CompiledPrompt] = None,
+                                    filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Procesa un solo lote de imágenes.
+
+        Con ``compiled``, el prefijo estático va como mensaje de sistema y ``prompt``
+        es solo la cola específica del lote. En modo estructurado la respuesta se
+        valida y se devuelve ya parseada en ``ratings``; si no valida, el lote falla
+        y se reintenta solo ese lote.
+        """
         try:
             # Verificar que las imágenes base64 sean válidas
-            valid_images = []
-            for i, img_b64 in enumerate(images_base64):
-                if img_b64 and len(img_b64) > 100:  # Verificación básica
-                    valid_images.append(img_b64)
-                    print(f"Image {i+1}: {len(img_b64)} chars")
-                else:
-                    print(f"Image {i+1}: Invalid or empty base64")
+            valid_images, prompt, filenames = self._valid_inputs(images_base64, prompt, compiled, filenames)
             
             if not valid_images:
                 return {
@@ -255,53 +413,61 @@ Use the EXACT filenames listed above. Do not use generic names."""
                     'response': None
                 }
             
-            # Preparar contenido
-            content = [{"type": "text", "text": prompt}]
+            # Las imágenes se referencian por índice; el base64 se inserta al montar el body
+            image_parts = [image_part(i, self.image_detail) for i in range(len(valid_images))]
             
-            # Añadir imágenes al contenido
-            for i, img_b64 in enumerate(valid_images):
-                content.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_b64}",
-                        "detail": "low"
-                    }
-                })
-                print(f"Added valid image {i+1}")
+            if compiled:
+                messages = compiled.messages(prompt, image_parts)
+            else:
+                messages = [{"role": "user", "content": [{"type": "text", "text": prompt}, *image_parts]}]
             
             # Payload optimizado para la API
             payload = {
                 "model": "gpt-4o",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": content
-                    }
-                ],
+                "messages": messages,
                 "max_tokens": 1000,
                 "temperature": 0.1
             }
             
+            structured = self.structured_output and filenames is not None
+            if structured:
+                payload["response_format"] = RATINGS_RESPONSE_FORMAT
+            
+            # Body JSON montado sobre los buffers base64, sin copiarlos
+            body = build_json_body(payload, valid_images, mime_type=self.payload_profile.mime_type)
+            
             # Headers
             headers = {
                 "Content-Type": "application/json",
+                "Content-Length": str(body.size),
                 "Authorization": f"Bearer {self.api_key}"
             }
             
-            print(f"Sending batch request to OpenAI API with {len(valid_images)} valid images...")
+            print(f"Sending batch request to OpenAI API with {len(valid_images)} valid images ({body.size} bytes)...")
             
-            # Llamada HTTP con timeout optimizado
-            response = requests.post(
-                self.base_url, 
-                headers=headers, 
-                json=payload, 
-                timeout=self.TIMEOUT_PER_BATCH
-            )
+            # Llamada HTTP con timeout optimizado, por la sesión compartida
+            request_started = time.perf_counter()
+            try:
+                with trace_span("http_request", bytes=body.size) as span:
+                    async with get_http_session().post(
+                        self.base_url,
+                        headers=headers,
+                        data=body.stream(),
+                        timeout=aiohttp.ClientTimeout(total=self.TIMEOUT_PER_BATCH)
+                    ) as response:
+                        status_code = response.status
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        raw_body = await response.read()
+                    span.set(status=status_code)
+            except asyncio.TimeoutError:
+                AI_REQUEST_SECONDS.labels('openai', 'timeout').observe(time.perf_counter() - request_started)
+                raise
+            AI_REQUEST_SECONDS.labels('openai', str(status_code)).observe(time.perf_counter() - request_started)
             
-            print(f"OpenAI API Response Status: {response.status_code}")
+            print(f"OpenAI API Response Status: {status_code}")
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
+                data = orjson.loads(raw_body)
                 print("Batch response received from OpenAI")
                 
                 # Verificar que tenemos una respuesta válida
@@ -311,50 +477,320 @@ Use the EXACT filenames listed above. Do not use generic names."""
                     
                     usage_info = {}
                     if 'usage' in data:
+                        prompt_details = data['usage'].get('prompt_tokens_details') or {}
                         usage_info = {
                             'prompt_tokens': data['usage'].get('prompt_tokens', 0),
                             'completion_tokens': data['usage'].get('completion_tokens', 0),
-                            'total_tokens': data['usage'].get('total_tokens', 0)
+                            'total_tokens': data['usage'].get('total_tokens', 0),
+                            'cached_tokens': prompt_details.get('cached_tokens', 0)
                         }
                     
-                    return {
+                    result = {
                         'success': True,
                         'response': response_content,
                         'usage': usage_info
                     }
+                    
+                    if structured:
+                        try:
+                            with trace_span("validate"):
+                                result['ratings'] = parse_structured_ratings(response_content, filenames)
+                        except RatingValidationError as e:
+                            return {
+                                'success': False,
+                                'error': f"Invalid structured response: {e}",
+                                'response': response_content,
+                                'usage': usage_info,
+                                'retryable': True
+                            }
+                    
+                    return result
                 else:
                     return {
                         'success': False,
                         'error': 'Invalid response structure from OpenAI',
-                        'response': None
+                        'response': None,
+                        'retryable': True
                     }
             else:
-                error_msg = f"API request failed: {response.status_code} - {response.text}"
+                error_msg = f"API request failed: {status_code} - {raw_body.decode('utf-8', 'replace')}"
                 print(error_msg)
                 return {
                     'success': False,
                     'error': error_msg,
+                    'response': None,
+                    'status': status_code,
+                    'retry_after': retry_after
+                }
+                
+        except asyncio.TimeoutError:
+            return {
+                'success': False,
+                'error': 'Request timeout - batch took too long',
+                'response': None,
+                'retryable': True,
+                'outage': True
+            }
+        except Exception as e:
+            error_msg = f"Request Error: {str(e)}"
+            print(error_msg)
+            retryable, outage = classify(e)
+            return {
+                'success': False,
+                'error': error_msg,
+                'response': None,
+                'retryable': retryable,
+                'outage': outage
+            }
+
+class GeminiProvider(RetryingBatchAIProvider):
+    """Gemini por REST (generateContent) sobre la sesión HTTP compartida.
+
+    No usa el SDK de google-generativeai: así comparte pool de conexiones, timeouts y
+    métricas con OpenAI, y se puede apuntar a un servidor local con GEMINI_API_ENDPOINT.
+    """
+    name = "gemini"
+    
+    def __init__(self):
+        from ..core.config import get_settings
+        self.settings = get_settings()
+        self.api_key = self.settings.GEMINI_API_KEY
+        endpoint = self.settings.GEMINI_API_ENDPOINT.rstrip('/')
+        if "://" not in endpoint:
+            endpoint = f"https://{endpoint}"
+        self.base_url = f"{endpoint}/v1beta/models/{self.settings.GEMINI_VISION_MODEL}:generateContent"
+        
+        self.BATCH_SIZE = 2
+        self.TIMEOUT_PER_BATCH = 45
+        self.MAX_RETRIES = 3
+        self.DELAY_BETWEEN_BATCHES = 1
+        
+        self.payload_profile = get_payload_profile('gemini')
+        
+        print(f"Gemini provider initialized with batch processing strategy ({self.payload_profile.name})")
+    
+    async def _process_single_batch(self, images_base64: List[bytes], prompt: str, batch_num: int = None,
+                                    compiled: Optional[CompiledPrompt] = None,
+                                    filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Procesa un lote; mismo contrato que ``OpenAIProvider._process_single_batch``.
+
+        El prefijo compilado va como ``systemInstruction`` y las imágenes como
+        ``inlineData`` (base64 sin data URL).
+        """
+        try:
+            valid_images, prompt, filenames = self._valid_inputs(images_base64, prompt, compiled, filenames)
+            if not valid_images:
+                return {
+                    'success': False,
+                    'error': 'No valid images to process',
                     'response': None
                 }
+            
+            parts = [{"text": prompt}, *(inline_image_part(i, self.payload_profile.mime_type)
+                                         for i in range(len(valid_images)))]
+            payload = {
+                "contents": [{"role": "user", "parts": parts}],
+                "generationConfig": {"temperature": 0.1, "maxOutputTokens": 1000}
+            }
+            if compiled:
+                payload["systemInstruction"] = {"parts": [{"text": compiled.prefix}]}
+            
+            structured = self.structured_output and filenames is not None
+            if structured:
+                payload["generationConfig"]["responseMimeType"] = "application/json"
+                payload["generationConfig"]["responseSchema"] = GEMINI_RATINGS_SCHEMA
+            
+            body = build_json_body(payload, valid_images, data_url=False)
+            headers = {
+                "Content-Type": "application/json",
+                "Content-Length": str(body.size),
+                "x-goog-api-key": self.api_key
+            }
+            
+            print(f"Sending batch request to Gemini API with {len(valid_images)} valid images ({body.size} bytes)...")
+            
+            request_started = time.perf_counter()
+            try:
+                with trace_span("http_request", bytes=body.size) as span:
+                    async with get_http_session().post(
+                        self.base_url,
+                        headers=headers,
+                        data=body.stream(),
+                        timeout=aiohttp.ClientTimeout(total=self.TIMEOUT_PER_BATCH)
+                    ) as response:
+                        status_code = response.status
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        raw_body = await response.read()
+                    span.set(status=status_code)
+            except asyncio.TimeoutError:
+                AI_REQUEST_SECONDS.labels('gemini', 'timeout').observe(time.perf_counter() - request_started)
+                raise
+            AI_REQUEST_SECONDS.labels('gemini', str(status_code)).observe(time.perf_counter() - request_started)
+            
+            print(f"Gemini API Response Status: {status_code}")
+            
+            if status_code != 200:
+                error_msg = f"API request failed: {status_code} - {raw_body.decode('utf-8', 'replace')}"
+                print(error_msg)
+                return {
+                    'success': False,
+                    'error': error_msg,
+                    'response': None,
+                    'status': status_code,
+                    'retry_after': retry_after
+                }
+            
+            data = orjson.loads(raw_body)
+            candidates = data.get('candidates') or []
+            response_parts = (candidates[0].get('content') or {}).get('parts', []) if candidates else []
+            response_content = "".join(part.get('text', '') for part in response_parts)
+            if not response_content:
+                # Sin candidatos: p. ej. bloqueado por los filtros de seguridad
+                return {
+                    'success': False,
+                    'error': f"Invalid response structure from Gemini: {data.get('promptFeedback', {})}",
+                    'response': None
+                }
+            print(f"Response preview: {response_content[:200]}...")
+            
+            metadata = data.get('usageMetadata', {})
+            usage_info = {
+                'prompt_tokens': metadata.get('promptTokenCount', 0),
+                'completion_tokens': metadata.get('candidatesTokenCount', 0),
+                'total_tokens': metadata.get('totalTokenCount', 0)
+                    or metadata.get('promptTokenCount', 0) + metadata.get('candidatesTokenCount', 0),
+                'cached_tokens': metadata.get('cachedContentTokenCount', 0)
+            }
+            result = {
+                'success': True,
+                'response': response_content,
+                'usage': usage_info
+            }
+            
+            if structured:
+                try:
+                    with trace_span("validate"):
+                        result['ratings'] = parse_structured_ratings(response_content, filenames)
+                except RatingValidationError as e:
+                    return {
+                        'success': False,
+                        'error': f"Invalid structured response: {e}",
+                        'response': response_content,
+                        'usage': usage_info,
+                        'retryable': True
+                    }
+            
+            return result
                 
-        except requests.exceptions.Timeout:
+        except asyncio.TimeoutError:
             return {
                 'success': False,
                 'error': 'Request timeout - batch took too long',
-                'response': None
+                'response': None,
+                'retryable': True,
+                'outage': True
             }
         except Exception as e:
             error_msg = f"Request Error: {str(e)}"
             print(error_msg)
+            retryable, outage = classify(e)
             return {
                 'success': False,
                 'error': error_msg,
-                'response': None
+                'response': None,
+                'retryable': retryable,
+                'outage': outage
             }
 
+class HedgedAIProvider(BatchAIProvider):
+    """Hedging entre dos proveedores para recortar la cola de latencia.
+
+    Cada lote va al primario (AI_HEDGE_PRIMARY). Si no ha respondido cuando supera
+    el percentil AI_HEDGE_PERCENTILE de sus lotes recientes (o falla antes), el mismo
+    lote se envía también al secundario (AI_HEDGE_SECONDARY). Gana la primera
+    respuesta válida y la otra petición se cancela. Con ~p95 solo se duplica
+    alrededor del 5% de los lotes.
+    """
+    name = "hedged"
+    
+    def __init__(self):
+        from ..core.config import get_settings
+        self.settings = get_settings()
+        if "hedged" in (self.settings.AI_HEDGE_PRIMARY.lower(), self.settings.AI_HEDGE_SECONDARY.lower()):
+            raise ValueError("Hedged provider cannot hedge itself")
+        if self.settings.AI_HEDGE_PRIMARY.lower() == self.settings.AI_HEDGE_SECONDARY.lower():
+            raise ValueError("AI_HEDGE_PRIMARY and AI_HEDGE_SECONDARY must be different providers")
+        self.primary = AIProviderFactory.create_provider(self.settings.AI_HEDGE_PRIMARY)
+        self.secondary = AIProviderFactory.create_provider(self.settings.AI_HEDGE_SECONDARY)
+        
+        # Los lotes los arma este proveedor: el ritmo es el del primario
+        self.BATCH_SIZE = self.primary.BATCH_SIZE
+        self.DELAY_BETWEEN_BATCHES = self.primary.DELAY_BETWEEN_BATCHES
+        # Ambos reciben el mismo prompt compilado, así que deben responder en el mismo formato
+        self.structured_output = self.primary.structured_output and self.secondary.structured_output
+        self.primary.structured_output = self.secondary.structured_output = self.structured_output
+        # Las imágenes se codifican una sola vez para los dos, con el perfil del primario
+        self.payload_profile = self.secondary.payload_profile = self.primary.payload_profile
+        
+        print(f"Hedged provider initialized: {self.primary.name} -> {self.secondary.name}")
+    
+    def hedge_delay(self) -> float:
+        window = get_latency_window(self.primary.name)
+        if len(window) < self.settings.AI_HEDGE_MIN_SAMPLES:
+            return self.settings.AI_HEDGE_DEFAULT_DELAY_SECONDS
+        return window.percentile(self.settings.AI_HEDGE_PERCENTILE)
+    
+    async def _run_batch(self, batch: List[bytes], prompt: str, batch_num: int,
+                         compiled: Optional[CompiledPrompt] = None,
+                         filenames: Optional[List[str]] = None) -> Dict[str, Any]:
+        args = (batch, prompt, batch_num, compiled, filenames)
+        primary = asyncio.create_task(self.primary._run_batch(*args))
+        pending = {primary: self.primary.name}
+        try:
+            delay = self.hedge_delay()
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done:
+                del pending[primary]
+                result = self._task_result(primary)
+                if result['success']:
+                    return {**result, 'provider': self.primary.name}
+                print(f"Batch {batch_num}: {self.primary.name} failed, trying {self.secondary.name}")
+            else:
+                print(f"Batch {batch_num}: {self.primary.name} slower than {delay:.2f}s, hedging to {self.secondary.name}")
+            
+            with trace_span("hedge", batch=batch_num, delay=round(delay, 3)) as span:
+                pending[asyncio.create_task(self.secondary._run_batch(*args))] = self.secondary.name
+                while pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        provider = pending.pop(task)
+                        result = self._task_result(task)
+                        if result['success']:
+                            span.set(winner=provider)
+                            self._count_hedge(provider)
+                            return {**result, 'provider': provider}
+                span.set(winner=None)
+                self._count_hedge("none")
+                return result
+        finally:
+            # El perdedor se cancela: su conexión se cierra y no se cobra la respuesta
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    
+    def _task_result(self, task: asyncio.Task) -> Dict[str, Any]:
+        if task.exception() is not None:
+            return {'success': False, 'error': f"Request Error: {task.exception()}", 'response': None}
+        return task.result()
+    
+    def _count_hedge(self, winner: str) -> None:
+        AI_HEDGED_BATCHES_TOTAL.labels(self.primary.name, self.secondary.name, winner).inc()
+
 class AIProviderFactory:
     _providers = {
-        'openai': OpenAIProvider
+        'openai': OpenAIProvider,
+        'gemini': GeminiProvider,
+        'hedged': HedgedAIProvider
     }
     
     @classmethod
@@ -1,26 +1,41 @@
-import asyncio
 import aiohttp
 import logging
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from ..core.config import get_settings
+from ..core.metrics import IMAGE_DOWNLOAD_BYTES
+from ..core.resilience import UpstreamError, call_with_retries, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
+async def _get(session: aiohttp.ClientSession, upstream: str, url: str, read_json: bool, **kwargs) -> Any:
+    """GET under the shared retry policy; non-200 responses raise UpstreamError."""
+    async def attempt() -> Any:
+        async with session.get(url, **kwargs) as response:
+            logger.info(f"{upstream} response status: {response.status}")
+            if response.status != 200:
+                error_text = await response.text()
+                raise UpstreamError(f"{upstream} error {response.status}: {error_text[:200]}", response.status,
+                                    parse_retry_after(response.headers.get('Retry-After')))
+            return await response.json() if read_json else await response.read()
+    
+    return await call_with_retries(upstream, attempt, get_settings().IMAGE_PROVIDER_MAX_ATTEMPTS)
+
 class ImageProvider(ABC):
     @abstractmethod
     async def fetch_images(self, query: str, limit: int) -> List[Dict[str, Any]]:
         pass
     
     @abstractmethod
-    async def download_image(self, image_data: Dict[str, Any], save_path: str) -> bool:
+    async def download_image(self, image_data: Dict[str, Any]) -> Optional[bytes]:
+        """Image content, or None if it could not be downloaded. Storing it is up to the caller."""
         pass
 
 class UnsplashProvider(ImageProvider):
     def __init__(self):
         self.settings = get_settings()
         self.api_key = self.settings.UNSPLASH_API_KEY
-        self.base_url = "https://api.unsplash.com"
+        self.base_url = self.settings.UNSPLASH_BASE_URL.rstrip("/")
         logger.info(f"UnsplashProvider initialized with API key: {self.api_key[:10]}...")
     
     async def fetch_images(self, query: str, limit: int) -> List[Dict[str, Any]]:
@@ -43,70 +58,56 @@ class UnsplashProvider(ImageProvider):
                 logger.info(f"Fetching from Unsplash: {url}")
                 logger.info(f"Parameters: {params}")
                 
-                async with session.get(url, headers=headers, params=params) as response:
-                    logger.info(f"Unsplash response status: {response.status}")
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        total_results = data.get('total', 0)
-                        results = data.get('results', [])
-                        
-                        logger.info(f"Unsplash returned {len(results)} images (total available: {total_results})")
-                        
-                        images = []
-                        for item in results:
-                            images.append({
-                                'id': item.get('id'),
-                                'description': item.get('description') or item.get('alt_description', ''),
-                                'url': item.get('urls', {}).get('regular'),
-                                'download_url': item.get('urls', {}).get('full'),
-                                'author': item.get('user', {}).get('name', 'Unknown'),
-                                'source': 'unsplash',
-                                'width': item.get('width'),
-                                'height': item.get('height')
-                            })
-                        
-                        logger.info(f"Processed {len(images)} images from Unsplash")
-                        return images
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Unsplash API error {response.status}: {error_text}")
-                        return []
+                data = await _get(session, 'unsplash', url, True, headers=headers, params=params)
+                total_results = data.get('total', 0)
+                results = data.get('results', [])
+                
+                logger.info(f"Unsplash returned {len(results)} images (total available: {total_results})")
+                
+                images = []
+                for item in results:
+                    images.append({
+                        'id': item.get('id'),
+                        'description': item.get('description') or item.get('alt_description', ''),
+                        'url': item.get('urls', {}).get('regular'),
+                        'download_url': item.get('urls', {}).get('full'),
+                        'author': item.get('user', {}).get('name', 'Unknown'),
+                        'source': 'unsplash',
+                        'width': item.get('width'),
+                        'height': item.get('height')
+                    })
+                
+                logger.info(f"Processed {len(images)} images from Unsplash")
+                return images
                         
             except Exception as e:
                 logger.error(f"Error fetching from Unsplash: {e}")
                 return []
     
-    async def download_image(self, image_data: Dict[str, Any], save_path: str) -> bool:
+    async def download_image(self, image_data: Dict[str, Any]) -> Optional[bytes]:
         url = image_data.get('download_url') or image_data.get('url')
         if not url:
             logger.error("No download URL found for image")
-            return False
+            return None
         
         timeout = aiohttp.ClientTimeout(total=30)
         
         async with aiohttp.ClientSession(timeout=timeout) as session:
             try:
                 logger.info(f"Downloading image from: {url}")
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        content = await response.read()
-                        with open(save_path, 'wb') as f:
-                            f.write(content)
-                        logger.info(f"Image downloaded successfully: {save_path}")
-                        return True
-                    else:
-                        logger.error(f"Failed to download image, status: {response.status}")
-                        return False
+                content = await _get(session, 'unsplash-images', url, False)
+                IMAGE_DOWNLOAD_BYTES.labels('unsplash').observe(len(content))
+                logger.info(f"Image downloaded successfully: {url} ({len(content)} bytes)")
+                return content
             except Exception as e:
                 logger.error(f"Error downloading image: {e}")
-                return False
+                return None
 
 class PexelsProvider(ImageProvider):
     def __init__(self):
         self.settings = get_settings()
         self.api_key = self.settings.PEXELS_API_KEY
-        self.base_url = "https://api.pexels.com/v1"
+        self.base_url = self.settings.PEXELS_BASE_URL.rstrip("/")
         logger.info(f"PexelsProvider initialized")
     
     async def fetch_images(self, query: str, limit: int) -> List[Dict[str, Any]]:
@@ -129,58 +130,46 @@ class PexelsProvider(ImageProvider):
                 url = f"{self.base_url}/search"
                 logger.info(f"Fetching from Pexels: {url}")
                 
-                async with session.get(url, headers=headers, params=params) as response:
-                    logger.info(f"Pexels response status: {response.status}")
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        results = data.get('photos', [])
-                        
-                        logger.info(f"Pexels returned {len(results)} images")
-                        
-                        images = []
-                        for item in results:
-                            images.append({
-                                'id': item.get('id'),
-                                'description': item.get('alt', ''),
-                                'url': item.get('src', {}).get('large'),
-                                'download_url': item.get('src', {}).get('original'),
-                                'author': item.get('photographer', 'Unknown'),
-                                'source': 'pexels',
-                                'width': item.get('width'),
-                                'height': item.get('height')
-                            })
-                        
-                        return images
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Pexels API error {response.status}: {error_text}")
-                        return []
+                data = await _get(session, 'pexels', url, True, headers=headers, params=params)
+                results = data.get('photos', [])
+                
+                logger.info(f"Pexels returned {len(results)} images")
+                
+                images = []
+                for item in results:
+                    images.append({
+                        'id': item.get('id'),
+                        'description': item.get('alt', ''),
+                        'url': item.get('src', {}).get('large'),
+                        'download_url': item.get('src', {}).get('original'),
+                        'author': item.get('photographer', 'Unknown'),
+                        'source': 'pexels',
+                        'width': item.get('width'),
+                        'height': item.get('height')
+                    })
+                
+                return images
                         
             except Exception as e:
                 logger.error(f"Error fetching from Pexels: {e}")
                 return []
     
-    async def download_image(self, image_data: Dict[str, Any], save_path: str) -> bool:
+    async def download_image(self, image_data: Dict[str, Any]) -> Optional[bytes]:
         url = image_data.get('download_url') or image_data.get('url')
         if not url:
-            return False
+            return None
         
         headers = {'Authorization': self.api_key}
         timeout = aiohttp.ClientTimeout(total=30)
         
         async with aiohttp.ClientSession(timeout=timeout) as session:
             try:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        content = await response.read()
-                        with open(save_path, 'wb') as f:
-                            f.write(content)
-                        return True
-                    return False
+                content = await _get(session, 'pexels-images', url, False, headers=headers)
+                IMAGE_DOWNLOAD_BYTES.labels('pexels').observe(len(content))
+                return content
             except Exception as e:
                 logger.error(f"Error downloading image: {e}")
-                return False
+                return None
 
 class ImageProviderFactory:
     _providers = {
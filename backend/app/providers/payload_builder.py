@@ -0,0 +1,67 @@
+import re
+import secrets
+from typing import Any, AsyncIterator, Dict, List, Union
+import orjson
+
+def data_url_prefix(mime_type: str = "image/jpeg") -> bytes:
+    return f"data:{mime_type};base64,".encode()
+
+Buffer = Union[bytes, memoryview]
+
+class ImageRef:
+    """Stands in for an image's data URL until the body is assembled."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int):
+        self.index = index
+
+def image_part(index: int, detail: str = "low") -> Dict[str, Any]:
+    return {"type": "image_url", "image_url": {"url": ImageRef(index), "detail": detail}}
+
+def inline_image_part(index: int, mime_type: str = "image/jpeg") -> Dict[str, Any]:
+    """Gemini-style part: raw base64, no data URL (build with ``data_url=False``)."""
+    return {"inlineData": {"mimeType": mime_type, "data": ImageRef(index)}}
+
+class JsonBody:
+    """A JSON request body kept as a list of buffers instead of one big string.
+
+    Image base64 is referenced, not copied, so a request costs one serialization of
+    the (small) payload skeleton plus the socket writes.
+    """
+
+    def __init__(self, chunks: List[Buffer]):
+        self.chunks = chunks
+        self.size = sum(len(chunk) for chunk in chunks)
+
+    async def stream(self) -> AsyncIterator[Buffer]:
+        for chunk in self.chunks:
+            yield chunk
+
+    def to_bytes(self) -> bytes:
+        return b"".join(self.chunks)
+
+def build_json_body(payload: Dict[str, Any], images: List[bytes], data_url: bool = True,
+                    mime_type: str = "image/jpeg") -> JsonBody:
+    """Serialize ``payload`` with each ImageRef replaced by ``images[ref.index]``.
+
+    ``images`` are base64 byte strings, which never need JSON escaping, so they can be
+    spliced between the serialized pieces as-is, prefixed with a ``mime_type`` data
+    URL unless ``data_url`` is False.
+    """
+    token = secrets.token_hex(8)
+
+    def default(value: Any) -> str:
+        if isinstance(value, ImageRef):
+            return f"@@{token}:{value.index}@@"
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+    skeleton = orjson.dumps(payload, default=default)
+    pieces = re.split(rb'"@@' + token.encode() + rb':(\d+)@@"', skeleton)
+
+    # re.split alternates text, index, text, index, ..., text
+    prefix = data_url_prefix(mime_type) if data_url else b""
+    chunks: List[Buffer] = [pieces[0]]
+    for i in range(1, len(pieces), 2):
+        chunks.extend((b'"', prefix, images[int(pieces[i])], b'"', pieces[i + 1]))
+    return JsonBody([chunk for chunk in chunks if chunk])
@@ -0,0 +1,102 @@
+"""Image encodings sent to the vision APIs ("payload profiles").
+
+A profile is written as ``<format>-<max edge>-q<quality>[-<subsampling>]``, e.g.
+``jpeg-512-q75`` or ``webp-640-q60``; JPEG chroma subsampling defaults to 4:2:0 and
+``-444``/``-422`` keep more colour resolution (lossy WebP is always 4:2:0).
+
+The defaults follow what each API actually looks at, so we do not upload pixels it
+throws away: OpenAI's ``detail: "low"`` sees a 512px version of the image, and
+Gemini cuts anything wider than 768px into extra 768px tiles (more tokens too).
+``LEGACY_PROFILE`` is the fixed encoding used before profiles existed, kept as the
+reference for ``benchmarks.bench_payload_profiles``.
+"""
+import io
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, TYPE_CHECKING
+from ..core.config import get_settings
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+LEGACY_PROFILE = "jpeg-800-q75"
+
+# (provider, detail) -> profile when the provider's *_PAYLOAD_PROFILE setting is empty
+DEFAULT_PROFILES = {
+    ("openai", "low"): "jpeg-512-q75",
+    # Fit in 2048px, then shortest side 768px: 1536px covers aspect ratios up to 2:1
+    ("openai", "high"): "jpeg-1536-q75",
+    ("openai", "auto"): LEGACY_PROFILE,
+    ("gemini", None): "jpeg-768-q75",
+}
+
+_FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+_SUBSAMPLING = {"444": "4:4:4", "422": "4:2:2", "420": "4:2:0"}
+_SPEC_PATTERN = re.compile(r"^(jpeg|webp)-(\d+)-q(\d+)(?:-(444|422|420))?$")
+
+class PayloadProfile:
+    def __init__(self, format: str = "jpeg", max_edge: int = 800, quality: int = 75, subsampling: str = "420"):
+        if format not in _FORMATS:
+            raise ValueError(f"Unknown payload format: {format}. Available: {', '.join(_FORMATS)}")
+        if subsampling not in _SUBSAMPLING:
+            raise ValueError(f"Unknown chroma subsampling: {subsampling}. Available: {', '.join(_SUBSAMPLING)}")
+        if format == "webp" and subsampling != "420":
+            raise ValueError("Lossy WebP is always 4:2:0")
+        if not 1 <= quality <= 100 or max_edge < 16:
+            raise ValueError(f"Invalid payload profile: quality {quality}, max edge {max_edge}")
+        self.format = format
+        self.max_edge = max_edge
+        self.quality = quality
+        self.subsampling = subsampling
+
+    @classmethod
+    def parse(cls, spec: str) -> "PayloadProfile":
+        match = _SPEC_PATTERN.match(spec.strip().lower())
+        if not match:
+            raise ValueError(f"Invalid payload profile '{spec}', expected e.g. jpeg-512-q75 or webp-640-q60")
+        format, max_edge, quality, subsampling = match.groups()
+        return cls(format, int(max_edge), int(quality), subsampling or "420")
+
+    @property
+    def name(self) -> str:
+        suffix = f"-{self.subsampling}" if self.subsampling != "420" else ""
+        return f"{self.format}-{self.max_edge}-q{self.quality}{suffix}"
+
+    @property
+    def mime_type(self) -> str:
+        return _FORMATS[self.format][1]
+
+    @property
+    def max_size(self) -> Tuple[int, int]:
+        return (self.max_edge, self.max_edge)
+
+    def encode(self, img: "Image.Image") -> bytes:
+        """Encode an already resized RGB or L image."""
+        options: Dict[str, Any] = {"quality": self.quality}
+        if self.format == "jpeg":
+            options["optimize"] = True
+            if img.mode != "L":
+                options["subsampling"] = _SUBSAMPLING[self.subsampling]
+        else:
+            options["method"] = 4
+        buffer = io.BytesIO()
+        img.save(buffer, format=_FORMATS[self.format][0], **options)
+        return buffer.getvalue()
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PayloadProfile) and self.name == other.name
+
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    def __repr__(self) -> str:
+        return f"PayloadProfile({self.name})"
+
+@lru_cache(maxsize=None)
+def parse_profile(spec: str) -> PayloadProfile:
+    return PayloadProfile.parse(spec)
+
+def get_payload_profile(provider: str, detail: Optional[str] = None) -> PayloadProfile:
+    """The configured profile for ``provider``, or its default for ``detail``."""
+    override = getattr(get_settings(), f"{provider.upper()}_PAYLOAD_PROFILE", "")
+    return parse_profile(override or DEFAULT_PROFILES.get((provider, detail), LEGACY_PROFILE))
@@ -0,0 +1,103 @@
+import hashlib
+import re
+from typing import Any, Dict, List, Tuple
+from .rating_schema import STRUCTURED_FORMAT_INSTRUCTIONS
+
+TASK_INSTRUCTIONS = """TASK:
+Rate each image from 0 to 10 based on brand compliance:
+- 0 = Completely inconsistent with guidelines
+- 5 = Neutral/partially consistent
+- 10 = Perfect compliance with guidelines"""
+
+TEXT_FORMAT_INSTRUCTIONS = """RESPONSE FORMAT (REQUIRED):
+For each image, write exactly one line in this format:
+<filename>: <score> - <brief explanation>
+
+Use the EXACT filenames listed with the images. Do not use generic names."""
+
+class CompiledPrompt:
+    """A job's prompt split into a byte-stable prefix and per-batch tails.
+
+    Providers cache prompts by exact prefix, so everything that is the same for every
+    batch (guidelines, task, response format) lives in ``prefix`` and is sent first;
+    only the batch's image list changes between requests.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.prefix_hash = hashlib.sha256(prefix.encode('utf-8')).hexdigest()[:16]
+
+    def batch_tail(self, filenames: List[str]) -> str:
+        images_list = "\n".join([f"Image {i+1}: {filename}" for i, filename in enumerate(filenames)])
+        return f"""IMAGES IN THIS BATCH:
+{images_list}
+
+I'm showing you {len(filenames)} images in the exact order listed above. Rate every one of them."""
+
+    def messages(self, tail: str, image_parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            {"role": "system", "content": self.prefix},
+            {"role": "user", "content": [{"type": "text", "text": tail}, *image_parts]}
+        ]
+
+class PromptCompiler:
+    """Renders the static part of the analysis prompt once per job.
+
+    The prefix is built from the template's BRAND GUIDELINES, TASK and RESPONSE
+    FORMAT sections. The opening line (image count) and IMAGES TO ANALYZE are
+    per-job and are replaced by each batch's tail. The example filenames in the
+    response format become ``<filename>`` so jobs sharing a guideline share a
+    prefix. With structured output the response format comes from the rating
+    schema instead, since the provider enforces that shape. Sections missing from
+    the template fall back to the defaults above.
+    """
+
+    def compile(self, original_prompt: str, structured: bool = False) -> CompiledPrompt:
+        text = self._normalize(original_prompt)
+        guidelines, guidelines_end = self._extract_guidelines(text)
+        # Look for the remaining sections after the guidelines, which come from a PDF
+        # and may contain lines that look like section headings
+        task = self._section(text, "TASK:", ("RESPONSE FORMAT",), guidelines_end) or TASK_INSTRUCTIONS
+        if structured:
+            format_instructions = STRUCTURED_FORMAT_INSTRUCTIONS
+        else:
+            template_format = self._section(text, "RESPONSE FORMAT", (), guidelines_end)
+            format_instructions = self._generic_examples(template_format) if template_format else TEXT_FORMAT_INSTRUCTIONS
+        return CompiledPrompt(self._normalize(f"{guidelines}\n\n{task}\n\n{format_instructions}"))
+
+    def _extract_guidelines(self, original_prompt: str) -> Tuple[str, int]:
+        # The template places the guideline text between these markers; anything
+        # job-specific (image count, filenames) is outside them.
+        start = original_prompt.find("BRAND GUIDELINES:")
+        if start == -1:
+            return "BRAND GUIDELINES:\n" + original_prompt[:800].strip(), 0
+        end = len(original_prompt)
+        for marker in ("IMAGES TO ANALYZE:", "TASK:"):
+            position = original_prompt.find(marker, start)
+            if position != -1:
+                end = min(end, position)
+        return original_prompt[start:end].strip(), end
+
+    def _section(self, text: str, marker: str, end_markers: Tuple[str, ...], start: int = 0) -> str:
+        match = re.compile(rf"^{re.escape(marker)}", re.MULTILINE).search(text, start)
+        if match is None:
+            return ""
+        end = len(text)
+        for end_marker in end_markers:
+            following = re.compile(rf"^{re.escape(end_marker)}", re.MULTILINE).search(text, match.end())
+            if following is not None:
+                end = min(end, following.start())
+        return text[match.start():end].strip()
+
+    def _generic_examples(self, text: str) -> str:
+        # The template's example lines name the job's first images; keep the line
+        # shape but not the names, which would change the prefix from job to job.
+        return re.sub(r"^.+?(?=: \[score\])", "<filename>", text, flags=re.MULTILINE)
+
+    def _normalize(self, text: str) -> str:
+        # Same guideline text must always yield the same bytes, whatever the
+        # line endings or trailing whitespace of the extraction.
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        text = re.sub(r"[ \t]+\n", "\n", text)
+        text = re.sub(r"\n{3,}", "\n\n", text)
+        return text.strip()
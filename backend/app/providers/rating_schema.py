@@ -0,0 +1,95 @@
+import json
+from typing import Any, Dict, List
+
+# Compact per-image schema: images are referenced by their 1-based position in the
+# batch, so filenames never have to be echoed back (or scraped) and completions
+# stay short. ``strict`` mode requires every property and no extras.
+RATINGS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "image_ratings",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "ratings": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "i": {"type": "integer"},
+                            "s": {"type": "integer"},
+                            "r": {"type": "string"}
+                        },
+                        "required": ["i", "s", "r"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["ratings"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Same shape for Gemini's responseSchema (an OpenAPI subset: no additionalProperties)
+GEMINI_RATINGS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "ratings": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "i": {"type": "INTEGER"},
+                    "s": {"type": "INTEGER"},
+                    "r": {"type": "STRING"}
+                },
+                "required": ["i", "s", "r"]
+            }
+        }
+    },
+    "required": ["ratings"]
+}
+
+STRUCTURED_FORMAT_INSTRUCTIONS = """RESPONSE FORMAT (REQUIRED):
+Return JSON only: {"ratings": [{"i": <image number>, "s": <score 0-10>, "r": "<brief explanation, max 20 words>"}]}
+Include exactly one entry per image, numbered as listed with the images."""
+
+class RatingValidationError(ValueError):
+    pass
+
+def parse_structured_ratings(content: str, filenames: List[str]) -> List[Dict[str, Any]]:
+    """Validate a structured response for one batch and map it back to filenames.
+
+    Raises RatingValidationError when the payload is not valid JSON, scores fall
+    outside 0-10, or not every image in the batch got exactly one rating, so the
+    caller can retry just that batch.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise RatingValidationError(f"Response is not valid JSON: {e}")
+
+    entries = data.get("ratings") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise RatingValidationError("Missing 'ratings' array")
+
+    ratings = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise RatingValidationError(f"Invalid rating entry: {entry!r}")
+        index, score, reason = entry.get("i"), entry.get("s"), entry.get("r", "")
+        if not isinstance(index, int) or isinstance(index, bool) or not 1 <= index <= len(filenames):
+            raise RatingValidationError(f"Image number out of range: {index!r}")
+        if not isinstance(score, int) or isinstance(score, bool) or not 0 <= score <= 10:
+            raise RatingValidationError(f"Score out of range for image {index}: {score!r}")
+        if index in ratings:
+            raise RatingValidationError(f"Image {index} rated more than once")
+        ratings[index] = {"filename": filenames[index - 1], "score": score, "explanation": str(reason)}
+
+    if len(ratings) != len(filenames):
+        missing = [filenames[i - 1] for i in range(1, len(filenames) + 1) if i not in ratings]
+        raise RatingValidationError(f"Missing ratings for: {', '.join(missing)}")
+
+    return [ratings[i] for i in sorted(ratings)]
@@ -1,59 +1,478 @@
-from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+import asyncio
 import os
-from pathlib import Path
+import shutil
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator, Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+import aiohttp
+from yarl import URL
+from ..core.aws_sigv4 import canonical_query, encode_path, presign_query, sha256_hex, sign_headers
+from ..core.config import get_settings
+from ..core.http_client import get_http_session
+
+def normalize_key(key: str) -> str:
+    """Storage keys are relative POSIX paths under data/, e.g. ``images/<job_id>/001_x.jpg``."""
+    path = PurePosixPath(str(key).replace("\\", "/"))
+    if path.is_absolute() or ".." in path.parts or not path.parts:
+        raise ValueError(f"Invalid storage key: {key}")
+    return str(path)
 
 class StorageProvider(ABC):
+    """Async storage for everything the app keeps under data/.
+
+    Every call is non-blocking. The batch helpers run requests concurrently, up to
+    ``max_concurrency`` at a time; backends override them when they can do better.
+    """
+    max_concurrency = 8
+
     @abstractmethod
     async def save_file(self, file_path: str, content: bytes) -> str:
         pass
-    
+
     @abstractmethod
     async def get_file(self, file_path: str) -> bytes:
+        """Raises FileNotFoundError when the key does not exist."""
         pass
-    
+
     @abstractmethod
     async def delete_file(self, file_path: str) -> bool:
         pass
 
+    @abstractmethod
+    async def exists(self, file_path: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def list_files(self, prefix: str) -> List[str]:
+        """Keys directly or indirectly under ``prefix``, sorted."""
+        pass
+
+    def local_path(self, file_path: str) -> Optional[Path]:
+        """Filesystem path of a key, for backends that have one."""
+        return None
+
+    def presigned_url(self, file_path: str) -> Optional[str]:
+        """Time-limited URL clients can fetch the object from directly, if supported."""
+        return None
+
+    async def get_range(self, file_path: str, start: int, end: int) -> bytes:
+        """Bytes ``start`` to ``end`` inclusive."""
+        return (await self.get_file(file_path))[start:end + 1]
+
+    async def import_file(self, file_path: str, source: Path) -> str:
+        """Store a local file under ``file_path``.
+
+        The local backend moves ``source`` into place; others upload it and leave
+        ``source`` for the caller to remove.
+        """
+        return await self.save_file(file_path, await asyncio.to_thread(Path(source).read_bytes))
+
+    async def _bounded(self, calls: Iterable) -> list:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(call):
+            async with semaphore:
+                return await call
+
+        return await asyncio.gather(*(run(call) for call in calls))
+
+    async def save_many(self, items: Iterable[Tuple[str, bytes]]) -> List[str]:
+        return await self._bounded(self.save_file(key, content) for key, content in items)
+
+    async def get_many(self, file_paths: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        """Contents by key; None for keys that do not exist."""
+        file_paths = list(file_paths)
+
+        async def get_or_none(key: str) -> Optional[bytes]:
+            try:
+                return await self.get_file(key)
+            except FileNotFoundError:
+                return None
+
+        contents = await self._bounded(get_or_none(key) for key in file_paths)
+        return dict(zip(file_paths, contents))
+
+    async def exists_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        file_paths = list(file_paths)
+        found = await self._bounded(self.exists(key) for key in file_paths)
+        return dict(zip(file_paths, found))
+
+    @asynccontextmanager
+    async def local_files(self, file_paths: Iterable[str]) -> AsyncIterator[Dict[str, Path]]:
+        """Filesystem paths for keys, for code that needs real files (PIL, PyPDF2).
+
+        Backends without local files stage the objects into a temporary directory that
+        is removed on exit. Keys that do not exist are left out.
+        """
+        file_paths = list(file_paths)
+        staged = {key: self.local_path(key) for key in file_paths}
+        if all(path is not None for path in staged.values()):
+            yield {key: path for key, path in staged.items() if path.exists()}
+            return
+
+        tmp_dir = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix="storage-"))
+        try:
+            contents = await self.get_many(file_paths)
+
+            def write_all() -> Dict[str, Path]:
+                paths = {}
+                for key, content in contents.items():
+                    if content is None:
+                        continue
+                    path = tmp_dir / key
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_bytes(content)
+                    paths[key] = path
+                return paths
+
+            paths = await asyncio.to_thread(write_all)
+            del contents
+            yield paths
+        finally:
+            await asyncio.to_thread(shutil.rmtree, tmp_dir, True)
+
+_io_pool: Optional[ThreadPoolExecutor] = None
+
+def _get_io_pool() -> ThreadPoolExecutor:
+    """Bounded pool for blocking file I/O, so a burst of storage calls cannot starve
+    the default executor that PIL and the other ``to_thread`` work share."""
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = ThreadPoolExecutor(max_workers=get_settings().STORAGE_IO_WORKERS,
+                                      thread_name_prefix="storage-io")
+    return _io_pool
+
 class LocalStorageProvider(StorageProvider):
-    def __init__(self, base_path: str = "data"):
-        self.base_path = Path(base_path)
-        self.base_path.mkdir(exist_ok=True)
-    
-    async def save_file(self, file_path: str, content: bytes) -> str:
-        full_path = self.base_path / file_path
+    def __init__(self, base_path: Optional[str] = None):
+        if base_path is None:
+            base_path = Path(__file__).parent.parent.parent.parent / "data"
+        self.base_path = Path(base_path).resolve()
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.max_concurrency = get_settings().STORAGE_IO_WORKERS
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(_get_io_pool(), fn, *args)
+
+    def _full_path(self, file_path: str) -> Path:
+        return self.base_path / normalize_key(file_path)
+
+    def local_path(self, file_path: str) -> Optional[Path]:
+        return self._full_path(file_path)
+
+    def _write(self, file_path: str, content: bytes) -> str:
+        full_path = self._full_path(file_path)
         full_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(full_path, 'wb') as f:
-            f.write(content)
-        
+        # Temp name + rename: readers never see a half-written file
+        tmp_path = full_path.with_name(f".{full_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, full_path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
         return str(full_path)
-    
-    async def get_file(self, file_path: str) -> bytes:
-        full_path = self.base_path / file_path
-        with open(full_path, 'rb') as f:
+
+    def _read(self, file_path: str) -> bytes:
+        with open(self._full_path(file_path), 'rb') as f:
             return f.read()
-    
-    async def delete_file(self, file_path: str) -> bool:
+
+    def _delete(self, file_path: str) -> bool:
         try:
-            full_path = self.base_path / file_path
-            if full_path.exists():
-                full_path.unlink()
+            self._full_path(file_path).unlink(missing_ok=True)
             return True
-        except:
+        except OSError:
+            return False
+
+    def _list(self, prefix: str) -> List[str]:
+        root = self._full_path(prefix)
+        if root.is_file():
+            return [normalize_key(prefix)]
+        if not root.is_dir():
+            return []
+        keys = []
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if not name.startswith("."):
+                    keys.append(Path(dirpath, name).relative_to(self.base_path).as_posix())
+        return sorted(keys)
+
+    async def save_file(self, file_path: str, content: bytes) -> str:
+        return await self._run(self._write, file_path, content)
+
+    async def get_file(self, file_path: str) -> bytes:
+        return await self._run(self._read, file_path)
+
+    async def delete_file(self, file_path: str) -> bool:
+        return await self._run(self._delete, file_path)
+
+    async def get_range(self, file_path: str, start: int, end: int) -> bytes:
+        def read_range() -> bytes:
+            with open(self._full_path(file_path), 'rb') as f:
+                f.seek(start)
+                return f.read(end - start + 1)
+
+        return await self._run(read_range)
+
+    async def import_file(self, file_path: str, source: Path) -> str:
+        def move() -> str:
+            full_path = self._full_path(file_path)
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source, full_path)
+            return str(full_path)
+
+        return await self._run(move)
+
+    async def exists(self, file_path: str) -> bool:
+        return await self._run(self._full_path(file_path).is_file)
+
+    async def list_files(self, prefix: str) -> List[str]:
+        return await self._run(self._list, prefix)
+
+    # Batches run as one pool job each instead of one hop per file
+
+    async def save_many(self, items: Iterable[Tuple[str, bytes]]) -> List[str]:
+        items = list(items)
+        return await self._run(lambda: [self._write(key, content) for key, content in items])
+
+    async def get_many(self, file_paths: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        file_paths = list(file_paths)
+
+        def read_all() -> Dict[str, Optional[bytes]]:
+            contents = {}
+            for key in file_paths:
+                try:
+                    contents[key] = self._read(key)
+                except FileNotFoundError:
+                    contents[key] = None
+            return contents
+
+        return await self._run(read_all)
+
+    async def exists_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        file_paths = list(file_paths)
+        return await self._run(lambda: {key: self._full_path(key).is_file() for key in file_paths})
+
+class MemoryStorageProvider(StorageProvider):
+    """Dict-backed storage for tests and benchmarks; nothing touches the disk."""
+
+    def __init__(self):
+        self._files: Dict[str, bytes] = {}
+
+    async def save_file(self, file_path: str, content: bytes) -> str:
+        key = normalize_key(file_path)
+        self._files[key] = bytes(content)
+        return key
+
+    async def get_file(self, file_path: str) -> bytes:
+        key = normalize_key(file_path)
+        if key not in self._files:
+            raise FileNotFoundError(key)
+        return self._files[key]
+
+    async def delete_file(self, file_path: str) -> bool:
+        self._files.pop(normalize_key(file_path), None)
+        return True
+
+    async def exists(self, file_path: str) -> bool:
+        return normalize_key(file_path) in self._files
+
+    async def list_files(self, prefix: str) -> List[str]:
+        prefix = normalize_key(prefix)
+        return sorted(key for key in self._files if key == prefix or key.startswith(prefix + "/"))
+
+class S3Error(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"S3 error {status}: {message}")
+        self.status = status
+
+class S3StorageProvider(StorageProvider):
+    """Objects in an S3-compatible bucket, so every node sees the same jobs.
+
+    Requests are SigV4-signed and share one pooled aiohttp session. Objects above
+    S3_MULTIPART_THRESHOLD_MB are uploaded as concurrent multipart parts; reads can
+    be ranged; clients can be redirected to presigned URLs instead of proxying bytes.
+    Keys map to ``<S3_KEY_PREFIX><key>`` in S3_BUCKET, addressed path-style.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        if not settings.S3_BUCKET:
+            raise ValueError("S3_BUCKET is not configured")
+        endpoint = urlsplit(settings.S3_ENDPOINT_URL.rstrip("/"))
+        self.scheme = endpoint.scheme
+        self.host = endpoint.netloc
+        self.endpoint_path = endpoint.path
+        self.bucket = settings.S3_BUCKET
+        self.region = settings.S3_REGION
+        self.access_key = settings.S3_ACCESS_KEY_ID
+        self.secret_key = settings.S3_SECRET_ACCESS_KEY
+        self.key_prefix = settings.S3_KEY_PREFIX.strip("/") + "/" if settings.S3_KEY_PREFIX.strip("/") else ""
+        self.max_concurrency = settings.S3_MAX_CONNECTIONS
+        self.timeout = aiohttp.ClientTimeout(total=settings.S3_TIMEOUT_SECONDS)
+        self.multipart_threshold = settings.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024
+        self.part_size = max(5, settings.S3_MULTIPART_PART_SIZE_MB) * 1024 * 1024
+        self.multipart_concurrency = settings.S3_MULTIPART_CONCURRENCY
+        self.presign_expires = settings.S3_PRESIGN_EXPIRES_SECONDS
+
+    def _path(self, file_path: Optional[str] = None) -> str:
+        path = f"{self.endpoint_path}/{self.bucket}"
+        if file_path is not None:
+            path += f"/{self.key_prefix}{normalize_key(file_path)}"
+        return path
+
+    async def _request(self, method: str, file_path: Optional[str], query: Optional[Dict[str, str]] = None,
+                       headers: Optional[Dict[str, str]] = None, body: bytes = b"") -> Tuple[int, Mapping[str, str], bytes]:
+        query = query or {}
+        path = self._path(file_path)
+        # Hashing a multi-MB part is real CPU work; keep it off the event loop
+        payload_hash = await asyncio.to_thread(sha256_hex, body) if len(body) > 1024 * 1024 else sha256_hex(body)
+        signed = sign_headers(method, self.host, path, query, headers or {}, payload_hash,
+                              self.access_key, self.secret_key, self.region)
+        url = f"{self.scheme}://{self.host}{encode_path(path)}"
+        if query:
+            url += f"?{canonical_query(query)}"
+        session = get_http_session("storage")
+        async with session.request(method, URL(url, encoded=True), headers=signed,
+                                   data=body if body else None, timeout=self.timeout) as response:
+            return response.status, response.headers.copy(), await response.read()
+
+    def _check(self, status: int, body: bytes, file_path: Optional[str], ok: Tuple[int, ...] = (200,)) -> None:
+        if status == 404 and file_path is not None:
+            raise FileNotFoundError(file_path)
+        if status not in ok:
+            raise S3Error(status, body[:200].decode("utf-8", "replace"))
+
+    async def save_file(self, file_path: str, content: bytes) -> str:
+        if len(content) > self.multipart_threshold:
+            view = memoryview(content)
+            parts = [view[start:start + self.part_size] for start in range(0, len(content), self.part_size)]
+            await self._multipart_upload(file_path, len(parts), lambda number: parts[number - 1])
+        else:
+            status, _, body = await self._request("PUT", file_path, body=content)
+            self._check(status, body, None)
+        return f"s3://{self.bucket}/{self.key_prefix}{normalize_key(file_path)}"
+
+    async def import_file(self, file_path: str, source: Path) -> str:
+        size = await asyncio.to_thread(os.path.getsize, source)
+        if size <= self.multipart_threshold:
+            return await super().import_file(file_path, source)
+
+        def read_part(number: int) -> bytes:
+            with open(source, 'rb') as f:
+                f.seek((number - 1) * self.part_size)
+                return f.read(self.part_size)
+
+        # Parts are read from disk as they are sent, so memory stays at
+        # S3_MULTIPART_CONCURRENCY parts whatever the file size
+        part_count = (size + self.part_size - 1) // self.part_size
+        await self._multipart_upload(file_path, part_count, read_part, from_disk=True)
+        return f"s3://{self.bucket}/{self.key_prefix}{normalize_key(file_path)}"
+
+    async def _multipart_upload(self, file_path: str, part_count: int, read_part, from_disk: bool = False) -> None:
+        status, _, body = await self._request("POST", file_path, {"uploads": ""})
+        self._check(status, body, None)
+        upload_id = ElementTree.fromstring(body).findtext("{*}UploadId")
+        semaphore = asyncio.Semaphore(self.multipart_concurrency)
+
+        async def upload_part(number: int) -> str:
+            async with semaphore:
+                part = await asyncio.to_thread(read_part, number) if from_disk else read_part(number)
+                status, headers, body = await self._request(
+                    "PUT", file_path, {"partNumber": str(number), "uploadId": upload_id}, body=part
+                )
+                self._check(status, body, None)
+                return headers.get("ETag", "")
+
+        try:
+            etags = await asyncio.gather(*(upload_part(number) for number in range(1, part_count + 1)))
+            manifest = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                for number, etag in enumerate(etags, 1)
+            )
+            status, _, body = await self._request(
+                "POST", file_path, {"uploadId": upload_id},
+                body=f"<CompleteMultipartUpload>{manifest}</CompleteMultipartUpload>".encode()
+            )
+            # S3 can report a failed completion inside a 200 response
+            if status == 200 and b"<Error>" in body:
+                status = 500
+            self._check(status, body, None)
+        except BaseException:
+            # Abandoned uploads keep their parts (and their storage bill) until aborted
+            await asyncio.shield(self._request("DELETE", file_path, {"uploadId": upload_id}))
+            raise
+
+    async def get_file(self, file_path: str) -> bytes:
+        status, _, body = await self._request("GET", file_path)
+        self._check(status, body, file_path)
+        return body
+
+    async def get_range(self, file_path: str, start: int, end: int) -> bytes:
+        status, _, body = await self._request("GET", file_path, headers={"Range": f"bytes={start}-{end}"})
+        self._check(status, body, file_path, ok=(200, 206))
+        # A server that ignores Range sends the whole object
+        return body if status == 206 else body[start:end + 1]
+
+    async def delete_file(self, file_path: str) -> bool:
+        status, _, body = await self._request("DELETE", file_path)
+        return status in (200, 204, 404)
+
+    async def exists(self, file_path: str) -> bool:
+        status, _, body = await self._request("HEAD", file_path)
+        if status == 404:
             return False
+        self._check(status, body, file_path)
+        return True
+
+    async def list_files(self, prefix: str) -> List[str]:
+        full_prefix = f"{self.key_prefix}{normalize_key(prefix)}/"
+        keys, token = [], None
+        while True:
+            query = {"list-type": "2", "prefix": full_prefix}
+            if token:
+                query["continuation-token"] = token
+            status, _, body = await self._request("GET", None, query)
+            self._check(status, body, None)
+            root = ElementTree.fromstring(body)
+            keys.extend(key[len(self.key_prefix):] for key in
+                        (item.findtext("{*}Key") for item in root.findall("{*}Contents")) if key)
+            token = root.findtext("{*}NextContinuationToken")
+            if root.findtext("{*}IsTruncated") != "true" or not token:
+                return sorted(keys)
+
+    def presigned_url(self, file_path: str) -> Optional[str]:
+        path = self._path(file_path)
+        query = presign_query("GET", self.host, path, self.access_key, self.secret_key,
+                              self.region, self.presign_expires)
+        return f"{self.scheme}://{self.host}{encode_path(path)}?{query}"
 
 class StorageProviderFactory:
     _providers = {
-        'local': LocalStorageProvider
+        'local': LocalStorageProvider,
+        'memory': MemoryStorageProvider,
+        's3': S3StorageProvider
     }
-    
+
     @classmethod
     def create_provider(cls, provider_name: str = "local") -> StorageProvider:
         provider_name = provider_name.lower()
-        
+
         if provider_name not in cls._providers:
-            raise ValueError(f"Unknown storage provider: {provider_name}")
-        
+            available = ', '.join(cls._providers.keys())
+            raise ValueError(f"Unknown storage provider: {provider_name}. Available: {available}")
+
         return cls._providers[provider_name]()
+
+@lru_cache()
+def get_storage_provider() -> StorageProvider:
+    """The configured backend (STORAGE_PROVIDER), shared so in-memory state and
+    connection pools are not recreated per request."""
+    return StorageProviderFactory.create_provider(get_settings().STORAGE_PROVIDER)
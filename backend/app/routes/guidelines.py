@@ -1,8 +1,7 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from ..models.response_models import UploadResponse
-import os
-import uuid
-from pathlib import Path
+from ..services.guideline_store import GuidelineStore, GuidelineTooLargeError, InvalidGuidelineError
+from ..services.storage_quota import get_storage_quota
 
 router = APIRouter()
 
@@ -11,25 +10,20 @@ async def upload_guideline(file: UploadFile = File(...)):
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Get project root path (go up from backend/app/routes/)
-    current_file = Path(__file__)
-    project_root = current_file.parent.parent.parent.parent
-    uploads_dir = project_root / "data" / "uploads"
-    
-    # Create uploads directory
-    uploads_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_id = str(uuid.uuid4())
-    filename = f"{file_id}_{file.filename}"
-    file_path = uploads_dir / filename
-    
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    try:
+        stored = await GuidelineStore().save_upload(file)
+    except GuidelineTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidGuidelineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    get_storage_quota().touch_upload(stored["stored_name"])
     
     return UploadResponse(
-        file_id=file_id,
-        filename=filename,
-        file_path=str(file_path),
-        message="Guideline uploaded successfully"
+        file_id=stored["content_hash"],
+        filename=file.filename,
+        file_path=str(stored["path"]),
+        message="Guideline uploaded successfully",
+        content_hash=stored["content_hash"],
+        size=stored["size"],
+        deduplicated=stored["deduplicated"]
     )
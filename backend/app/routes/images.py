@@ -1,13 +1,24 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Query
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
 import asyncio
+import json
 import os
 from pathlib import Path
 from ..services.image_downloader import ImageDownloader
 from ..services.image_analyzer import ImageAnalyzer
+from ..services.image_renditions import ImageRenditions
+from ..services.job_exporter import JobExporter
+from ..services.guideline_store import GuidelineStore, GuidelineTooLargeError, InvalidGuidelineError
+from ..services.storage_quota import get_storage_quota
+from ..providers.storage_providers import get_storage_provider, normalize_key
+from ..core.cache import TTLCache
+from ..core.http_cache import IMMUTABLE_CACHE_CONTROL, cached_file_response
+from ..core.jobs import find_job, start_job
+from ..core.metrics import JOBS_CANCELLED_TOTAL, JOBS_QUEUED, track_job
+from ..core.tracing import find_trace
 from ..models.response_models import JobResponse
 import logging
 
@@ -18,60 +29,145 @@ class DownloadImagesRequest(BaseModel):
     query: str
     provider: str = "unsplash"
     limit: int = 20
+    # Cancel the job if it is still running after this many seconds
+    deadline_seconds: Optional[float] = Field(None, gt=0)
 
 class AnalyzeImagesRequest(BaseModel):
     job_id: str
     guideline_path: str
+    # Original file name of the uploaded PDF (stored as <sha256>.pdf), kept with the results
+    guideline_name: Optional[str] = None
+    deadline_seconds: Optional[float] = Field(None, gt=0)
 
 active_jobs = {}
+_renditions = ImageRenditions()
+# Rendition keys whose original is already narrower than the width asked for
+_narrow_originals = TTLCache(ttl=24 * 3600, max_entries=4096)
+
+def _protect_inputs(request: AnalyzeImagesRequest) -> None:
+    """Mark the job's images and guideline as just used so the compactor leaves them alone."""
+    quota = get_storage_quota()
+    quota.touch(request.job_id)
+    quota.touch_upload(Path(request.guideline_path).name)
+
+async def _report_cancelled(job_id: str, job_type: str) -> Optional[dict]:
+    """Status of a job cancelled through its JobControl, with what it had completed.
+
+    None when nobody asked for the cancellation (e.g. the server is shutting down),
+    in which case the caller should let the CancelledError propagate.
+    """
+    control = find_job(job_id)
+    if control is None or control.reason is None:
+        return None
+    from ..main import broadcast_to_job
+    
+    JOBS_CANCELLED_TOTAL.labels(job_type, control.reason).inc()
+    status = {
+        "status": "cancelled",
+        "reason": control.reason,
+        "result": control.completed,
+        "type": job_type
+    }
+    active_jobs[job_id] = status
+    # Whatever was downloaded before the cancel still counts toward the quota
+    await asyncio.to_thread(get_storage_quota().record_job, job_id)
+    await broadcast_to_job(job_id, status)
+    return status
 
 @router.post("/upload-guideline")
 async def upload_guideline(file: UploadFile = File(...)):
     """Upload guideline file"""
     try:
-        # Get project root path
-        current_file = Path(__file__)
-        project_root = current_file.parent.parent.parent.parent
-        uploads_dir = project_root / "data" / "uploads"
-        uploads_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Save file
-        file_path = uploads_dir / file.filename
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        stored = await GuidelineStore().save_upload(file)
+        get_storage_quota().touch_upload(stored["stored_name"])
         
         return {
             "success": True,
-            "file_path": f"data/uploads/{file.filename}",
-            "filename": file.filename
+            "file_path": stored["relative_path"],
+            "filename": file.filename,
+            "content_hash": stored["content_hash"],
+            "size": stored["size"],
+            "deduplicated": stored["deduplicated"]
         }
         
+    except GuidelineTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidGuidelineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+async def _stored_rendition(storage, key: str, job_id: str, filename: str, w: int) -> str:
+    """Storage key of the ``w`` rendition of ``key``, rendering and storing it on first use.
+
+    Falls back to ``key`` itself when the original is narrower than ``w`` (remembered,
+    so it is not downloaded again) or cannot be read.
+    """
+    rendition_key = _renditions.storage_key(job_id, filename, w)
+    if rendition_key in _narrow_originals:
+        return key
+    if await storage.exists(rendition_key):
+        return rendition_key
+    try:
+        original = await storage.get_file(key)
+    except FileNotFoundError:
+        return key
+    content = await asyncio.to_thread(_renditions.render, original, w)
+    if content is None:
+        _narrow_originals.set(rendition_key, True)
+        return key
+    await storage.save_file(rendition_key, content)
+    return rendition_key
+
 @router.get("/image/{job_id}/{filename}")
-async def get_image(job_id: str, filename: str):
-    """Serve images from job directory"""
+async def get_image(request: Request, job_id: str, filename: str, w: Optional[int] = Query(None, ge=16, le=4096)):
+    """Serve images from job directory.
+
+    Responses are immutable-cacheable and honour If-None-Match/If-Modified-Since and
+    byte ranges. ``w`` requests a resized rendition, generated once and cached on disk
+    (or, on object storage, stored under ``renditions/`` and redirected to like originals).
+    """
     try:
-        logger.info(f"Serving image - job_id: {job_id}, filename: {filename}")
+        logger.info(f"Serving image - job_id: {job_id}, filename: {filename}, w: {w}")
         
-        current_file = Path(__file__)
-        project_root = current_file.parent.parent.parent.parent
-        file_path = project_root / "data" / "images" / job_id / filename
+        storage = get_storage_provider()
+        try:
+            key = normalize_key(f"images/{job_id}/{filename}")
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"Image not found: {filename}")
         
-        logger.info(f"Looking for file at: {file_path}")
+        file_path = storage.local_path(key)
+        if file_path is None:
+            # Object storage: renditions are stored next to the originals, so the
+            # gallery's ?w= requests do not pull full-size images
+            if w:
+                key = await _stored_rendition(storage, key, job_id, filename, w)
+            url = storage.presigned_url(key)
+            if url:
+                # Object storage serves (and range-requests) the bytes itself
+                get_storage_quota().touch(job_id)
+                return RedirectResponse(url, status_code=307)
+            try:
+                content = await storage.get_file(key)
+            except FileNotFoundError:
+                logger.error(f"File not found: {key}")
+                raise HTTPException(status_code=404, detail=f"Image not found: {filename}")
+            get_storage_quota().touch(job_id)
+            return Response(content, media_type="image/jpeg", headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
         
-        if not file_path.exists():
-            logger.error(f"File not found: {file_path}")
+        if not await storage.exists(key):
+            logger.error(f"File not found: {key}")
             raise HTTPException(status_code=404, detail=f"Image not found: {filename}")
         
-        return FileResponse(
-            path=str(file_path),
-            media_type="image/jpeg",
-            filename=filename
-        )
+        get_storage_quota().touch(job_id)
+        
+        if w:
+            rendition = await asyncio.to_thread(_renditions.get_rendition, file_path, job_id, w)
+            if rendition:
+                file_path = rendition
+        
+        return cached_file_response(request, file_path, filename=filename, media_type="image/jpeg")
         
     except HTTPException:
         raise
@@ -79,12 +175,35 @@ async def get_image(job_id: str, filename: str):
         logger.error(f"Error serving image: {e}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+@router.get("/export/{job_id}")
+async def export_job(job_id: str, format: str = Query("zip", pattern="^(zip|tar)$"),
+                     min_score: Optional[int] = Query(None, ge=0, le=10)):
+    """Stream a ZIP or tar archive of a job's images plus its analysis results.
+
+    The archive is generated on the fly from the storage provider; only the object
+    being archived is held in memory. ``min_score`` keeps only images rated at or above it.
+    """
+    exporter = JobExporter()
+    entries = await exporter.collect_entries(job_id, min_score)
+    if entries is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    
+    get_storage_quota().touch(job_id)
+    logger.info(f"Exporting {len(entries)} files for job {job_id} as {format}")
+    archive_name = exporter.archive_filename(job_id, format)
+    return StreamingResponse(
+        exporter.stream(entries, format),
+        media_type=JobExporter.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{archive_name}"'}
+    )
+
 @router.post("/download-images", response_model=JobResponse)
-async def download_images(request: DownloadImagesRequest, background_tasks: BackgroundTasks):
+async def download_images(request: DownloadImagesRequest):
     job_id = str(uuid.uuid4())
     active_jobs[job_id] = {"status": "started", "progress": 0}
+    JOBS_QUEUED.labels("download").inc()
     
-    background_tasks.add_task(download_images_task, job_id, request)
+    start_job(job_id, download_images_task(job_id, request), request.deadline_seconds)
     
     return JobResponse(
         job_id=job_id,
@@ -93,41 +212,48 @@ async def download_images(request: DownloadImagesRequest, background_tasks: Back
     )
 
 async def download_images_task(job_id: str, request: DownloadImagesRequest):
-    try:
-        from ..main import broadcast_to_job
+    with track_job("download"):
+        try:
+            from ..main import broadcast_to_job
         
-        await broadcast_to_job(job_id, {"status": "downloading", "progress": 0})
-        
-        downloader = ImageDownloader()
-        result = await downloader.download_images(
-            query=request.query,
-            provider=request.provider,
-            limit=request.limit,
-            job_id=job_id
-        )
-        
-        active_jobs[job_id] = {
-            "status": "completed",
-            "progress": 100,
-            "result": result,
-            "type": "download"
-        }
+            await broadcast_to_job(job_id, {"status": "downloading", "progress": 0})
         
-        await broadcast_to_job(job_id, {
-            "status": "completed",
-            "progress": 100,
-            "result": result
-        })
+            downloader = ImageDownloader()
+            result = await downloader.download_images(
+                query=request.query,
+                provider=request.provider,
+                limit=request.limit,
+                job_id=job_id
+            )
+            await asyncio.to_thread(get_storage_quota().record_job, job_id)
         
-    except Exception as e:
-        active_jobs[job_id] = {"status": "error", "error": str(e)}
-        await broadcast_to_job(job_id, {"status": "error", "error": str(e)})
+            active_jobs[job_id] = {
+                "status": "completed",
+                "progress": 100,
+                "result": result,
+                "type": "download"
+            }
+        
+            await broadcast_to_job(job_id, {
+                "status": "completed",
+                "progress": 100,
+                "result": result
+            })
+        
+        except asyncio.CancelledError:
+            if await _report_cancelled(job_id, "download") is None:
+                raise
+        except Exception as e:
+            active_jobs[job_id] = {"status": "error", "error": str(e)}
+            await broadcast_to_job(job_id, {"status": "error", "error": str(e)})
 
 @router.post("/analyze-images", response_model=JobResponse)
-async def analyze_images(request: AnalyzeImagesRequest, background_tasks: BackgroundTasks):
+async def analyze_images(request: AnalyzeImagesRequest):
     active_jobs[request.job_id] = {"status": "analyzing", "progress": 0}
+    _protect_inputs(request)
+    JOBS_QUEUED.labels("analysis").inc()
     
-    background_tasks.add_task(analyze_images_task, request.job_id, request)
+    start_job(request.job_id, analyze_images_task(request.job_id, request), request.deadline_seconds)
     
     return JobResponse(
         job_id=request.job_id,
@@ -136,33 +262,142 @@ async def analyze_images(request: AnalyzeImagesRequest, background_tasks: Backgr
     )
 
 async def analyze_images_task(job_id: str, request: AnalyzeImagesRequest):
-    try:
-        from ..main import broadcast_to_job
+    with track_job("analysis"):
+        try:
+            from ..main import broadcast_to_job
         
-        await broadcast_to_job(job_id, {"status": "analyzing", "progress": 0})
+            await broadcast_to_job(job_id, {"status": "analyzing", "progress": 0})
         
-        analyzer = ImageAnalyzer()
-        result = await analyzer.analyze_images(
-            guideline_path=request.guideline_path,
-            job_id=job_id
-        )
+            analyzer = ImageAnalyzer()
+            result = await analyzer.analyze_images(
+                guideline_path=request.guideline_path,
+                job_id=job_id,
+                guideline_name=request.guideline_name
+            )
+            await asyncio.to_thread(get_storage_quota().record_job, job_id)
         
-        active_jobs[job_id] = {
-            "status": "completed",
-            "progress": 100,
-            "result": result,
-            "type": "analysis"
-        }
+            active_jobs[job_id] = {
+                "status": "completed",
+                "progress": 100,
+                "result": result,
+                "type": "analysis"
+            }
         
-        await broadcast_to_job(job_id, {
-            "status": "completed",
-            "progress": 100,
-            "result": result
-        })
+            await broadcast_to_job(job_id, {
+                "status": "completed",
+                "progress": 100,
+                "result": result
+            })
         
-    except Exception as e:
-        active_jobs[job_id] = {"status": "error", "error": str(e)}
-        await broadcast_to_job(job_id, {"status": "error", "error": str(e)})
+        except asyncio.CancelledError:
+            if await _report_cancelled(job_id, "analysis") is None:
+                raise
+        except Exception as e:
+            active_jobs[job_id] = {"status": "error", "error": str(e)}
+            await broadcast_to_job(job_id, {"status": "error", "error": str(e)})
+
+@router.post("/analyze-images/stream")
+async def analyze_images_stream(request: AnalyzeImagesRequest):
+    """Run an analysis and stream ratings as NDJSON, one line per finished batch.
+
+    Lines are ``{"type": "ratings", ...}`` events followed by a final
+    ``{"type": "completed", "result": ...}``, ``{"type": "error", ...}`` or
+    ``{"type": "cancelled", ...}``. The job keeps running if the client
+    disconnects; stop it with ``POST /cancel-job/{job_id}`` or ``deadline_seconds``.
+    """
+    job_id = request.job_id
+    active_jobs[job_id] = {"status": "analyzing", "progress": 0}
+    _protect_inputs(request)
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def on_ratings(event: dict):
+        await queue.put({"type": "ratings", "job_id": job_id, **event})
+    
+    async def run_analysis():
+        from ..main import broadcast_to_job
+        with track_job("analysis"):
+            try:
+                analyzer = ImageAnalyzer()
+                result = await analyzer.analyze_images(
+                    guideline_path=request.guideline_path,
+                    job_id=job_id,
+                    on_ratings=on_ratings,
+                    guideline_name=request.guideline_name
+                )
+                await asyncio.to_thread(get_storage_quota().record_job, job_id)
+                active_jobs[job_id] = {
+                    "status": "completed",
+                    "progress": 100,
+                    "result": result,
+                    "type": "analysis"
+                }
+                await broadcast_to_job(job_id, {"status": "completed", "progress": 100, "result": result})
+                await queue.put({"type": "completed", "job_id": job_id, "result": result})
+            except asyncio.CancelledError:
+                status = await _report_cancelled(job_id, "analysis")
+                if status is None:
+                    raise
+                await queue.put({**status, "type": "cancelled", "job_id": job_id})
+            except Exception as e:
+                logger.error(f"Streaming analysis failed for job {job_id}: {e}")
+                active_jobs[job_id] = {"status": "error", "error": str(e)}
+                await broadcast_to_job(job_id, {"status": "error", "error": str(e)})
+                await queue.put({"type": "error", "job_id": job_id, "error": str(e)})
+            finally:
+                await queue.put(None)
+    
+    JOBS_QUEUED.labels("analysis").inc()
+    start_job(job_id, run_analysis(), request.deadline_seconds)
+    
+    async def ndjson_lines():
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.get("/job-trace/{job_id}")
+async def get_job_trace(job_id: str):
+    """Stage timings (search, downloads, preprocessing, batches, parsing) for a job.
+
+    Spans carry ``start_ms``/``duration_ms`` offsets from the job start plus a
+    ``parent_id`` and ``depth``, ready to draw as a waterfall.
+    """
+    trace = find_trace(job_id)
+    if trace:
+        return trace.to_dict()
+    
+    try:
+        key = normalize_key(f"results/{job_id}_analysis.json")
+        saved = json.loads(await get_storage_provider().get_file(key))
+    except (ValueError, FileNotFoundError):
+        saved = {}
+    if saved.get("trace"):
+        return saved["trace"]
+    
+    raise HTTPException(status_code=404, detail="Trace not found")
+
+@router.post("/cancel-job/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """Stop a running download or analysis.
+
+    In-flight requests are aborted; images and ratings completed so far are kept
+    and reported under ``result`` in the job status once it reads ``cancelled``.
+    """
+    control = find_job(job_id)
+    if control is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not control.running:
+        raise HTTPException(status_code=409, detail="Job is not running")
+    
+    control.cancel()
+    return JobResponse(
+        job_id=job_id,
+        status="cancelling",
+        message="Cancellation requested"
+    )
 
 @router.get("/job-status/{job_id}")
 async def get_job_status(job_id: str):
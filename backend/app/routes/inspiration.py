@@ -1,14 +1,19 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 import os
 import json
 import asyncio
-import aiohttp
-import google.generativeai as genai
 import logging
 import traceback
+from functools import lru_cache
 from pathlib import Path
+from ..services.url_checker import get_url_checker
+from ..core.cache import TTLCache, SingleFlight
+from ..core.config import get_settings
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -23,14 +28,9 @@ class InspirationResponse(BaseModel):
     message: str = ""
 
 async def is_url_alive(url: str) -> bool:
-    try:
-        timeout = aiohttp.ClientTimeout(total=3)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.head(url, allow_redirects=True) as response:
-                return response.status < 400
-    except:
-        return False
+    return await get_url_checker().is_alive(url)
 
+@lru_cache()
 def load_prompt_template() -> str:
     prompt_file = Path(__file__).parent.parent.parent / "prompts_inspire.txt"
     
@@ -48,19 +48,32 @@ PROMPT_EOF
     with open(prompt_file, 'r') as f:
         return f.read()
 
+@lru_cache()
+def get_gemini_model(api_key: str) -> "genai.GenerativeModel":
+    # The SDK (and grpc under it) costs ~0.7s and tens of MB; only pay it on first use
+    import google.generativeai as genai
+    endpoint = get_settings().GEMINI_API_ENDPOINT
+    client_options = {"api_endpoint": endpoint}
+    if endpoint.startswith("http://"):
+        # Plain-HTTP endpoints (local stand-ins) are only reachable over REST
+        genai.configure(api_key=api_key, client_options=client_options, transport="rest")
+    else:
+        genai.configure(api_key=api_key, client_options=client_options)
+    return genai.GenerativeModel('models/gemini-2.5-pro')
+
 def get_inspiration_from_gemini(keywords: List[str], api_key: str, count: int = 10) -> List[Dict]:
+    """Blocking Gemini call; run it with ``asyncio.to_thread`` from async code."""
     try:
         logger.info(f"Contacting Gemini with keywords: {', '.join(keywords)}")
         
-        client_options = {"api_endpoint": "generativelanguage.googleapis.com"}
-        genai.configure(api_key=api_key, client_options=client_options)
-        model = genai.GenerativeModel('models/gemini-2.5-pro')
+        model = get_gemini_model(api_key)
         
         user_keywords = ", ".join(keywords)
         prompt_template = load_prompt_template()
         prompt = prompt_template.format(count=count, user_keywords=user_keywords)
         
-        generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
+        from google.generativeai.types import GenerationConfig
+        generation_config = GenerationConfig(response_mime_type="application/json")
         response = model.generate_content(prompt, generation_config=generation_config)
         results = json.loads(response.text)
         
@@ -75,6 +88,80 @@ def get_inspiration_from_gemini(keywords: List[str], api_key: str, count: int =
         logger.error(traceback.format_exc())
         return []
 
+def inspiration_cache_key(keywords: List[str], count: int) -> str:
+    normalized = sorted({k.strip().lower() for k in keywords if k and k.strip()})
+    return json.dumps([normalized, count])
+
+@lru_cache()
+def get_inspiration_cache() -> TTLCache:
+    settings = get_settings()
+    persist_path = None
+    if settings.INSPIRATION_CACHE_PATH:
+        persist_path = Path(settings.INSPIRATION_CACHE_PATH)
+        if not persist_path.is_absolute():
+            persist_path = Path(__file__).parent.parent.parent.parent / persist_path
+    return TTLCache(
+        ttl=settings.INSPIRATION_CACHE_TTL_SECONDS,
+        max_entries=settings.INSPIRATION_CACHE_MAX_ENTRIES,
+        persist_path=persist_path
+    )
+
+_inspiration_flights = SingleFlight()
+_persist_lock = asyncio.Lock()
+_persist_tasks = set()
+
+async def _persist_cache(cache: TTLCache) -> None:
+    # One write at a time; the snapshot is taken on the loop, only the file I/O runs in a thread
+    async with _persist_lock:
+        await asyncio.to_thread(cache.save, cache.snapshot())
+
+def schedule_cache_save(cache: TTLCache) -> None:
+    """Persist the cache in the background; responses do not wait for the disk."""
+    task = asyncio.create_task(_persist_cache(cache))
+    _persist_tasks.add(task)
+    task.add_done_callback(_persist_tasks.discard)
+
+async def compute_inspiration(keywords: List[str], api_key: str, count: int) -> InspirationResponse:
+    logger.info(f"Fetching inspiration for keywords: {keywords}")
+    
+    inspiration_list = await asyncio.to_thread(
+        get_inspiration_from_gemini,
+        keywords, 
+        api_key, 
+        count
+    )
+    
+    if not inspiration_list:
+        return InspirationResponse(
+            success=False,
+            websites=[],
+            message="Could not get results from Gemini"
+        )
+    
+    results = await get_url_checker().check_many([item.get('url') for item in inspiration_list])
+    
+    live_websites = []
+    for item, is_alive in zip(inspiration_list, results):
+        url = item.get('url')
+        if is_alive:
+            live_websites.append(item)
+        else:
+            logger.warning(f"Discarding unavailable URL: {url}")
+    
+    if not live_websites:
+        return InspirationResponse(
+            success=False,
+            websites=[],
+            message="No live URLs found in Gemini results"
+        )
+    
+    logger.info(f"Returning {len(live_websites)} verified websites")
+    return InspirationResponse(
+        success=True,
+        websites=live_websites,
+        message=f"Found {len(live_websites)} design references"
+    )
+
 @router.post("/inspiration", response_model=InspirationResponse)
 async def get_inspiration(request: InspirationRequest):
     try:
@@ -82,45 +169,24 @@ async def get_inspiration(request: InspirationRequest):
         if not gemini_api_key:
             raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
         
-        logger.info(f"Fetching inspiration for keywords: {request.keywords}")
+        cache = get_inspiration_cache()
+        key = inspiration_cache_key(request.keywords, request.count)
         
-        inspiration_list = get_inspiration_from_gemini(
-            request.keywords, 
-            gemini_api_key, 
-            request.count
-        )
-        
-        if not inspiration_list:
-            return InspirationResponse(
-                success=False,
-                websites=[],
-                message="Could not get results from Gemini"
-            )
-        
-        tasks = [is_url_alive(item.get('url')) for item in inspiration_list]
-        results = await asyncio.gather(*tasks)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"Inspiration cache hit for {key}")
+            return InspirationResponse(**cached)
         
-        live_websites = []
-        for item, is_alive in zip(inspiration_list, results):
-            url = item.get('url')
-            if is_alive:
-                live_websites.append(item)
-            else:
-                logger.warning(f"Discarding unavailable URL: {url}")
+        async def compute_and_store() -> InspirationResponse:
+            response = await compute_inspiration(request.keywords, gemini_api_key, request.count)
+            # Only successful answers are cached; failures are worth retrying
+            if response.success:
+                cache.set(key, response.model_dump())
+                schedule_cache_save(cache)
+            return response
         
-        if not live_websites:
-            return InspirationResponse(
-                success=False,
-                websites=[],
-                message="No live URLs found in Gemini results"
-            )
-        
-        logger.info(f"Returning {len(live_websites)} verified websites")
-        return InspirationResponse(
-            success=True,
-            websites=live_websites,
-            message=f"Found {len(live_websites)} design references"
-        )
+        # Identical concurrent requests share one Gemini call
+        return await _inspiration_flights.do(key, compute_and_store)
         
     except Exception as e:
         logger.error(f"Error in inspiration endpoint: {e}")
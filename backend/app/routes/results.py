@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from ..services.results_catalog import InvalidCursorError, get_results_catalog
+
+router = APIRouter()
+
+@router.get("/ratings")
+async def query_ratings(
+    guideline_hash: Optional[str] = None,
+    job_id: Optional[str] = None,
+    provider: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+    max_score: Optional[int] = Query(None, ge=0, le=10),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_estimated: bool = True,
+    sort: str = Query("score", pattern="^(score|recent)$"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """Ratings across all jobs from the results catalog, one page at a time.
+
+    E.g. ``?guideline_hash=<sha256>&min_score=8&since=2024-05-01``. Follow
+    ``next_cursor`` (null on the last page) to page through the rest.
+    """
+    try:
+        page = await asyncio.to_thread(
+            get_results_catalog().query,
+            guideline_hash=guideline_hash,
+            job_id=job_id,
+            provider=provider,
+            min_score=min_score,
+            max_score=max_score,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+            include_estimated=include_estimated,
+            sort=sort,
+            limit=limit,
+            cursor=cursor
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"success": True, **page}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from ..models.response_models import HealthResponse
+from ..services.storage_quota import get_storage_quota
 
 router = APIRouter()
 
@@ -9,3 +10,8 @@ async def health_check():
         status="healthy",
         message="API is running"
     )
+
+@router.get("/storage")
+async def storage_usage():
+    """Bytes used under data/ by kind, largest jobs, quota watermarks and the last compaction."""
+    return get_storage_quota().usage()
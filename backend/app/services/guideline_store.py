@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import uuid
+import aiofiles
+from pathlib import Path
+from typing import Dict, Any
+from fastapi import UploadFile
+from ..core.config import get_settings
+from ..providers.storage_providers import get_storage_provider
+
+logger = logging.getLogger(__name__)
+
+class GuidelineTooLargeError(Exception):
+    pass
+
+class InvalidGuidelineError(Exception):
+    pass
+
+class GuidelineStore:
+    """Content-addressed storage for guideline PDFs.
+
+    Uploads are streamed to disk in chunks while their SHA-256 is computed, so a large
+    brand book is never held in memory, then handed to the storage provider as
+    ``uploads/<sha256>.pdf``; uploading the same PDF twice keeps a single copy.
+    """
+    CHUNK_SIZE = 1024 * 1024
+    PDF_MAGIC = b"%PDF-"
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.project_root = Path(__file__).parent.parent.parent.parent
+        self.uploads_dir = self.project_root / "data" / "uploads"
+        self.max_bytes = self.settings.MAX_GUIDELINE_SIZE_MB * 1024 * 1024
+
+    async def save_upload(self, file: UploadFile) -> Dict[str, Any]:
+        self.uploads_dir.mkdir(parents=True, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        tmp_path = self.uploads_dir / f".{uuid.uuid4().hex}.part"
+
+        try:
+            async with aiofiles.open(tmp_path, "wb") as out:
+                while True:
+                    chunk = await file.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if size == 0 and not chunk.startswith(self.PDF_MAGIC):
+                        raise InvalidGuidelineError("File is not a valid PDF")
+
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise GuidelineTooLargeError(
+                            f"Guideline exceeds the {self.settings.MAX_GUIDELINE_SIZE_MB} MB limit"
+                        )
+
+                    hasher.update(chunk)
+                    await out.write(chunk)
+
+            if size == 0:
+                raise InvalidGuidelineError("Uploaded file is empty")
+
+            content_hash = hasher.hexdigest()
+            stored_name = f"{content_hash}.pdf"
+            storage = get_storage_provider()
+            key = f"uploads/{stored_name}"
+
+            deduplicated = await storage.exists(key)
+            if deduplicated:
+                logger.info(f"Guideline {file.filename} already stored as {stored_name}")
+            else:
+                await storage.import_file(key, tmp_path)
+                logger.info(f"Stored guideline {file.filename} as {stored_name} ({size} bytes)")
+
+            return {
+                "content_hash": content_hash,
+                "stored_name": stored_name,
+                "path": storage.local_path(key) or key,
+                "relative_path": f"data/uploads/{stored_name}",
+                "size": size,
+                "deduplicated": deduplicated
+            }
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def content_hash(self, path: Path) -> str:
+        """SHA-256 of a stored guideline. Blocking; run it in a thread.
+
+        Files saved by ``save_upload`` are named after their hash, so it is only
+        computed for guidelines that reached data/uploads some other way.
+        """
+        path = Path(path)
+        stem = path.stem.lower()
+        if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+            return stem
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
@@ -1,12 +1,27 @@
 import asyncio
 import base64
 import os
+import re
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-from PIL import Image
-import PyPDF2
+from typing import List, Dict, Any, Optional, Callable, Awaitable, AsyncIterator, Tuple, TYPE_CHECKING
 from ..providers.ai_providers import AIProviderFactory
+from ..providers.payload_profiles import LEGACY_PROFILE, PayloadProfile, parse_profile
+from ..providers.storage_providers import get_storage_provider
+from .guideline_store import GuidelineStore
+from .results_catalog import get_results_catalog
 from ..core.config import get_settings
+from ..core.metrics import IMAGE_PAYLOAD_BYTES, IMAGE_PREPROCESS_SECONDS
+from ..core.jobs import find_job, record_completed
+from ..core.resilience import job_retry_budget
+from ..core.tracing import get_trace, trace_span
+
+# PIL, PyPDF2 and NumPy (dedup, prescoring) are imported where they are used so that
+# workers which never analyze anything do not load them at startup.
+if TYPE_CHECKING:
+    from PIL import Image
+
+RATING_LINE_PATTERN = re.compile(r'([^:]+\.(?:jpg|jpeg|png|gif|webp))\s*:\s*(\d+)(?:/10)?', re.IGNORECASE)
 
 class ImageAnalyzer:
     def __init__(self):
@@ -15,6 +30,7 @@ class ImageAnalyzer:
         self.images_dir = self.project_root / "data" / "images"
         self.uploads_dir = self.project_root / "data" / "uploads"
         self.prompt_file = self.project_root / "prompts_images.txt"
+        self.storage = get_storage_provider()
     
     def _load_prompt_template(self) -> str:
         if not self.prompt_file.exists():
@@ -31,113 +47,290 @@ PROMPT_EOF
         with open(self.prompt_file, 'r') as f:
             return f.read()
     
-    async def analyze_images(self, guideline_path: str, job_id: str) -> Dict[str, Any]:
+    async def analyze_images(self, guideline_path: str, job_id: str,
+                             on_ratings: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                             guideline_name: Optional[str] = None) -> Dict[str, Any]:
+        """Analyze the job's images against a guideline.
+
+        ``guideline_name`` is the PDF's original file name, recorded with the results;
+        uploads are stored under their content hash, which is the fallback.
+
+        Ratings are parsed batch by batch as the provider returns them and pushed
+        over the job's websocket (``partial_ratings``). ``on_ratings``, when given,
+        receives the same per-batch events, e.g. to feed an NDJSON stream.
+        Stage timings are recorded in the job trace and saved with the results.
+        Provider retries are charged to the job's retry budget.
+        
+        If the job is cancelled, the ratings of the batches that already came back are
+        saved (they were paid for) and recorded for the route to report.
+        """
+        guideline_name = guideline_name or Path(guideline_path).name
+        with job_retry_budget(job_id), get_trace(job_id).span("analysis", guideline=guideline_name) as span:
+            try:
+                outcome = await self._analyze_images(guideline_path, job_id, on_ratings, guideline_name)
+            except asyncio.CancelledError:
+                control = find_job(job_id)
+                if control and control.completed and control.completed.get("ratings"):
+                    await self._save_analysis_results(job_id, control.completed)
+                raise
+            span.set(success=outcome.get("success", False), rated=len(outcome.get("ratings", [])))
+        
+        if outcome.get("success"):
+            await self._save_analysis_results(job_id, outcome)
+        return outcome
+    
+    async def _analyze_images(self, guideline_path: str, job_id: str,
+                              on_ratings: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+                              guideline_name: Optional[str] = None) -> Dict[str, Any]:
         try:
             if not Path(guideline_path).is_absolute():
                 guideline_full_path = self.project_root / guideline_path
             else:
                 guideline_full_path = Path(guideline_path)
-                
-            pdf_content = self._read_pdf_content(str(guideline_full_path))
-            if not pdf_content:
-                return {"success": False, "message": "Could not read PDF content"}
+            guideline_key = self._storage_key(guideline_full_path)
             
-            images_dir = self.images_dir / job_id
-            if not images_dir.exists():
-                return {"success": False, "message": f"Images not found for job: {images_dir}"}
+            # Sorted so the best-ranked shot of a near-duplicate cluster is the one rated
+            image_keys = [key for key in await self.storage.list_files(f"images/{job_id}") if key.endswith(".jpg")]
+            if not image_keys:
+                return {"success": False, "message": f"Images not found for job: {job_id}"}
+            stored_paths = {Path(key).name: str(self.storage.local_path(key) or key) for key in image_keys}
             
-            image_files = list(images_dir.glob("*.jpg"))
-            if not image_files:
-                return {"success": False, "message": "No images found to analyze"}
+            # PyPDF2 and PIL want real files; this only copies when storage is not the local disk
+            keys = image_keys + ([guideline_key] if guideline_key else [])
+            async with self.storage.local_files(keys) as local:
+                if guideline_key:
+                    if guideline_key not in local:
+                        return {"success": False, "message": "Could not read PDF content"}
+                    guideline_file = local[guideline_key]
+                else:
+                    # Outside data/ (e.g. scripts passing an absolute path): read it in place
+                    guideline_file = guideline_full_path
+                image_files = [local[key] for key in image_keys if key in local]
+                return await self._analyze_files(job_id, guideline_file, guideline_name or guideline_full_path.name,
+                                                 image_files, stored_paths, on_ratings)
+                
+        except Exception as e:
+            return {"success": False, "message": str(e)}
+    
+    def _storage_key(self, path: Path) -> Optional[str]:
+        """Storage key for a path under data/, or None for files kept elsewhere."""
+        try:
+            return path.resolve().relative_to((self.project_root / "data").resolve()).as_posix()
+        except ValueError:
+            return None
+    
+    async def _analyze_files(self, job_id: str, guideline_file: Path, guideline_name: str, image_files: List[Path],
+                             stored_paths: Dict[str, str],
+                             on_ratings: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+        with trace_span("read_guideline") as pdf_span:
+            pdf_content = await asyncio.to_thread(self._read_pdf_content, str(guideline_file))
+            pdf_span.set(chars=len(pdf_content or ""))
+        if not pdf_content:
+            return {"success": False, "message": "Could not read PDF content"}
+        
+        if not image_files:
+            return {"success": False, "message": "No images found to analyze"}
+        
+        guideline_hash = await asyncio.to_thread(GuidelineStore().content_hash, guideline_file)
+        
+        all_info = [{"filename": img_path.name, "path": stored_paths.get(img_path.name, str(img_path))}
+                    for img_path in image_files]
+        filename_to_info = {info["filename"]: info for info in all_info}
+        
+        duplicates = {}
+        if self.settings.DEDUP_ENABLED and len(image_files) > 1:
+            with trace_span("dedup", images=len(image_files)) as dedup_span:
+                duplicates = await asyncio.to_thread(self._find_duplicates, image_files)
+                dedup_span.set(duplicates=len(duplicates))
+        duplicates_of: Dict[str, List[str]] = {}
+        for duplicate, representative in duplicates.items():
+            duplicates_of.setdefault(representative, []).append(duplicate)
+        image_files = [img_path for img_path in image_files if img_path.name not in duplicates]
+        
+        estimated = {}
+        if (self.settings.PRESCORE_MIN_SCORE > 0 or self.settings.PRESCORE_TOP_K > 0) and len(image_files) > 1:
+            with trace_span("prescore", images=len(image_files)) as prescore_span:
+                image_files, estimated = await asyncio.to_thread(self._prescore, image_files, pdf_content)
+                prescore_span.set(estimated=len(estimated))
+        estimated_ratings = self._propagate_to_duplicates([
+            self._build_estimated_rating(filename, estimate, filename_to_info)
+            for filename, estimate in estimated.items()
+        ], duplicates_of, filename_to_info)
+        
+        from ..main import broadcast_to_job
+        notes = []
+        if duplicates:
+            notes.append(f"{len(duplicates)} near-duplicates will share ratings")
+        if estimated:
+            notes.append(f"{len(estimated)} scored locally")
+        await broadcast_to_job(job_id, {
+            "status": "analyzing",
+            "progress": 10,
+            "message": f"Sending {len(image_files)} images to AI for analysis..."
+                       + (f" ({', '.join(notes)})" if notes else ""),
+            "partial_ratings": estimated_ratings
+        })
+        if on_ratings and estimated_ratings:
+            await on_ratings({"batch": 0, "total_batches": 0, "ratings": estimated_ratings, "estimated": True})
+        
+        image_info = [filename_to_info[img_path.name] for img_path in image_files]
+        
+        provider_name = self.settings.AI_PROVIDER.lower()
+        ai_provider = AIProviderFactory.create_provider(provider_name)
+        
+        prompt = self._create_batch_prompt(pdf_content, image_info)
+        
+        streamed_ratings = []
+        streamed_usage: Dict[str, int] = {}
+        batches_done = 0
+        
+        async def on_batch(batch_num: int, total_batches: int, batch_filenames: List[str], batch_result: Dict) -> None:
+            nonlocal batches_done
+            if batch_result.get("success"):
+                batches_done += 1
+                for key, value in batch_result.get("usage", {}).items():
+                    streamed_usage[key] = streamed_usage.get(key, 0) + value
+                with trace_span("parse_batch", batch=batch_num):
+                    if "ratings" in batch_result:
+                        # Structured output: already validated and mapped to filenames
+                        partial = [
+                            self._build_rating(r["filename"], r["score"], r["explanation"], filename_to_info)
+                            for r in batch_result["ratings"]
+                        ]
+                    else:
+                        partial = self._parse_ratings(batch_result["response"], image_info)
+                    partial = self._propagate_to_duplicates(partial, duplicates_of, filename_to_info)
+                # With hedging, each batch is answered by whichever provider won the race
+                for rating in partial:
+                    rating["provider"] = batch_result.get("provider", provider_name)
+                streamed_ratings.extend(partial)
+                event = {
+                    "batch": batch_num,
+                    "total_batches": total_batches,
+                    "ratings": partial
+                }
+            else:
+                event = {
+                    "batch": batch_num,
+                    "total_batches": total_batches,
+                    "ratings": [],
+                    "error": batch_result.get("error", "Unknown error"),
+                    "filenames": batch_filenames
+                }
             
-            from ..main import broadcast_to_job
             await broadcast_to_job(job_id, {
                 "status": "analyzing",
-                "progress": 10,
-                "message": f"Processing {len(image_files)} images..."
+                "progress": int(30 + batch_num / total_batches * 50),
+                "message": f"Batch {batch_num}/{total_batches} done ({len(streamed_ratings)} images rated)",
+                "partial_ratings": event["ratings"],
+                "batch": batch_num,
+                "total_batches": total_batches
             })
             
-            images_base64, image_info = await self._process_images_async(image_files, job_id)
-            
-            if not images_base64:
-                return {"success": False, "message": "No images could be processed"}
-            
-            await broadcast_to_job(job_id, {
-                "status": "analyzing",
-                "progress": 30,
-                "message": f"Sending {len(images_base64)} images to AI for analysis..."
+            if on_ratings:
+                await on_ratings(event)
+        
+        try:
+            result = await ai_provider.analyze_images(
+                self._encode_images(image_files, ai_provider.payload_profile), prompt, job_id,
+                on_batch=on_batch,
+                total_images=len(image_files)
+            )
+        except asyncio.CancelledError:
+            # Requests in flight are aborted; report the batches that made it
+            ratings = sorted(streamed_ratings + estimated_ratings, key=lambda x: x["score"], reverse=True)
+            record_completed(job_id, {
+                "success": bool(ratings),
+                "message": f"Analysis cancelled after {batches_done} batch(es). Rated {len(ratings)} images.",
+                "ratings": ratings,
+                "partial": True,
+                "usage": streamed_usage,
+                "provider": provider_name,
+                "guideline": guideline_name,
+                "guideline_hash": guideline_hash,
+                "batches_info": {"batches_processed": batches_done},
+                "job_id": job_id
             })
+            raise
+        
+        await broadcast_to_job(job_id, {
+            "status": "analyzing",
+            "progress": 90,
+            "message": "Processing AI response..."
+        })
+        
+        # A late failure should not discard the batches that already came back
+        if not result["success"] and streamed_ratings:
+            result = {
+                "success": True,
+                "partial": True,
+                "response": "",
+                "usage": result.get("usage", {}),
+                "error": result.get("error")
+            }
+        
+        if result["success"]:
+            if streamed_ratings:
+                ratings = list(streamed_ratings)
+            else:
+                ratings = self._propagate_to_duplicates(
+                    self._parse_ratings(result["response"], image_info), duplicates_of, filename_to_info
+                )
+                for rating in ratings:
+                    rating["provider"] = provider_name
+            ratings.extend(estimated_ratings)
+            ratings.sort(key=lambda x: x["score"], reverse=True)
             
-            ai_provider = AIProviderFactory.create_provider("openai")
-            
-            prompt = self._create_batch_prompt(pdf_content, image_info)
-            
-            result = await ai_provider.analyze_images(images_base64, prompt, job_id)
-            
-            await broadcast_to_job(job_id, {
-                "status": "analyzing",
-                "progress": 90,
-                "message": "Processing AI response..."
-            })
+            return {
+                "success": True,
+                "message": f"Analysis completed successfully. Processed {len(ratings)} images.",
+                "ratings": ratings,
+                "partial": result.get("partial", False),
+                "duplicates_collapsed": len(duplicates),
+                "estimated_locally": len(estimated),
+                "ai_response": result["response"],
+                "usage": result.get("usage", {}),
+                "provider": provider_name,
+                "guideline": guideline_name,
+                "guideline_hash": guideline_hash,
+                "batches_info": {
+                    "batches_processed": result.get("batches_processed", 1),
+                    "total_batches": result.get("total_batches", 1)
+                },
+                "job_id": job_id
+            }
+        else:
+            return {"success": False, "message": result.get("error", "AI analysis failed")}
             
-            if result["success"]:
-                ratings = self._parse_ratings(result["response"], image_info)
-                
-                await self._save_analysis_results(job_id, result, ratings)
-                
-                return {
-                    "success": True,
-                    "message": f"Analysis completed successfully. Processed {len(ratings)} images.",
-                    "ratings": ratings,
-                    "ai_response": result["response"],
-                    "usage": result.get("usage", {}),
-                    "batches_info": {
-                        "batches_processed": result.get("batches_processed", 1),
-                        "total_batches": result.get("total_batches", 1)
-                    },
-                    "job_id": job_id
-                }
-            else:
-                return {"success": False, "message": result.get("error", "AI analysis failed")}
-                
-        except Exception as e:
-            return {"success": False, "message": str(e)}
     
-    async def _process_images_async(self, image_files: List[Path], job_id: str) -> tuple:
-        images_base64 = []
-        image_info = []
-        
-        from ..main import broadcast_to_job
-        
+    async def _encode_images(self, image_files: List[Path],
+                             profile: Optional[PayloadProfile] = None) -> AsyncIterator[Tuple[str, bytes]]:
+        """Yield (filename, base64) pairs, encoding each image only when the provider asks for it.
+
+        ``profile`` is the provider's payload profile (format, size and quality).
+
+        Encoding runs in a worker thread so the event loop keeps serving other jobs;
+        images that fail to encode are skipped.
+        """
+        processed = 0
         for i, img_path in enumerate(image_files):
-            try:
-                progress = int(10 + (i / len(image_files)) * 20)
-                await broadcast_to_job(job_id, {
-                    "status": "analyzing", 
-                    "progress": progress,
-                    "message": f"Processing image {i+1}/{len(image_files)}: {img_path.name}"
-                })
-                
-                base64_img = self._image_to_base64(str(img_path))
-                if base64_img:
-                    images_base64.append(base64_img)
-                    image_info.append({
-                        "filename": img_path.name,
-                        "path": str(img_path)
-                    })
-                    print(f"Successfully processed image {i+1}: {img_path.name}")
-                else:
-                    print(f"Failed to process image {i+1}: {img_path.name}")
-                
-                if i % 5 == 0:
-                    await asyncio.sleep(0.1)
-                    
-            except Exception as e:
-                print(f"Error processing image {img_path}: {e}")
+            preprocess_started = time.perf_counter()
+            with trace_span("image", filename=img_path.name):
+                base64_img = await asyncio.to_thread(self._image_to_base64, str(img_path), profile)
+            IMAGE_PREPROCESS_SECONDS.labels("success" if base64_img else "error").observe(
+                time.perf_counter() - preprocess_started
+            )
+            if not base64_img:
+                print(f"Failed to process image {i+1}: {img_path.name}")
                 continue
+            
+            processed += 1
+            print(f"Successfully processed image {i+1}: {img_path.name}")
+            yield img_path.name, base64_img
+            # Drop our reference so the string can go once the provider has sent it
+            del base64_img
         
-        print(f"Final: processed {len(images_base64)} images successfully")
-        return images_base64, image_info
+        print(f"Final: processed {processed} images successfully")
     
     def _create_batch_prompt(self, pdf_content: str, image_info: List[Dict]) -> str:
         filenames_list = [img["filename"] for img in image_info]
@@ -155,28 +348,43 @@ PROMPT_EOF
         
         return prompt
     
-    async def _save_analysis_results(self, job_id: str, result: Dict, ratings: List[Dict]) -> None:
+    async def _save_analysis_results(self, job_id: str, outcome: Dict) -> None:
         try:
-            results_dir = self.project_root / "data" / "results"
-            results_dir.mkdir(exist_ok=True)
-            
             results_data = {
                 "job_id": job_id,
                 "timestamp": str(asyncio.get_event_loop().time()),
-                "ratings": ratings,
-                "usage": result.get("usage", {}),
-                "batches_info": result.get("batches_processed", 1)
+                "analyzed_at": time.time(),
+                "guideline": outcome.get("guideline"),
+                "guideline_hash": outcome.get("guideline_hash"),
+                "provider": outcome.get("provider"),
+                "ratings": outcome.get("ratings", []),
+                "usage": outcome.get("usage", {}),
+                "batches_info": outcome.get("batches_info", {}).get("batches_processed", 1),
+                "trace": get_trace(job_id).to_dict()
             }
             
             import json
-            results_file = results_dir / f"{job_id}_analysis.json"
-            with open(results_file, 'w') as f:
-                json.dump(results_data, f, indent=2)
+            await self.storage.save_file(f"results/{job_id}_analysis.json",
+                                         json.dumps(results_data, indent=2).encode("utf-8"))
+            
+            await asyncio.to_thread(get_results_catalog().record_analysis, results_data)
                 
         except Exception as e:
             print(f"Error saving results: {e}")
     
+    # The helpers below import their heavy dependencies on first call; they run in
+    # worker threads so that first import never stalls the event loop.
+    
+    def _find_duplicates(self, image_files: List[Path]) -> Dict[str, str]:
+        from .image_dedup import ImageDeduplicator
+        return ImageDeduplicator().find_duplicates(image_files)
+    
+    def _prescore(self, image_files: List[Path], pdf_content: str) -> Tuple[List[Path], Dict[str, Dict[str, Any]]]:
+        from .image_prescorer import ImagePrescorer
+        return ImagePrescorer().select(image_files, pdf_content)
+    
     def _read_pdf_content(self, pdf_path: str) -> Optional[str]:
+        import PyPDF2
         try:
             text_content = []
             with open(pdf_path, 'rb') as file:
@@ -197,31 +405,35 @@ PROMPT_EOF
             print(f"Error reading PDF: {e}")
             return None
     
-    def _image_to_base64(self, image_path: str, max_size: tuple = (800, 800)) -> str:
+    def _image_to_base64(self, image_path: str, profile: Optional[PayloadProfile] = None) -> bytes:
+        from PIL import Image
+        profile = profile or parse_profile(LEGACY_PROFILE)
+        max_size = profile.max_size
         try:
             print(f"Converting image to base64: {image_path}")
             
             if not os.path.exists(image_path):
                 print(f"Image file does not exist: {image_path}")
-                return ""
+                return b""
             
             with Image.open(image_path) as img:
                 print(f"Image opened: {img.size}, mode: {img.mode}")
                 
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                    print("Converted image to RGB")
+                with trace_span("decode", size=list(img.size), mode=img.mode):
+                    img = self._decode_image(img, max_size)
                 
-                if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                    original_size = img.size
-                    img.thumbnail(max_size, Image.LANCZOS)
-                    print(f"Resized from {original_size} to {img.size}")
+                with trace_span("resize") as span:
+                    img = self._resize_image(img, max_size)
+                    span.set(size=list(img.size))
                 
-                import io
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=75, optimize=True)
+                with trace_span("encode", profile=profile.name) as span:
+                    image_bytes = profile.encode(img)
+                    span.set(bytes=len(image_bytes))
+                IMAGE_PAYLOAD_BYTES.labels(profile.name).observe(len(image_bytes))
                 
-                encoded_string = base64.b64encode(buffer.getvalue()).decode('utf-8')
+                # Kept as bytes: the request body is assembled from these buffers directly
+                with trace_span("base64"):
+                    encoded_string = base64.b64encode(image_bytes)
                 print(f"Base64 encoded: {len(encoded_string)} characters")
                 return encoded_string
                 
@@ -229,7 +441,32 @@ PROMPT_EOF
             print(f"Error processing image {image_path}: {e}")
             import traceback
             traceback.print_exc()
-            return ""
+            return b""
+    
+    def _fit_size(self, size: tuple, max_size: tuple) -> tuple:
+        ratio = min(max_size[0] / size[0], max_size[1] / size[1], 1)
+        return (max(1, round(size[0] * ratio)), max(1, round(size[1] * ratio)))
+    
+    def _decode_image(self, img: "Image.Image", max_size: tuple) -> "Image.Image":
+        """Decode pixel data, letting JPEG decode at reduced scale when we will shrink anyway."""
+        target = self._fit_size(img.size, max_size)
+        if target != img.size:
+            # Same reducing gap as Image.thumbnail, so output quality is unchanged
+            img.draft(None, (target[0] * 2, target[1] * 2))
+        img.load()
+        
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+            print("Converted image to RGB")
+        return img
+    
+    def _resize_image(self, img: "Image.Image", max_size: tuple) -> "Image.Image":
+        from PIL import Image
+        if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+            original_size = img.size
+            img.thumbnail(max_size, Image.LANCZOS)
+            print(f"Resized from {original_size} to {img.size}")
+        return img
     
     def _parse_ratings(self, response_text: str, image_info: List[Dict]) -> List[Dict]:
         ratings = []
@@ -243,9 +480,7 @@ PROMPT_EOF
                 if not line:
                     continue
                 
-                import re
-                pattern = r'([^:]+\.(?:jpg|jpeg|png|gif|webp))\s*:\s*(\d+)(?:/10)?'
-                match = re.search(pattern, line, re.IGNORECASE)
+                match = RATING_LINE_PATTERN.search(line)
                 
                 if match:
                     filename = match.group(1).strip()
@@ -255,15 +490,7 @@ PROMPT_EOF
                     if " - " in line:
                         explanation = line.split(" - ", 1)[1]
                     
-                    img_info = filename_to_info.get(filename, {})
-                    
-                    ratings.append({
-                        "filename": filename,
-                        "score": score,
-                        "explanation": explanation,
-                        "path": img_info.get("path", ""),
-                        "status": "excellent" if score >= 8 else "good" if score >= 6 else "fair" if score >= 4 else "poor"
-                    })
+                    ratings.append(self._build_rating(filename, score, explanation, filename_to_info))
             
             ratings.sort(key=lambda x: x["score"], reverse=True)
             return ratings
@@ -271,3 +498,33 @@ PROMPT_EOF
         except Exception as e:
             print(f"Error parsing ratings: {e}")
             return []
+    
+    def _propagate_to_duplicates(self, ratings: List[Dict], duplicates_of: Dict[str, List[str]],
+                                 filename_to_info: Dict[str, Dict]) -> List[Dict]:
+        """Append a copy of each representative's rating for the near-duplicates it stands for."""
+        propagated = list(ratings)
+        for rating in ratings:
+            for duplicate in duplicates_of.get(rating["filename"], []):
+                copy = self._build_rating(duplicate, rating["score"], rating["explanation"], filename_to_info)
+                copy["duplicate_of"] = rating["filename"]
+                if rating.get("estimated"):
+                    copy["estimated"] = True
+                propagated.append(copy)
+        return propagated
+    
+    def _build_estimated_rating(self, filename: str, estimate: Dict[str, Any], filename_to_info: Dict[str, Dict]) -> Dict:
+        reasons = ", ".join(estimate["reasons"]) or "low local brand-fit estimate"
+        rating = self._build_rating(filename, round(estimate["score"]), f"Estimated locally, not sent for AI review: {reasons}",
+                                    filename_to_info)
+        rating["estimated"] = True
+        return rating
+    
+    def _build_rating(self, filename: str, score: int, explanation: str, filename_to_info: Dict[str, Dict]) -> Dict:
+        img_info = filename_to_info.get(filename, {})
+        return {
+            "filename": filename,
+            "score": score,
+            "explanation": explanation,
+            "path": img_info.get("path", ""),
+            "status": "excellent" if score >= 8 else "good" if score >= 6 else "fair" if score >= 4 else "poor"
+        }
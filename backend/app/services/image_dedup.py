@@ -0,0 +1,141 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 64-bit hashes
+PHASH_SIZE = 32
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+def _pack(bits: np.ndarray) -> List[int]:
+    """(N, 64) booleans -> N Python ints, so Hamming distance is int.bit_count()."""
+    packed = np.packbits(bits.astype(np.uint8), axis=1)
+    return [int(v) for v in packed.view(">u8").ravel()]
+
+def dhash(pixels: np.ndarray) -> List[int]:
+    """Difference hash of a stack of (N, 8, 9) grayscale thumbnails."""
+    return _pack((pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(len(pixels), -1))
+
+def phash(pixels: np.ndarray) -> List[int]:
+    """DCT hash of a stack of (N, 32, 32) grayscale thumbnails."""
+    coefficients = (_DCT @ pixels @ _DCT.T)[:, :HASH_SIZE, :HASH_SIZE].reshape(len(pixels), -1)
+    # The DC term only tracks overall brightness; leave it out of the median
+    median = np.median(coefficients[:, 1:], axis=1, keepdims=True)
+    return _pack(coefficients > median)
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit hashes for Hamming-radius lookups.
+
+    Hashes are split into ``radius + 1`` bit ranges, each indexed exactly. Two hashes
+    within ``radius`` bits must agree on at least one range (pigeonhole), so a query
+    only verifies the few entries sharing a bucket instead of scanning every hash.
+    """
+
+    def __init__(self, radius: int, bits: int = HASH_SIZE * HASH_SIZE):
+        self.radius = radius
+        chunks = min(radius + 1, bits)
+        bounds = [round(i * bits / chunks) for i in range(chunks + 1)]
+        self._ranges = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        if radius >= bits:
+            # Every hash is within the radius; one bucket holding all of them
+            self._ranges = [(0, 0)]
+        self._tables: List[Dict[int, List[Tuple[int, Any]]]] = [{} for _ in self._ranges]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item: Any) -> None:
+        self._size += 1
+        for table, (shift, mask) in zip(self._tables, self._ranges):
+            table.setdefault((value >> shift) & mask, []).append((value, item))
+
+    def query(self, value: int) -> List[Tuple[int, Any]]:
+        """All (distance, item) within the radius of ``value``, closest first."""
+        matches = {}
+        for table, (shift, mask) in zip(self._tables, self._ranges):
+            for candidate, item in table.get((value >> shift) & mask, ()):
+                if id(item) not in matches:
+                    distance = (value ^ candidate).bit_count()
+                    if distance <= self.radius:
+                        matches[id(item)] = (distance, item)
+        return sorted(matches.values(), key=lambda match: match[0])
+
+class ImageDeduplicator:
+    """Finds near-duplicate images (same shoot, different crop or compression).
+
+    Images are decoded at reduced scale into small grayscale thumbnails in a thread
+    pool, hashed together as one NumPy stack, and clustered with a multi-index hash
+    holding only the cluster representatives.
+    """
+
+    ALGORITHMS = {
+        "dhash": ((HASH_SIZE + 1, HASH_SIZE), dhash),
+        "phash": ((PHASH_SIZE, PHASH_SIZE), phash),
+    }
+
+    def __init__(self, algorithm: Optional[str] = None, max_distance: Optional[int] = None):
+        settings = get_settings()
+        self.algorithm = (algorithm or settings.DEDUP_HASH_ALGORITHM).lower()
+        if self.algorithm not in self.ALGORITHMS:
+            available = ', '.join(self.ALGORITHMS.keys())
+            raise ValueError(f"Unknown hash algorithm: {self.algorithm}. Available: {available}")
+        self.max_distance = settings.DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+
+    def _thumbnail(self, path: Path, size: Tuple[int, int]) -> Optional[np.ndarray]:
+        try:
+            with Image.open(path) as img:
+                # JPEG decodes straight to a fraction of the size; plenty for an 8x8 hash
+                img.draft("L", (size[0] * 8, size[1] * 8))
+                thumb = img.convert("L").resize(size, Image.BOX)
+                return np.asarray(thumb, dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Could not hash {path}: {e}")
+            return None
+
+    def compute_hashes(self, paths: List[Path]) -> Dict[str, int]:
+        size, hash_fn = self.ALGORITHMS[self.algorithm]
+        workers = min(8, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            thumbnails = list(pool.map(lambda p: self._thumbnail(p, size), paths))
+
+        hashed = [(path, thumb) for path, thumb in zip(paths, thumbnails) if thumb is not None]
+        if not hashed:
+            return {}
+        hashes = hash_fn(np.stack([thumb for _, thumb in hashed]))
+        return {path.name: value for (path, _), value in zip(hashed, hashes)}
+
+    def find_duplicates(self, paths: List[Path]) -> Dict[str, str]:
+        """Map each near-duplicate filename to the filename it duplicates.
+
+        The first image of a cluster (in ``paths`` order, i.e. search rank) is kept
+        as its representative; images that could not be hashed are never collapsed.
+        """
+        hashes = self.compute_hashes(paths)
+        index = MultiIndexHash(self.max_distance)
+        duplicates = {}
+        for path in paths:
+            value = hashes.get(path.name)
+            if value is None:
+                continue
+            matches = index.query(value)
+            if matches:
+                duplicates[path.name] = matches[0][1]
+            else:
+                index.add(value, path.name)
+
+        logger.info(f"Dedup ({self.algorithm}, distance <= {self.max_distance}): "
+                    f"{len(duplicates)} near-duplicates among {len(paths)} images")
+        return duplicates
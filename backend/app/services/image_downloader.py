@@ -2,10 +2,16 @@ import asyncio
 import aiohttp
 import aiofiles
 import os
+import time
 import logging
 from pathlib import Path
 from typing import List, Dict, Any
 from ..providers.image_providers import ImageProviderFactory
+from ..providers.storage_providers import get_storage_provider
+from ..core.metrics import PROVIDER_SEARCH_SECONDS, IMAGE_DOWNLOAD_SECONDS
+from ..core.jobs import record_completed
+from ..core.resilience import job_retry_budget
+from ..core.tracing import get_trace, trace_span
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,9 +21,16 @@ class ImageDownloader:
         # Get project root path (go up from backend/app/services/)
         self.project_root = Path(__file__).parent.parent.parent.parent
         self.images_dir = self.project_root / "data" / "images"
+        self.storage = get_storage_provider()
         logger.info(f"ImageDownloader initialized - Images dir: {self.images_dir}")
     
     async def download_images(self, query: str, provider: str, limit: int, job_id: str) -> Dict[str, Any]:
+        with job_retry_budget(job_id), get_trace(job_id).span("download", provider=provider, query=query, limit=limit) as span:
+            result = await self._download_images(query, provider, limit, job_id)
+            span.set(downloaded=len(result.get("images", [])))
+            return result
+    
+    async def _download_images(self, query: str, provider: str, limit: int, job_id: str) -> Dict[str, Any]:
         try:
             logger.info(f"Starting download - Query: {query}, Provider: {provider}, Limit: {limit}, Job: {job_id}")
             
@@ -31,52 +44,76 @@ class ImageDownloader:
             provider_instance = ImageProviderFactory.create_provider(provider)
             logger.info(f"Provider {provider} created successfully")
             
-            images = await provider_instance.fetch_images(query, limit)
+            search_started = time.perf_counter()
+            with trace_span("search", provider=provider) as search_span:
+                images = await provider_instance.fetch_images(query, limit)
+                search_span.set(results=len(images))
+            PROVIDER_SEARCH_SECONDS.labels(provider, "success" if images else "empty").observe(
+                time.perf_counter() - search_started
+            )
             logger.info(f"Fetched {len(images)} images from {provider}")
             
             if not images:
                 logger.warning("No images found")
                 return {"success": False, "message": "No images found", "images": []}
             
-            # Create job directory in project root data/images
-            job_dir = self.images_dir / job_id
-            job_dir.mkdir(parents=True, exist_ok=True)
-            logger.info(f"Created job directory: {job_dir}")
-            
             downloaded_images = []
             total_images = len(images)
             
-            for i, image_data in enumerate(images):
-                try:
-                    filename = f"{i+1:03d}_{self._clean_filename(image_data.get('description', 'image'))}.jpg"
-                    file_path = job_dir / filename
+            try:
+                for i, image_data in enumerate(images):
+                    try:
+                        filename = f"{i+1:03d}_{self._clean_filename(image_data.get('description', 'image'))}.jpg"
+                        key = f"images/{job_id}/{filename}"
                     
-                    success = await provider_instance.download_image(image_data, str(file_path))
+                        download_started = time.perf_counter()
+                        with trace_span("download_image", filename=filename) as image_span:
+                            content = await provider_instance.download_image(image_data)
+                            success = content is not None
+                            if success:
+                                file_path = await self._save(key, content)
+                            image_span.set(success=success, bytes=len(content) if success else 0)
+                            del content
+                        IMAGE_DOWNLOAD_SECONDS.labels(provider, "success" if success else "error").observe(
+                            time.perf_counter() - download_started
+                        )
                     
-                    if success:
-                        downloaded_images.append({
-                            "filename": filename,
-                            "path": str(file_path),
-                            "description": image_data.get('description', ''),
-                            "author": image_data.get('author', ''),
-                            "source": image_data.get('source', provider)
-                        })
-                        logger.info(f"Successfully downloaded {filename} to {file_path}")
+                        if success:
+                            downloaded_images.append({
+                                "filename": filename,
+                                "path": str(file_path),
+                                "description": image_data.get('description', ''),
+                                "author": image_data.get('author', ''),
+                                "source": image_data.get('source', provider)
+                            })
+                            logger.info(f"Successfully downloaded {filename} to {file_path}")
                     
-                    progress = int(20 + (i + 1) / total_images * 80)
-                    await broadcast_to_job(job_id, {
-                        "status": "downloading",
-                        "progress": progress,
-                        "current_image": i + 1,
-                        "total_images": total_images,
-                        "message": f"Downloaded {len(downloaded_images)}/{total_images} images..."
-                    })
+                        progress = int(20 + (i + 1) / total_images * 80)
+                        await broadcast_to_job(job_id, {
+                            "status": "downloading",
+                            "progress": progress,
+                            "current_image": i + 1,
+                            "total_images": total_images,
+                            "message": f"Downloaded {len(downloaded_images)}/{total_images} images..."
+                        })
                     
-                    await asyncio.sleep(0.5)
+                        await asyncio.sleep(0.5)
                     
-                except Exception as e:
-                    logger.error(f"Error downloading image {i+1}: {e}")
-                    continue
+                    except Exception as e:
+                        logger.error(f"Error downloading image {i+1}: {e}")
+                        continue
+            
+            except asyncio.CancelledError:
+                logger.info(f"Download cancelled, keeping {len(downloaded_images)}/{total_images} images")
+                record_completed(job_id, {
+                    "success": bool(downloaded_images),
+                    "message": f"Cancelled after downloading {len(downloaded_images)}/{total_images} images",
+                    "images": downloaded_images,
+                    "job_id": job_id,
+                    "query": query,
+                    "provider": provider
+                })
+                raise
             
             logger.info(f"Download complete: {len(downloaded_images)}/{total_images} images")
             
@@ -93,6 +130,21 @@ class ImageDownloader:
             logger.error(f"Error in download_images: {e}")
             return {"success": False, "message": str(e), "images": []}
     
+    async def _save(self, key: str, content: bytes) -> str:
+        """Store an image; if the job is cancelled meanwhile, don't leave it behind.
+
+        The write runs in a worker thread (or an upload) that cancelling does not stop,
+        so it is shielded, awaited and then deleted: otherwise the file would appear
+        after the job reported what it had downloaded.
+        """
+        save = asyncio.ensure_future(self.storage.save_file(key, content))
+        try:
+            return await asyncio.shield(save)
+        except asyncio.CancelledError:
+            await asyncio.gather(save, return_exceptions=True)
+            await self.storage.delete_file(key)
+            raise
+    
     def _clean_filename(self, filename: str) -> str:
         if not filename:
             return "untitled"
@@ -0,0 +1,198 @@
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (64, 64)
+BINS_PER_CHANNEL = 8  # 512-bin RGB histogram
+# A pixel "matches" a brand colour when within this RGB distance of it
+PALETTE_MATCH_DISTANCE = 110.0
+
+HEX_COLOR_PATTERN = re.compile(r"#([0-9a-fA-F]{6}|[0-9a-fA-F]{3})\b")
+
+# Guidelines are written in English or Spanish
+COLOR_WORDS = {
+    (255, 0, 0): ("red", "rojo", "roja"),
+    (255, 128, 0): ("orange", "naranja"),
+    (255, 215, 0): ("yellow", "amarillo", "amarilla", "gold", "dorado"),
+    (0, 160, 0): ("green", "verde"),
+    (0, 128, 128): ("teal", "turquesa"),
+    (0, 90, 255): ("blue", "azul"),
+    (0, 0, 128): ("navy", "marino"),
+    (128, 0, 160): ("purple", "violet", "morado", "violeta"),
+    (255, 105, 180): ("pink", "rosa"),
+    (139, 69, 19): ("brown", "marron", "marrón"),
+    (245, 245, 240): ("white", "blanco", "blanca"),
+    (20, 20, 20): ("black", "negro", "negra"),
+    (128, 128, 128): ("grey", "gray", "gris"),
+    (222, 196, 160): ("beige", "sand", "arena"),
+}
+BRIGHT_WORDS = ("bright", "light", "luminous", "airy", "luminoso", "luminosa", "claro", "clara")
+DARK_WORDS = ("dark", "moody", "low-key", "oscuro", "oscura", "sombrío")
+
+class GuidelineProfile:
+    """What the guideline text says about colour and brightness, as numbers."""
+
+    def __init__(self, palette: List[Tuple[int, int, int]], target_luminance: Optional[float]):
+        self.palette = palette
+        self.target_luminance = target_luminance
+
+    @classmethod
+    def from_text(cls, text: str) -> "GuidelineProfile":
+        palette = []
+        for code in HEX_COLOR_PATTERN.findall(text):
+            if len(code) == 3:
+                code = "".join(c * 2 for c in code)
+            palette.append(tuple(int(code[i:i + 2], 16) for i in (0, 2, 4)))
+
+        lowered = text.lower()
+        words = set(re.findall(r"[\w\-áéíóúñ]+", lowered))
+        for rgb, names in COLOR_WORDS.items():
+            if words.intersection(names):
+                palette.append(rgb)
+
+        bright = any(word in words for word in BRIGHT_WORDS)
+        dark = any(word in words for word in DARK_WORDS)
+        target = 0.65 if bright and not dark else 0.3 if dark and not bright else None
+        return cls(list(dict.fromkeys(palette)), target)
+
+class ImagePrescorer:
+    """Cheap local estimate of brand fit, used to decide which images are worth a paid call.
+
+    All images of a job are reduced to small RGB thumbnails and scored together:
+    colour histogram mass near the guideline palette, exposure and contrast against
+    what the guideline asks for, resolution and aspect ratio.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        centres = (np.arange(BINS_PER_CHANNEL) + 0.5) * (256 / BINS_PER_CHANNEL)
+        r, g, b = np.meshgrid(centres, centres, centres, indexing="ij")
+        self._bin_centres = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+
+    def _load(self, path: Path) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        try:
+            with Image.open(path) as img:
+                original_size = img.size
+                img.draft("RGB", (THUMBNAIL_SIZE[0] * 4, THUMBNAIL_SIZE[1] * 4))
+                thumb = img.convert("RGB").resize(THUMBNAIL_SIZE, Image.BOX)
+                return np.asarray(thumb, dtype=np.float32), original_size
+        except Exception as e:
+            logger.warning(f"Could not pre-score {path}: {e}")
+            return None
+
+    def compute_features(self, paths: List[Path], profile: GuidelineProfile) -> Dict[str, Dict[str, float]]:
+        workers = min(8, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(self._load, paths))
+
+        names = [path.name for path, item in zip(paths, loaded) if item is not None]
+        if not names:
+            return {}
+        pixels = np.stack([item[0] for item in loaded if item is not None]).reshape(len(names), -1, 3)
+        sizes = np.array([item[1] for item in loaded if item is not None], dtype=np.float32)
+
+        # Colour histogram over 512 bins, normalised per image
+        bins = (pixels // (256 / BINS_PER_CHANNEL)).astype(np.int32)
+        flat = bins[..., 0] * BINS_PER_CHANNEL ** 2 + bins[..., 1] * BINS_PER_CHANNEL + bins[..., 2]
+        offsets = np.arange(len(names))[:, None] * BINS_PER_CHANNEL ** 3
+        histograms = np.bincount((flat + offsets).ravel(), minlength=len(names) * BINS_PER_CHANNEL ** 3)
+        histograms = histograms.reshape(len(names), -1) / flat.shape[1]
+
+        if profile.palette:
+            palette = np.array(profile.palette, dtype=np.float32)
+            bin_distance = np.linalg.norm(self._bin_centres[:, None, :] - palette[None, :, :], axis=2).min(axis=1)
+            palette_coverage = histograms @ (bin_distance <= PALETTE_MATCH_DISTANCE)
+            palette_distance = histograms @ bin_distance / 441.7  # max RGB distance
+        else:
+            palette_coverage = palette_distance = np.full(len(names), np.nan)
+
+        luminance = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32) / 255
+        brightness = luminance.mean(axis=1)
+        contrast = luminance.std(axis=1)
+        min_side = sizes.min(axis=1)
+        aspect = sizes[:, 0] / sizes[:, 1]
+
+        return {
+            name: {
+                "palette_coverage": float(palette_coverage[i]),
+                "palette_distance": float(palette_distance[i]),
+                "brightness": float(brightness[i]),
+                "contrast": float(contrast[i]),
+                "min_side": float(min_side[i]),
+                "aspect": float(aspect[i]),
+            }
+            for i, name in enumerate(names)
+        }
+
+    def estimate(self, features: Dict[str, float], profile: GuidelineProfile) -> Tuple[float, List[str]]:
+        """0-10 estimate plus the reasons that pulled it down."""
+        scores, reasons = [], []
+
+        if profile.palette:
+            # A third of the frame in brand colours counts as a full match
+            palette_score = min(1.0, features["palette_coverage"] * 3)
+            scores.append((palette_score, 2.0))
+            if palette_score < 0.2:
+                reasons.append("few brand colours")
+
+        if profile.target_luminance is not None:
+            exposure_score = max(0.0, 1 - abs(features["brightness"] - profile.target_luminance) / 0.5)
+        else:
+            exposure_score = max(0.0, 1 - max(0.0, abs(features["brightness"] - 0.5) - 0.25) / 0.2)
+        scores.append((exposure_score, 1.0))
+        if exposure_score < 0.3:
+            reasons.append("too dark" if features["brightness"] < 0.5 else "too bright")
+
+        contrast_score = min(1.0, features["contrast"] / 0.12)
+        scores.append((contrast_score, 0.5))
+        if contrast_score < 0.4:
+            reasons.append("flat, low contrast")
+
+        aspect = features["aspect"]
+        aspect_score = 1.0 if 0.5 <= aspect <= 2.2 else 0.3
+        scores.append((aspect_score, 0.5))
+        if aspect_score < 1:
+            reasons.append("unusual aspect ratio")
+
+        estimate = sum(score * weight for score, weight in scores) / sum(weight for _, weight in scores) * 10
+        # Images too small to use are a hard no, whatever they look like
+        if features["min_side"] < self.settings.PRESCORE_MIN_SIDE_PX:
+            estimate = min(estimate, 1.0)
+            reasons.append(f"low resolution ({int(features['min_side'])}px)")
+        return round(estimate, 1), reasons
+
+    def select(self, paths: List[Path], guideline_text: str) -> Tuple[List[Path], Dict[str, Dict[str, Any]]]:
+        """Split images into those worth sending and locally estimated ones.
+
+        Returns the paths to send (in their original order) and, for the rest, a
+        mapping of filename to {"score", "reasons", "features"}. At least one image is
+        always sent; images that could not be read are always sent.
+        """
+        profile = GuidelineProfile.from_text(guideline_text)
+        features = self.compute_features(paths, profile)
+        estimates = {name: self.estimate(values, profile) for name, values in features.items()}
+
+        keep = {path.name for path in paths if path.name not in estimates}
+        ranked = sorted(estimates, key=lambda name: estimates[name][0], reverse=True)
+        threshold = self.settings.PRESCORE_MIN_SCORE
+        candidates = [name for name in ranked if estimates[name][0] >= threshold]
+        top_k = self.settings.PRESCORE_TOP_K
+        if top_k > 0:
+            candidates = candidates[:top_k]
+        keep.update(candidates or ranked[:1])
+
+        skipped = {
+            name: {"score": estimates[name][0], "reasons": estimates[name][1], "features": features[name]}
+            for name in ranked if name not in keep
+        }
+        logger.info(f"Pre-scoring (palette {len(profile.palette)} colours, threshold {threshold}, top-k {top_k}): "
+                    f"sending {len(keep)}, estimating {len(skipped)} of {len(paths)}")
+        return [path for path in paths if path.name in keep], skipped
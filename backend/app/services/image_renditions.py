@@ -0,0 +1,90 @@
+import io
+import os
+import uuid
+import logging
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+class ImageRenditions:
+    """Resized copies of job images, generated on demand and cached on disk.
+
+    Requested widths are snapped up to a small fixed set so the cache stays bounded
+    no matter what ``?w=`` values clients send.
+    """
+    WIDTHS = (160, 320, 480, 640, 960, 1280)
+    QUALITY = 80
+
+    def __init__(self):
+        self.project_root = Path(__file__).parent.parent.parent.parent
+        self.cache_dir = self.project_root / "data" / "cache" / "renditions"
+
+    def snap_width(self, width: int) -> int:
+        for allowed in self.WIDTHS:
+            if width <= allowed:
+                return allowed
+        return self.WIDTHS[-1]
+
+    def get_rendition(self, source: Path, job_id: str, width: int) -> Optional[Path]:
+        """Return the path of ``source`` resized to ``width``, creating it if needed.
+
+        Returns None when the original is already narrower than ``width``, in which
+        case the caller should serve the original. Blocking; run it in a thread.
+        """
+        width = self.snap_width(width)
+        target = self.cache_dir / job_id / str(width) / source.name
+
+        if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+            return target
+
+        from PIL import Image
+        with Image.open(source) as img:
+            resized = self._resize(img, width)
+            if resized is None:
+                return None
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a unique temp name and rename so concurrent requests never
+            # see a half-written file.
+            tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                resized.save(tmp_path, format='JPEG', quality=self.QUALITY, optimize=True, progressive=True)
+                os.replace(tmp_path, target)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
+
+        logger.info(f"Created {width}px rendition: {target}")
+        return target
+
+    def storage_key(self, job_id: str, filename: str, width: int) -> str:
+        """Where a rendition lives on backends without local files (S3, memory)."""
+        return f"renditions/{job_id}/{self.snap_width(width)}/{filename}"
+
+    def render(self, content: bytes, width: int) -> Optional[bytes]:
+        """JPEG bytes of an encoded image resized to ``width``, for backends without
+        local files. None when the original is already narrower. Blocking."""
+        from PIL import Image
+        with Image.open(io.BytesIO(content)) as img:
+            resized = self._resize(img, self.snap_width(width))
+            if resized is None:
+                return None
+            buffer = io.BytesIO()
+            resized.save(buffer, format='JPEG', quality=self.QUALITY, optimize=True, progressive=True)
+            return buffer.getvalue()
+
+    def _resize(self, img: "Image.Image", width: int) -> Optional["Image.Image"]:
+        if img.width <= width:
+            return None
+
+        img.draft('RGB', (width, width * img.height // img.width))
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        height = max(1, round(img.height * width / img.width))
+        from PIL import Image
+        return img.resize((width, height), Image.LANCZOS)
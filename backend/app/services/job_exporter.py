@@ -0,0 +1,151 @@
+import asyncio
+import io
+import json
+import logging
+import tarfile
+import time
+import zipfile
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from ..providers.storage_providers import get_storage_provider, normalize_key
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink that collects archive bytes until drained.
+
+    ``zipfile`` falls back to data descriptors when the target is not seekable, which
+    lets us emit each entry as it is written instead of building the archive first.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class JobExporter:
+    """Streams a job's images and analysis results as a ZIP or tar archive.
+
+    Everything is read through the storage provider, one object at a time, so the
+    export works the same on local disk, in memory or on S3.
+    """
+
+    FORMATS = {
+        "zip": "application/zip",
+        "tar": "application/x-tar",
+    }
+
+    def __init__(self):
+        self.storage = get_storage_provider()
+
+    async def collect_entries(self, job_id: str, min_score: Optional[int] = None) -> Optional[List[Tuple[str, str]]]:
+        """Return ``(archive_name, storage_key)`` pairs for the job, or None if the job is unknown.
+
+        With ``min_score``, only images rated at or above it are included, which requires
+        the job's analysis results.
+        """
+        try:
+            images_prefix = normalize_key(f"images/{job_id}")
+            results_key = normalize_key(f"results/{job_id}_analysis.json")
+        except ValueError:
+            return None
+        if "/" in job_id:
+            return None
+
+        images = [key for key in await self.storage.list_files(images_prefix) if key.endswith(".jpg")]
+        results = await self._load_results(results_key)
+        if not images and results is None:
+            return None
+
+        if min_score is not None:
+            scores = {r["filename"]: r.get("score", -1) for r in (results or {}).get("ratings", [])}
+            images = [key for key in images if scores.get(PurePosixPath(key).name, -1) >= min_score]
+
+        entries = [(f"{job_id}/images/{PurePosixPath(key).name}", key) for key in images]
+        if results is not None:
+            entries.append((f"{job_id}/{PurePosixPath(results_key).name}", results_key))
+        return entries
+
+    async def _load_results(self, results_key: str) -> Optional[Dict]:
+        try:
+            return json.loads(await self.storage.get_file(results_key))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading results for export: {e}")
+            return {}
+
+    def stream(self, entries: List[Tuple[str, str]], archive_format: str = "zip") -> AsyncIterator[bytes]:
+        """Yield the archive in chunks; only the object being archived is held in memory."""
+        if archive_format == "tar":
+            return self._stream_tar(entries)
+        return self._stream_zip(entries)
+
+    async def _objects(self, entries: List[Tuple[str, str]]) -> AsyncIterator[Tuple[str, bytes]]:
+        for arcname, key in entries:
+            try:
+                yield arcname, await self.storage.get_file(key)
+            except FileNotFoundError:
+                # Evicted or deleted since the listing
+                logger.warning(f"Skipping {key} in export: no longer stored")
+
+    async def _stream_zip(self, entries: List[Tuple[str, str]]) -> AsyncIterator[bytes]:
+        sink = _ChunkSink()
+        # Images are already compressed; storing them avoids burning CPU for nothing.
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            async for arcname, content in self._objects(entries):
+                # CRC and deflate are CPU work; keep them off the event loop
+                await asyncio.to_thread(self._zip_entry, archive, arcname, content)
+                data = sink.drain()
+                if data:
+                    yield data
+        # Central directory is written on close
+        data = sink.drain()
+        if data:
+            yield data
+
+    async def _stream_tar(self, entries: List[Tuple[str, str]]) -> AsyncIterator[bytes]:
+        async for arcname, content in self._objects(entries):
+            for chunk in self._tar_entry(arcname, content):
+                yield chunk
+        # End-of-archive marker: two zero blocks
+        yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+
+    def _zip_entry(self, archive: zipfile.ZipFile, arcname: str, content: bytes) -> None:
+        info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if arcname.endswith(".json") else zipfile.ZIP_STORED
+        view = memoryview(content)
+        with archive.open(info, mode="w", force_zip64=True) as dest:
+            for start in range(0, len(view), CHUNK_SIZE):
+                dest.write(view[start:start + CHUNK_SIZE])
+
+    def _tar_entry(self, arcname: str, content: bytes) -> Iterator[bytes]:
+        info = tarfile.TarInfo(arcname)
+        info.size = len(content)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+
+        view = memoryview(content)
+        for start in range(0, len(view), CHUNK_SIZE):
+            yield bytes(view[start:start + CHUNK_SIZE])
+
+        padding = -len(content) % tarfile.BLOCKSIZE
+        if padding:
+            yield tarfile.NUL * padding
+
+    def archive_filename(self, job_id: str, archive_format: str) -> str:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return f"{job_id}_{stamp}.{archive_format}"
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    id INTEGER PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    status TEXT,
+    explanation TEXT,
+    path TEXT,
+    estimated INTEGER NOT NULL DEFAULT 0,
+    duplicate_of TEXT,
+    guideline TEXT,
+    guideline_hash TEXT,
+    provider TEXT,
+    analyzed_at REAL NOT NULL,
+    UNIQUE (job_id, filename)
+);
+-- The UNIQUE constraint doubles as the job index
+CREATE INDEX IF NOT EXISTS idx_ratings_guideline ON ratings (guideline_hash, score, id);
+CREATE INDEX IF NOT EXISTS idx_ratings_score ON ratings (score, id);
+CREATE INDEX IF NOT EXISTS idx_ratings_provider ON ratings (provider, analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_ratings_time ON ratings (analyzed_at, id);
+"""
+
+COLUMNS = ("id", "job_id", "filename", "score", "status", "explanation", "path", "estimated",
+           "duplicate_of", "guideline", "guideline_hash", "provider", "analyzed_at")
+
+# Sort name -> column paired with id for a stable keyset cursor
+SORTS = {"score": "score", "recent": "analyzed_at"}
+
+class InvalidCursorError(ValueError):
+    pass
+
+class ResultsCatalog:
+    """SQLite index of every rating ever saved, for queries across jobs.
+
+    The per-job ``<job_id>_analysis.json`` files stay the source of truth for a
+    single job; this catalog copies their ratings into one indexed table so
+    questions like "everything scoring 8+ for this guideline last month" are a
+    range scan instead of parsing every file. Re-saving a job replaces its rows.
+    All methods block; call them through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.settings = get_settings()
+        self.project_root = Path(__file__).parent.parent.parent.parent
+        if db_path is None:
+            db_path = Path(self.settings.RESULTS_CATALOG_PATH)
+            if not db_path.is_absolute():
+                db_path = self.project_root / db_path
+        self.db_path = db_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            # WAL lets the query endpoint read while an analysis is being recorded
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps this safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record_analysis(self, results: Dict[str, Any]) -> int:
+        """Replace a job's rows with the ratings in ``results`` (the saved results JSON)."""
+        job_id = results["job_id"]
+        analyzed_at = results.get("analyzed_at") or time.time()
+        rows = [
+            (
+                job_id,
+                rating["filename"],
+                int(rating["score"]),
+                rating.get("status"),
+                rating.get("explanation"),
+                rating.get("path"),
+                int(bool(rating.get("estimated"))),
+                rating.get("duplicate_of"),
+                results.get("guideline"),
+                results.get("guideline_hash"),
+                # Hedged jobs record the provider that answered each batch
+                rating.get("provider") or results.get("provider"),
+                analyzed_at,
+            )
+            for rating in results.get("ratings", [])
+            if rating.get("filename") and rating.get("score") is not None
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM ratings WHERE job_id = ?", (job_id,))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO ratings ({', '.join(COLUMNS[1:])}) "
+                f"VALUES ({', '.join('?' * (len(COLUMNS) - 1))})",
+                rows
+            )
+        return len(rows)
+
+    def delete_job(self, job_id: str) -> int:
+        """Drop a job's rows once its images and results are gone; returns how many."""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM ratings WHERE job_id = ?", (job_id,)).rowcount
+
+    def query(self, guideline_hash: Optional[str] = None, job_id: Optional[str] = None,
+              provider: Optional[str] = None, min_score: Optional[int] = None,
+              max_score: Optional[int] = None, since: Optional[float] = None,
+              until: Optional[float] = None, include_estimated: bool = True,
+              sort: str = "score", limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """One page of ratings, best (or most recent) first.
+
+        Pages use a keyset cursor rather than an offset, so deep pages cost the same
+        as the first one. Pass the returned ``next_cursor`` back to get the next page.
+        """
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort: {sort}. Available: {', '.join(SORTS)}")
+        sort_column = SORTS[sort]
+
+        clauses, params = [], []
+        for column, value in (("guideline_hash", guideline_hash), ("job_id", job_id), ("provider", provider)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        for expression, value in (("score >= ?", min_score), ("score <= ?", max_score),
+                                  ("analyzed_at >= ?", since), ("analyzed_at < ?", until)):
+            if value is not None:
+                clauses.append(expression)
+                params.append(value)
+        if not include_estimated:
+            clauses.append("estimated = 0")
+        if cursor:
+            last_value, last_id = self._parse_cursor(cursor, sort)
+            clauses.append(f"({sort_column}, id) < (?, ?)")
+            params.extend([last_value, last_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (f"SELECT {', '.join(COLUMNS)} FROM ratings {where} "
+               f"ORDER BY {sort_column} DESC, id DESC LIMIT ?")
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, (*params, limit + 1)).fetchall()
+
+        ratings = [self._row_to_rating(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = ratings[-1]
+            next_cursor = f"{last[sort_column]!r}:{last['id']}"
+        return {"ratings": ratings, "next_cursor": next_cursor}
+
+    def _parse_cursor(self, cursor: str, sort: str) -> Tuple[Any, int]:
+        try:
+            value, last_id = cursor.rsplit(":", 1)
+            return (int(value) if sort == "score" else float(value)), int(last_id)
+        except ValueError:
+            raise InvalidCursorError(f"Invalid cursor: {cursor}")
+
+    def _row_to_rating(self, row: tuple) -> Dict[str, Any]:
+        rating = dict(zip(COLUMNS, row))
+        rating["estimated"] = bool(rating["estimated"])
+        return rating
+
+    def backfill_file(self, results_file: Path) -> int:
+        """Index one existing ``<job_id>_analysis.json``; returns the ratings recorded.
+
+        Files written before the catalog existed lack the guideline, provider and
+        wall-clock time; those fall back to unknown, "openai" (the only provider at
+        the time) and the file's modification time.
+        """
+        with open(results_file) as f:
+            results = json.load(f)
+        results.setdefault("job_id", results_file.name[:-len("_analysis.json")])
+        results.setdefault("provider", "openai")
+        if not results.get("analyzed_at"):
+            results["analyzed_at"] = os.path.getmtime(results_file)
+        return self.record_analysis(results)
+
+@lru_cache()
+def get_results_catalog() -> ResultsCatalog:
+    return ResultsCatalog()
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from ..core.config import get_settings
+from ..core.metrics import STORAGE_BYTES, STORAGE_EVICTIONS_TOTAL, STORAGE_EVICTED_BYTES_TOTAL
+from .results_catalog import get_results_catalog
+
+logger = logging.getLogger(__name__)
+
+# Cheapest to lose first: renditions are regenerated on demand, uploads may be reused
+EVICTION_ORDER = ("rendition", "job", "upload")
+
+def _tree_stats(path: Path) -> Tuple[int, float]:
+    """Total bytes and newest file mtime under ``path`` (a file or a directory)."""
+    if path.is_file():
+        stat = path.stat()
+        return stat.st_size, stat.st_mtime
+    total, newest = 0, 0.0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += stat.st_size
+            newest = max(newest, stat.st_mtime)
+    return total, newest
+
+class StorageQuota:
+    """Byte accounting and LRU eviction for everything under data/.
+
+    Entries are jobs (images plus results), per-job rendition caches and uploaded
+    guidelines. Sizes come from periodic scans; last access is updated whenever a
+    job is read or written and persisted so LRU order survives restarts. Once usage
+    crosses the high watermark the compactor evicts least-recently-used entries,
+    renditions first, until usage is back under the low watermark. Jobs still
+    running and anything touched within STORAGE_MIN_IDLE_SECONDS are never evicted.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.project_root = Path(__file__).parent.parent.parent.parent
+        self.data_dir = self.project_root / "data"
+        self.images_dir = self.data_dir / "images"
+        self.results_dir = self.data_dir / "results"
+        self.uploads_dir = self.data_dir / "uploads"
+        self.renditions_dir = self.data_dir / "cache" / "renditions"
+        self.index_path = self.data_dir / "cache" / "storage_index.json"
+
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_compaction: Optional[Dict[str, Any]] = None
+        self.load()
+
+    @property
+    def quota_bytes(self) -> int:
+        return int(self.settings.STORAGE_QUOTA_GB * 1024 ** 3)
+
+    # --- accounting --------------------------------------------------------
+
+    def _paths(self, kind: str, name: str) -> List[Path]:
+        if kind == "job":
+            return [self.images_dir / name, self.results_dir / f"{name}_analysis.json"]
+        if kind == "rendition":
+            return [self.renditions_dir / name]
+        return [self.uploads_dir / name]
+
+    def _measure(self, kind: str, name: str, previous: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        paths = [path for path in self._paths(kind, name) if path.exists()]
+        if not paths:
+            return None
+        stats = [_tree_stats(path) for path in paths]
+        return {
+            "kind": kind,
+            "name": name,
+            "bytes": sum(size for size, _ in stats),
+            # Files are written once, so the newest mtime is when the entry was last produced
+            "last_access": previous["last_access"] if previous else max(mtime for _, mtime in stats) or time.time()
+        }
+
+    def _discover(self) -> Set[tuple]:
+        found = set()
+        if self.images_dir.exists():
+            found.update(("job", p.name) for p in self.images_dir.iterdir() if p.is_dir())
+        if self.results_dir.exists():
+            suffix = "_analysis.json"
+            found.update(("job", p.name[:-len(suffix)]) for p in self.results_dir.glob(f"*{suffix}"))
+        if self.renditions_dir.exists():
+            found.update(("rendition", p.name) for p in self.renditions_dir.iterdir() if p.is_dir())
+        if self.uploads_dir.exists():
+            found.update(("upload", p.name) for p in self.uploads_dir.iterdir() if p.is_file())
+        return found
+
+    def scan(self) -> None:
+        """Re-measure everything under data/. Blocking; run it in a thread."""
+        with self._lock:
+            previous = dict(self._entries)
+        entries = {}
+        for kind, name in self._discover():
+            key = f"{kind}:{name}"
+            entry = self._measure(kind, name, previous.get(key))
+            if entry:
+                entries[key] = entry
+        with self._lock:
+            # Keep accesses recorded while we were scanning
+            for key, entry in entries.items():
+                if key in self._entries:
+                    entry["last_access"] = max(entry["last_access"], self._entries[key]["last_access"])
+            self._entries = entries
+        self._update_gauges()
+
+    def record_job(self, job_id: str) -> None:
+        """Re-measure one job after it wrote files. Blocking; run it in a thread."""
+        for kind in ("job", "rendition"):
+            key = f"{kind}:{job_id}"
+            with self._lock:
+                previous = self._entries.get(key)
+            entry = self._measure(kind, job_id, previous)
+            with self._lock:
+                if entry:
+                    entry["last_access"] = time.time()
+                    self._entries[key] = entry
+                else:
+                    self._entries.pop(key, None)
+        self._update_gauges()
+
+    def touch(self, job_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            for kind in ("job", "rendition"):
+                entry = self._entries.get(f"{kind}:{job_id}")
+                if entry:
+                    entry["last_access"] = now
+
+    def touch_upload(self, name: str) -> None:
+        with self._lock:
+            entry = self._entries.get(f"upload:{name}")
+            if entry:
+                entry["last_access"] = time.time()
+
+    def _update_gauges(self) -> None:
+        totals = {kind: 0 for kind in EVICTION_ORDER}
+        with self._lock:
+            for entry in self._entries.values():
+                totals[entry["kind"]] += entry["bytes"]
+        for kind, total in totals.items():
+            STORAGE_BYTES.labels(kind).set(total)
+
+    def usage(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        by_kind = {kind: {"bytes": 0, "entries": 0} for kind in EVICTION_ORDER}
+        for entry in entries:
+            by_kind[entry["kind"]]["bytes"] += entry["bytes"]
+            by_kind[entry["kind"]]["entries"] += 1
+        used = sum(entry["bytes"] for entry in entries)
+        jobs = sorted((e for e in entries if e["kind"] == "job"), key=lambda e: e["bytes"], reverse=True)
+        disk = shutil.disk_usage(self.data_dir if self.data_dir.exists() else self.project_root)
+        return {
+            "quota_bytes": self.quota_bytes,
+            "used_bytes": used,
+            "used_ratio": round(used / self.quota_bytes, 4) if self.quota_bytes else None,
+            "high_watermark_bytes": int(self.quota_bytes * self.settings.STORAGE_HIGH_WATERMARK),
+            "low_watermark_bytes": int(self.quota_bytes * self.settings.STORAGE_LOW_WATERMARK),
+            "by_kind": by_kind,
+            "largest_jobs": [
+                {"job_id": e["name"], "bytes": e["bytes"], "last_access": e["last_access"]} for e in jobs[:10]
+            ],
+            "disk_total_bytes": disk.total,
+            "disk_free_bytes": disk.free,
+            "last_compaction": self.last_compaction
+        }
+
+    # --- eviction ----------------------------------------------------------
+
+    def compact(self, in_flight: Set[str]) -> Dict[str, Any]:
+        """Evict LRU entries if usage is above the high watermark. Blocking."""
+        started = time.time()
+        high = self.quota_bytes * self.settings.STORAGE_HIGH_WATERMARK
+        low = self.quota_bytes * self.settings.STORAGE_LOW_WATERMARK
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        used = sum(entry["bytes"] for entry in entries)
+        report = {"at": started, "used_before": used, "used_after": used, "evicted": []}
+
+        if used > high:
+            idle_cutoff = started - self.settings.STORAGE_MIN_IDLE_SECONDS
+            candidates = sorted(
+                (e for e in entries if e["last_access"] < idle_cutoff
+                 and not (e["kind"] != "upload" and e["name"] in in_flight)),
+                key=lambda e: (EVICTION_ORDER.index(e["kind"]), e["last_access"])
+            )
+            for entry in candidates:
+                if used <= low:
+                    break
+                freed = self._evict(entry)
+                if freed is None:
+                    continue  # already removed along with its job
+                used -= freed
+                report["evicted"].append({"kind": entry["kind"], "name": entry["name"], "bytes": freed})
+            report["used_after"] = used
+            if used > low:
+                logger.warning(f"Storage still above low watermark after compaction: {used} bytes "
+                               f"(everything left is in flight or recently used)")
+            logger.info(f"Storage compaction evicted {len(report['evicted'])} entries, "
+                        f"{report['used_before'] - used} bytes")
+
+        report["duration_ms"] = round((time.time() - started) * 1000, 1)
+        self.last_compaction = report
+        self._update_gauges()
+        return report
+
+    def _evict(self, entry: Dict[str, Any]) -> Optional[int]:
+        """Delete an entry's files; returns the bytes freed, or None if it is already gone."""
+        kind, name = entry["kind"], entry["name"]
+        keys = [f"{kind}:{name}"]
+        if kind == "job":
+            # Derivatives are useless without the originals
+            keys.append(f"rendition:{name}")
+        with self._lock:
+            removed = [self._entries.pop(key) for key in keys if key in self._entries]
+        if not removed:
+            return None
+
+        for removed_entry in removed:
+            for path in self._paths(removed_entry["kind"], name):
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                elif path.exists():
+                    path.unlink(missing_ok=True)
+            STORAGE_EVICTIONS_TOTAL.labels(removed_entry["kind"]).inc()
+            STORAGE_EVICTED_BYTES_TOTAL.labels(removed_entry["kind"]).inc(removed_entry["bytes"])
+        if kind == "job":
+            # Otherwise /api/ratings keeps listing ratings whose images now 404
+            try:
+                get_results_catalog().delete_job(name)
+            except Exception as e:
+                logger.warning(f"Could not remove evicted job {name} from the results catalog: {e}")
+        return sum(removed_entry["bytes"] for removed_entry in removed)
+
+    # --- persistence and background loop -----------------------------------
+
+    def load(self) -> None:
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            self._entries = {key: entry for key, entry in data.get("entries", {}).items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable storage index {self.index_path}: {e}")
+
+    def save(self) -> None:
+        """Write the index atomically. Blocking; run it in a thread."""
+        with self._lock:
+            data = {"saved_at": time.time(), "entries": dict(self._entries)}
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _in_flight(self) -> Set[str]:
+        from ..routes.images import active_jobs
+        return {
+            job_id for job_id, state in list(active_jobs.items())
+            if state.get("status") not in ("completed", "error", "cancelled")
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.scan)
+                await asyncio.to_thread(self.compact, self._in_flight())
+                await asyncio.to_thread(self.save)
+            except Exception as e:
+                logger.error(f"Storage compaction failed: {e}")
+            await asyncio.sleep(self.settings.STORAGE_COMPACT_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.save)
+
+@lru_cache()
+def get_storage_quota() -> StorageQuota:
+    return StorageQuota()
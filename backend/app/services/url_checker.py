@@ -0,0 +1,64 @@
+import asyncio
+import aiohttp
+import logging
+from functools import lru_cache
+from typing import List, Optional
+from ..core.cache import TTLCache
+from ..core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class UrlLivenessChecker:
+    """Checks whether URLs respond, sharing one pooled session across requests.
+
+    Results are cached (dead URLs for a shorter time than live ones) and the number of
+    concurrent HEAD requests is bounded, so a burst of inspiration queries does not
+    open hundreds of sockets or re-check the same sites every time.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._cache = TTLCache(ttl=self.settings.URL_CHECK_TTL_SECONDS, max_entries=5000)
+        self._semaphore = asyncio.Semaphore(self.settings.URL_CHECK_CONCURRENCY)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(total=self.settings.URL_CHECK_TIMEOUT_SECONDS)
+            connector = aiohttp.TCPConnector(
+                limit=self.settings.URL_CHECK_CONCURRENCY,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+        return self._session
+
+    async def is_alive(self, url: str) -> bool:
+        if not url:
+            return False
+
+        cached = self._cache.get(url)
+        if cached is not None:
+            return cached
+
+        async with self._semaphore:
+            try:
+                async with self._get_session().head(url, allow_redirects=True) as response:
+                    alive = response.status < 400
+            except Exception:
+                alive = False
+
+        ttl = None if alive else self.settings.URL_CHECK_NEGATIVE_TTL_SECONDS
+        self._cache.set(url, alive, ttl=ttl)
+        return alive
+
+    async def check_many(self, urls: List[str]) -> List[bool]:
+        return await asyncio.gather(*[self.is_alive(url) for url in urls])
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+@lru_cache()
+def get_url_checker() -> UrlLivenessChecker:
+    return UrlLivenessChecker()
@@ -0,0 +1,105 @@
+"""Request body construction: previous path vs. the buffer-splicing payload builder.
+
+The previous path decoded each image's base64 to ``str``, built an f-string data URL
+and let ``requests`` run ``json.dumps`` and ``.encode()`` over the whole payload.
+The builder serializes only the payload skeleton with orjson and splices the base64
+buffers in. Both bodies are checked to decode to the same JSON, then CPU time and
+peak transient memory (tracemalloc) are compared. Run from ``backend/``:
+
+    python -m benchmarks.bench_payload --images 1 2 8 --repeats 20
+"""
+import argparse
+import base64
+import io
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from PIL import Image
+
+from app.providers.payload_builder import build_json_body, image_part
+from app.providers.prompt_compiler import CompiledPrompt
+from app.providers.rating_schema import RATINGS_RESPONSE_FORMAT
+
+PREFIX = "BRAND GUIDELINES:\n" + "Use warm, natural light and the primary palette. " * 60
+
+def make_images(count: int, size: int) -> List[bytes]:
+    """Base64 JPEGs shaped like the analyzer's output (max 800px, quality 75)."""
+    images = []
+    for i in range(count):
+        img = Image.effect_mandelbrot((size, size * 2 // 3), (-2 + i * 0.01, -1, 1, 1), 100).convert("RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=75, optimize=True)
+        images.append(base64.b64encode(buffer.getvalue()))
+    return images
+
+def _payload(messages) -> Dict:
+    return {
+        "model": "gpt-4o",
+        "messages": messages,
+        "max_tokens": 1000,
+        "temperature": 0.1,
+        "response_format": RATINGS_RESPONSE_FORMAT,
+    }
+
+def previous_body(compiled: CompiledPrompt, tail: str, images: List[bytes]) -> bytes:
+    as_str = [img.decode("utf-8") for img in images]
+    parts = [{
+        "type": "image_url",
+        "image_url": {"url": f"data:image/jpeg;base64,{img_b64}", "detail": "low"}
+    } for img_b64 in as_str]
+    # What requests does with json=payload
+    return json.dumps(_payload(compiled.messages(tail, parts)), allow_nan=False).encode("utf-8")
+
+def builder_body(compiled: CompiledPrompt, tail: str, images: List[bytes]) -> int:
+    parts = [image_part(i, "low") for i in range(len(images))]
+    body = build_json_body(_payload(compiled.messages(tail, parts)), images)
+    # Walk the chunks the way the HTTP client will
+    return sum(len(chunk) for chunk in body.chunks)
+
+def measure(fn: Callable[[], object], repeats: int) -> Dict[str, float]:
+    fn()  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": statistics.median(timings), "peak_bytes": peak}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, nargs="+", default=[1, 2, 8], help="images per request")
+    parser.add_argument("--size", type=int, default=800, help="image width in pixels")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    compiled = CompiledPrompt(PREFIX)
+    images = make_images(max(args.images), args.size)
+    print(f"Image base64 size: ~{statistics.fmean(len(img) for img in images) / 1024:.0f} KiB each\n")
+    print(f"{'images':>6}  {'body KiB':>9}  {'previous ms':>11}  {'builder ms':>10}  "
+          f"{'previous peak KiB':>17}  {'builder peak KiB':>16}")
+
+    for count in args.images:
+        batch = images[:count]
+        filenames = [f"{i + 1:03d}_image.jpg" for i in range(count)]
+        tail = compiled.batch_tail(filenames)
+
+        expected = previous_body(compiled, tail, batch)
+        parts = [image_part(i, "low") for i in range(count)]
+        assembled = build_json_body(_payload(compiled.messages(tail, parts)), batch).to_bytes()
+        assert json.loads(assembled) == json.loads(expected), "builder output differs from previous body"
+
+        previous = measure(lambda: previous_body(compiled, tail, batch), args.repeats)
+        builder = measure(lambda: builder_body(compiled, tail, batch), args.repeats)
+        print(f"{count:>6}  {len(expected) / 1024:>9.0f}  {previous['ms']:>11.3f}  {builder['ms']:>10.3f}  "
+              f"{previous['peak_bytes'] / 1024:>17.0f}  {builder['peak_bytes'] / 1024:>16.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Payload profiles: bytes per request, encode time and rating stability.
+
+Encodes the same images with each candidate profile (app/providers/payload_profiles)
+and compares them with the encoding used before profiles existed, jpeg-800-q75:
+
+- bytes: encoded image size, and the body of a request carrying BATCH_SIZE of them
+- encode: decode + resize + encode + base64 per image (median), i.e. _image_to_base64
+- view PSNR: what the model gets to see. Each payload is decoded and shrunk the way
+  the API does it (OpenAI ``detail: "low"`` fits images in 512px; ``--view-edge``)
+  and compared with the same view of the untouched source. Above roughly 38 dB the
+  differences are hard to see; it is a cheap filter, the live ratings decide.
+- ratings (``--live``): rates the images ``--runs`` times per profile with the
+  configured AI_PROVIDER (real API key, real cost) and reports how far scores move
+  from the reference against the reference's own run-to-run spread. A profile
+  "does not change scores" when it stays within that spread plus ``--score-tolerance``.
+
+Synthetic fixtures are noisier than photos and compress worse; pass a folder of real
+photos with ``--images-dir`` before choosing a profile. Run from ``backend/``:
+
+    python -m benchmarks.bench_payload_profiles
+    python -m benchmarks.bench_payload_profiles --images-dir ~/photos --profiles jpeg-512-q75 webp-512-q60
+    python -m benchmarks.bench_payload_profiles --images-dir ~/photos --live --guideline guide.pdf --runs 3
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .bench_preprocess import make_fixture
+
+REFERENCE = "jpeg-800-q75"
+DEFAULT_PROFILES = [
+    "jpeg-512-q75", "jpeg-512-q60", "jpeg-512-q75-444",
+    "webp-512-q75", "webp-512-q60", "webp-384-q60", "jpeg-768-q75",
+]
+FIXTURE_SIZES = [(4000, 3000), (1920, 1080), (3000, 2000), (1080, 1350)]
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+BATCH_SIZE = 2  # what OpenAIProvider and GeminiProvider send per request
+
+def _analyzer():
+    from app.services.image_analyzer import ImageAnalyzer
+    return ImageAnalyzer.__new__(ImageAnalyzer)  # the encoding helpers need no settings
+
+def load_images(images_dir: Optional[Path], count: int, tmp: Path) -> List[Path]:
+    if images_dir:
+        paths = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not paths:
+            raise SystemExit(f"No images in {images_dir}")
+        return paths[:count]
+    paths = []
+    for i in range(count):
+        path = tmp / f"fixture-{i:02d}.jpg"
+        make_fixture(path, FIXTURE_SIZES[i % len(FIXTURE_SIZES)], "JPEG", "RGB")
+        paths.append(path)
+    return paths
+
+def model_view(data: bytes, view_edge: int, size: Optional[tuple] = None) -> np.ndarray:
+    """The image as the API sees it: decoded and fitted into ``view_edge`` pixels."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+        if size is None:
+            img.thumbnail((view_edge, view_edge), Image.LANCZOS)
+        else:
+            img = img.resize(size, Image.LANCZOS)
+        return np.asarray(img, dtype=np.float64)
+
+def psnr(a: np.ndarray, b: np.ndarray) -> float:
+    mse = float(np.mean((a - b) ** 2))
+    return float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+def request_bytes(images: List[bytes], mime_type: str) -> int:
+    """Body size of an OpenAI-style request carrying ``images`` (prompt text excluded)."""
+    from app.providers.payload_builder import build_json_body, image_part
+    parts = [image_part(i, "low") for i in range(len(images))]
+    payload = {"messages": [{"role": "user", "content": [{"type": "text", "text": ""}, *parts]}]}
+    return build_json_body(payload, images, mime_type=mime_type).size
+
+def measure_profile(spec: str, paths: List[Path], sources: Dict[str, np.ndarray], view_edge: int,
+                    repeats: int) -> Dict:
+    from app.providers.payload_profiles import parse_profile
+    profile = parse_profile(spec)
+    analyzer = _analyzer()
+    encoded, encode_ms, view_psnr = [], [], []
+    for path in paths:
+        samples = []
+        for _ in range(repeats):
+            # _image_to_base64 logs with print(); keep that out of the measurements
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                b64 = analyzer._image_to_base64(str(path), profile)
+                samples.append((time.perf_counter() - started) * 1000)
+        encoded.append(b64)
+        encode_ms.append(statistics.median(samples))
+        source = sources[path.name]
+        view = model_view(base64.b64decode(b64), view_edge, (source.shape[1], source.shape[0]))
+        view_psnr.append(psnr(view, source))
+
+    image_bytes = [len(base64.b64decode(b64)) for b64 in encoded]
+    requests = [request_bytes(encoded[i:i + BATCH_SIZE], profile.mime_type)
+                for i in range(0, len(encoded), BATCH_SIZE)]
+    return {
+        "profile": profile.name,
+        "image_bytes": round(statistics.mean(image_bytes)),
+        "request_bytes": round(statistics.mean(requests)),
+        "encode_ms": round(statistics.median(encode_ms), 2),
+        "view_psnr_db": round(statistics.mean(view_psnr), 2),
+    }
+
+async def rate_images(spec: str, paths: List[Path], guideline: Path, runs: int) -> Dict:
+    """Scores per filename over ``runs`` analyses encoded with ``spec``, plus prompt tokens."""
+    from app.core.config import get_settings
+    # Both providers' settings, so the hedged router and its secondary agree too
+    os.environ["OPENAI_PAYLOAD_PROFILE"] = os.environ["GEMINI_PAYLOAD_PROFILE"] = spec
+    get_settings.cache_clear()
+    from app.core.http_client import close_http_session
+    from app.providers.ai_providers import AIProviderFactory
+    from app.services.image_analyzer import ImageAnalyzer
+
+    analyzer = ImageAnalyzer()
+    pdf_content = analyzer._read_pdf_content(str(guideline))
+    if not pdf_content:
+        raise SystemExit(f"Could not read {guideline}")
+    image_info = [{"filename": path.name, "path": str(path)} for path in paths]
+    prompt = analyzer._create_batch_prompt(pdf_content, image_info)
+
+    scores: Dict[str, List[int]] = {path.name: [] for path in paths}
+    prompt_tokens = 0
+    for _ in range(runs):
+        provider = AIProviderFactory.create_provider(get_settings().AI_PROVIDER)
+
+        async def on_batch(batch_num, total_batches, filenames, result) -> None:
+            nonlocal prompt_tokens
+            if not result.get("success"):
+                print(f"  {spec}: batch {batch_num} failed: {result.get('error')}", file=sys.stderr)
+                return
+            prompt_tokens += result.get("usage", {}).get("prompt_tokens", 0)
+            if "ratings" in result:
+                ratings = result["ratings"]
+            else:
+                ratings = analyzer._parse_ratings(result["response"], image_info)
+            for rating in ratings:
+                if rating["filename"] in scores:
+                    scores[rating["filename"]].append(rating["score"])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            await provider.analyze_images(analyzer._encode_images(paths, provider.payload_profile), prompt,
+                                          on_batch=on_batch, total_images=len(paths))
+    await close_http_session()
+    return {"scores": scores, "prompt_tokens_per_image": round(prompt_tokens / (runs * len(paths)))}
+
+def score_stability(scores: Dict[str, List[int]], reference: Dict[str, List[int]]) -> Dict:
+    """Mean |score - reference score| over run pairs, and the share of images whose median moved."""
+    diffs, moved, rated = [], 0, 0
+    for filename, ref_scores in reference.items():
+        own = scores.get(filename) or []
+        if not own or not ref_scores:
+            continue
+        rated += 1
+        diffs.extend(abs(a - b) for a in own for b in ref_scores)
+        moved += statistics.median(own) != statistics.median(ref_scores)
+    return {
+        "mean_abs_score_diff": round(statistics.mean(diffs), 3) if diffs else None,
+        "median_changed_pct": round(100 * moved / rated, 1) if rated else None,
+    }
+
+def reference_noise(reference: Dict[str, List[int]]) -> Optional[float]:
+    """Mean |score difference| between repeated reference runs of the same image."""
+    diffs = [abs(a - b) for runs in reference.values() for a, b in itertools.combinations(runs, 2)]
+    return round(statistics.mean(diffs), 3) if diffs else None
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=DEFAULT_PROFILES,
+                        help=f"profiles to compare with the reference ({REFERENCE})")
+    parser.add_argument("--images-dir", type=Path, help="folder of real photos (default: synthetic fixtures)")
+    parser.add_argument("--count", type=int, default=8, help="images to use")
+    parser.add_argument("--view-edge", type=int, default=512,
+                        help="how large the API looks at images (512 for OpenAI detail=low, 768 for Gemini)")
+    parser.add_argument("--repeats", type=int, default=3, help="timed encodes per image (median is kept)")
+    parser.add_argument("--live", action="store_true", help="also rate the images with AI_PROVIDER (paid)")
+    parser.add_argument("--guideline", type=Path, help="guideline PDF for --live")
+    parser.add_argument("--runs", type=int, default=2, help="ratings per profile with --live (>= 2 to measure noise)")
+    parser.add_argument("--score-tolerance", type=float, default=0.25,
+                        help="allowed mean |score diff| above the reference's own run-to-run noise")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    if args.live and not args.guideline:
+        raise SystemExit("--live needs --guideline")
+    specs = [REFERENCE] + [spec for spec in args.profiles if spec != REFERENCE]
+
+    with tempfile.TemporaryDirectory(prefix="bench-payload-profiles-") as tmp:
+        paths = load_images(args.images_dir, args.count, Path(tmp))
+        print(f"{len(paths)} {'images' if args.images_dir else 'synthetic fixtures'}, "
+              f"model view {args.view_edge}px, reference {REFERENCE}")
+        sources = {path.name: model_view(path.read_bytes(), args.view_edge) for path in paths}
+        results = [measure_profile(spec, paths, sources, args.view_edge, args.repeats) for spec in specs]
+
+        noise = None
+        if args.live:
+            print(f"Rating {len(paths)} images x {args.runs} run(s) per profile...")
+            ratings = {spec: asyncio.run(rate_images(spec, paths, args.guideline, args.runs)) for spec in specs}
+            reference_scores = ratings[REFERENCE]["scores"]
+            noise = reference_noise(reference_scores)
+            for result, spec in zip(results, specs):
+                result["prompt_tokens_per_image"] = ratings[spec]["prompt_tokens_per_image"]
+                result.update(score_stability(ratings[spec]["scores"], reference_scores))
+                if noise is not None and result["mean_abs_score_diff"] is not None:
+                    result["stable"] = result["mean_abs_score_diff"] <= noise + args.score_tolerance
+
+    reference = results[0]
+    print(f"\n{'profile':<18} {'image KB':>9} {'request KB':>11} {'vs ref':>7} {'encode ms':>10} {'view PSNR':>10}"
+          + ("  tokens/img  |dscore|  changed" if args.live else ""))
+    for result in results:
+        line = (f"{result['profile']:<18} {result['image_bytes'] / 1024:>9.1f} {result['request_bytes'] / 1024:>11.1f} "
+                f"{100 * result['request_bytes'] / reference['request_bytes']:>6.0f}% {result['encode_ms']:>10.2f} "
+                f"{result['view_psnr_db']:>8.2f}dB")
+        if args.live:
+            diff, changed = result.get("mean_abs_score_diff"), result.get("median_changed_pct")
+            line += (f"  {result['prompt_tokens_per_image']:>10} {diff if diff is not None else '-':>9}"
+                     f" {f'{changed}%' if changed is not None else '-':>8}"
+                     + ("" if "stable" not in result else ("  ok" if result["stable"] else "  CHANGES SCORES")))
+        print(line)
+    if args.live:
+        print(f"\nReference run-to-run noise: {noise if noise is not None else 'n/a (use --runs 2+)'}")
+        stable = [r for r in results[1:] if r.get("stable")]
+        if stable:
+            best = min(stable, key=lambda r: r["request_bytes"])
+            print(f"Smallest payload within noise: {best['profile']} "
+                  f"({100 * best['request_bytes'] / reference['request_bytes']:.0f}% of the reference)")
+
+    if args.json:
+        args.json.write_text(json.dumps({"reference": REFERENCE, "view_edge": args.view_edge,
+                                         "reference_noise": noise, "results": results}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""End-to-end throughput benchmark for the download -> analyze flow.
+
+Runs concurrent jobs against the local stand-ins in ``fake_servers`` and reports
+jobs/minute, p50/p99 job latency and event-loop lag. Run from ``backend/``:
+
+    python -m benchmarks.bench_pipeline --jobs 20 --concurrency 5 --images 10 \
+        --openai-latency-ms 1500 --openai-429-rate 0.05
+
+Hedging between vision providers against a slow tail on the primary:
+
+    python -m benchmarks.bench_pipeline --ai-provider hedged \
+        --openai-tail-rate 0.05 --openai-tail-ms 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+from .fake_servers import FakeProviderServer, FakeServerConfig, UpstreamBehavior
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def write_guideline_pdf(path: Path) -> None:
+    """Smallest PDF PyPDF2 will extract text from."""
+    text = "Brand colours: #1A73E8 blue and warm white. Bright, natural, people-first imagery."
+    content = f"BT /F1 12 Tf 50 700 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF" % (len(objects) + 1, xref)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(out)
+
+class LoopLagMonitor:
+    """Measures how late a 10 ms sleep wakes up; blocking work shows up as lag."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+async def run_benchmark(args: argparse.Namespace, run_id: str) -> Dict:
+    # Imported here so the settings overrides are in the environment first
+    from app.core.config import get_settings
+    get_settings.cache_clear()
+    from app.services.image_downloader import ImageDownloader
+    from app.services.image_analyzer import ImageAnalyzer
+    from app.core.http_client import close_http_session
+    from app.core.metrics import AI_HEDGED_BATCHES_TOTAL
+    from app.providers.ai_providers import get_latency_window
+    import app.main  # noqa: F401  services import it lazily; keep that out of the lag numbers
+
+    downloader = ImageDownloader()
+    analyzer = ImageAnalyzer()
+    if not analyzer.prompt_file.exists():
+        analyzer.prompt_file = BACKEND_DIR / "prompts_images.txt"
+
+    guideline_path = analyzer.uploads_dir / f"bench-{run_id}.pdf"
+    write_guideline_pdf(guideline_path)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    failures: List[str] = []
+
+    async def run_job(index: int) -> None:
+        job_id = f"bench-{run_id}-{index:04d}"
+        async with semaphore:
+            started = time.perf_counter()
+            download = await downloader.download_images(args.query, args.provider, args.images, job_id)
+            if not download.get("success"):
+                failures.append(f"{job_id}: download: {download.get('message')}")
+                return
+            analysis = await analyzer.analyze_images(str(guideline_path), job_id)
+            if not analysis.get("success"):
+                failures.append(f"{job_id}: analysis: {analysis.get('message')}")
+                return
+            latencies.append(time.perf_counter() - started)
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(run_job(i) for i in range(args.jobs)))
+    wall = time.perf_counter() - wall_started
+    await monitor.stop()
+    await close_http_session()
+
+    lag_ms = [sample * 1000 for sample in monitor.samples]
+    batch_latency = {}
+    for provider in ("openai", "gemini"):
+        window = get_latency_window(provider)
+        if len(window):
+            batch_latency[provider] = {
+                "batches": len(window),
+                "p50": round(window.percentile(50), 3),
+                "p99": round(window.percentile(99), 3),
+            }
+    hedges = {
+        sample.labels["winner"]: int(sample.value)
+        for metric in AI_HEDGED_BATCHES_TOTAL.collect()
+        for sample in metric.samples if sample.name.endswith("_total")
+    }
+    return {
+        "jobs": args.jobs,
+        "completed": len(latencies),
+        "failed": len(failures),
+        "failures": failures[:10],
+        "concurrency": args.concurrency,
+        "images_per_job": args.images,
+        "wall_seconds": round(wall, 3),
+        "jobs_per_minute": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "job_latency_s": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lag_ms, 50), 2),
+            "p99": round(percentile(lag_ms, 99), 2),
+            "max": round(max(lag_ms, default=0.0), 2),
+        },
+        "ai_provider": args.ai_provider,
+        "ai_batch_latency_s": batch_latency,
+        "hedged_batches_by_winner": hedges,
+    }
+
+def cleanup(run_id: str) -> None:
+    data_dir = BACKEND_DIR.parent / "data"
+    prefix = f"bench-{run_id}"
+    for path in (data_dir / "images").glob(f"{prefix}-*"):
+        shutil.rmtree(path, ignore_errors=True)
+    for path in (data_dir / "cache" / "renditions").glob(f"{prefix}-*"):
+        shutil.rmtree(path, ignore_errors=True)
+    for path in (data_dir / "results").glob(f"{prefix}-*"):
+        path.unlink(missing_ok=True)
+    (data_dir / "uploads" / f"{prefix}.pdf").unlink(missing_ok=True)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--images", type=int, default=10, help="images per job")
+    parser.add_argument("--provider", choices=["unsplash", "pexels"], default="unsplash")
+    parser.add_argument("--query", default="benchmark")
+    parser.add_argument("--image-size", default="3000x2000", help="synthetic JPEG size, WxH")
+    parser.add_argument("--image-quality", type=int, default=90)
+    for upstream, latency in (("search", 150), ("images", 80), ("openai", 1500), ("gemini", 1500)):
+        parser.add_argument(f"--{upstream}-latency-ms", type=float, default=latency)
+        parser.add_argument(f"--{upstream}-jitter-ms", type=float, default=latency / 3)
+        parser.add_argument(f"--{upstream}-429-rate", type=float, default=0.0)
+        parser.add_argument(f"--{upstream}-tail-rate", type=float, default=0.0,
+                            help="fraction of requests that take --<upstream>-tail-ms longer")
+        parser.add_argument(f"--{upstream}-tail-ms", type=float, default=0.0)
+    parser.add_argument("--ai-provider", choices=["openai", "gemini", "hedged"], default="openai")
+    parser.add_argument("--hedge-percentile", type=float, default=95)
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with 429s")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--keep-data", action="store_true", help="leave bench jobs under data/")
+    return parser.parse_args()
+
+def main() -> None:
+    args = parse_args()
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+
+    def behavior(upstream: str) -> UpstreamBehavior:
+        return UpstreamBehavior(
+            latency_ms=getattr(args, f"{upstream}_latency_ms"),
+            jitter_ms=getattr(args, f"{upstream}_jitter_ms"),
+            rate_429=getattr(args, f"{upstream}_429_rate"),
+            retry_after_s=args.retry_after,
+            tail_rate=getattr(args, f"{upstream}_tail_rate"),
+            tail_ms=getattr(args, f"{upstream}_tail_ms"),
+        )
+
+    config = FakeServerConfig(
+        search=behavior("search"),
+        images=behavior("images"),
+        openai=behavior("openai"),
+        gemini=behavior("gemini"),
+        image_size=(width, height),
+        image_quality=args.image_quality,
+    )
+    run_id = uuid.uuid4().hex[:8]
+
+    with FakeProviderServer(config) as server:
+        os.environ.update(server.env())
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        os.environ.setdefault("UNSPLASH_API_KEY", "bench")
+        os.environ.setdefault("PEXELS_API_KEY", "bench")
+        os.environ.setdefault("GEMINI_API_KEY", "bench")
+        os.environ["AI_PROVIDER"] = args.ai_provider
+        os.environ["AI_HEDGE_PERCENTILE"] = str(args.hedge_percentile)
+        try:
+            report = asyncio.run(run_benchmark(args, run_id))
+        finally:
+            if not args.keep_data:
+                cleanup(run_id)
+        report["upstream_requests"] = dict(server.request_counts)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\n=== Pipeline benchmark ({report['jobs']} jobs x {report['images_per_job']} images, "
+          f"concurrency {report['concurrency']}) ===")
+    print(f"Completed:      {report['completed']}  Failed: {report['failed']}")
+    print(f"Wall time:      {report['wall_seconds']:.2f}s")
+    print(f"Throughput:     {report['jobs_per_minute']:.2f} jobs/min")
+    print(f"Job latency:    p50 {report['job_latency_s']['p50']:.2f}s  p99 {report['job_latency_s']['p99']:.2f}s")
+    print(f"Event-loop lag: p50 {report['loop_lag_ms']['p50']:.1f}ms  p99 {report['loop_lag_ms']['p99']:.1f}ms  "
+          f"max {report['loop_lag_ms']['max']:.1f}ms")
+    for provider, latency in report["ai_batch_latency_s"].items():
+        print(f"{provider + ' batches:':<16}{latency['batches']}  p50 {latency['p50']:.2f}s  p99 {latency['p99']:.2f}s")
+    if report["hedged_batches_by_winner"]:
+        print(f"Hedged batches: {report['hedged_batches_by_winner']} (by winner)")
+    print(f"Upstream calls: {report['upstream_requests']}")
+    for failure in report["failures"]:
+        print(f"  ! {failure}")
+
+if __name__ == "__main__":
+    main()
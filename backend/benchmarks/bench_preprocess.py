@@ -0,0 +1,263 @@
+"""CPU micro-benchmark for ImageAnalyzer._image_to_base64.
+
+Builds deterministic synthetic fixtures across resolutions, modes and formats, then
+times decode, resize, encode and base64 separately using the analyzer's own stage
+helpers. Peak memory is the RSS high-water mark of a fresh worker process per case;
+Pillow's pixel buffers are invisible to tracemalloc.
+
+Results are compared with ``baselines/preprocess.json``; a stage slower than the
+baseline by more than ``--threshold`` (or peak memory above ``--memory-threshold``)
+is a regression and the script exits non-zero. Run from ``backend/``:
+
+    python -m benchmarks.bench_preprocess                    # compare with baseline
+    python -m benchmarks.bench_preprocess --quick            # small matrix
+    python -m benchmarks.bench_preprocess --update-baseline  # record new baseline
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "preprocess.json"
+STAGES = ("decode", "resize", "encode", "base64")
+# The baseline was recorded with the pre-profile encoding (JPEG q75, 800px); keep
+# measuring that one so timings stay comparable. bench_payload_profiles covers the rest.
+PROFILE_SPEC = "jpeg-800-q75"
+MAX_SIZE = (800, 800)
+
+RESOLUTIONS = {
+    "640p": (960, 640),
+    "1080p": (1920, 1080),
+    "12mp": (4000, 3000),
+    "6000px": (6000, 4000),
+}
+# (format, mode): the combinations real uploads and stock photos come in
+VARIANTS = [
+    ("JPEG", "RGB"),
+    ("JPEG", "L"),
+    ("JPEG", "CMYK"),
+    ("PNG", "RGBA"),
+    ("PNG", "P"),
+    ("WEBP", "RGB"),
+]
+QUICK_RESOLUTIONS = ("640p", "12mp")
+QUICK_VARIANTS = [("JPEG", "RGB"), ("PNG", "RGBA")]
+
+def case_name(resolution: str, fmt: str, mode: str) -> str:
+    return f"{resolution}-{fmt.lower()}-{mode.lower()}"
+
+def make_fixture(path: Path, size: Tuple[int, int], fmt: str, mode: str) -> None:
+    """Photo-like content: gradients for smooth areas plus seeded noise for texture."""
+    width, height = size
+    rng = random.Random(f"{width}x{height}")
+    base = Image.linear_gradient("L").resize(size)
+    radial = Image.radial_gradient("L").resize(size)
+    noise = Image.frombytes("L", size, rng.randbytes(width * height))
+    channels = [
+        Image.blend(base, noise, 0.2),
+        Image.blend(radial, noise, 0.2),
+        Image.blend(base.transpose(Image.FLIP_LEFT_RIGHT), noise, 0.2),
+    ]
+    img = Image.merge("RGB", channels)
+    if mode == "RGBA":
+        img.putalpha(radial)
+    elif mode == "P":
+        img = img.convert("P", palette=Image.ADAPTIVE, colors=256)
+    elif mode != "RGB":
+        img = img.convert(mode)
+
+    options = {"JPEG": {"quality": 90}, "WEBP": {"quality": 85}, "PNG": {"compress_level": 6}}[fmt]
+    img.save(path, format=fmt, **options)
+
+def build_fixtures(directory: Path, quick: bool) -> List[Dict]:
+    resolutions = QUICK_RESOLUTIONS if quick else tuple(RESOLUTIONS)
+    variants = QUICK_VARIANTS if quick else VARIANTS
+    cases = []
+    for resolution in resolutions:
+        for fmt, mode in variants:
+            name = case_name(resolution, fmt, mode)
+            path = directory / f"{name}.{fmt.lower()}"
+            make_fixture(path, RESOLUTIONS[resolution], fmt, mode)
+            cases.append({"name": name, "path": str(path), "bytes": path.stat().st_size})
+    return cases
+
+def _analyzer():
+    from app.services.image_analyzer import ImageAnalyzer
+    return ImageAnalyzer.__new__(ImageAnalyzer)  # stage helpers need no settings
+
+def run_stages(analyzer, path: str) -> Dict[str, float]:
+    """One pass through the same stages as _image_to_base64, timed individually."""
+    from app.providers.payload_profiles import parse_profile
+    profile = parse_profile(PROFILE_SPEC)
+    timings = {}
+    # The helpers log with print(); keep that out of the measurements
+    with contextlib.redirect_stdout(io.StringIO()):
+        with Image.open(path) as img:
+            started = time.perf_counter()
+            img = analyzer._decode_image(img, MAX_SIZE)
+            timings["decode"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            img = analyzer._resize_image(img, MAX_SIZE)
+            timings["resize"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            jpeg_bytes = profile.encode(img)
+            timings["encode"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            base64.b64encode(jpeg_bytes)
+            timings["base64"] = time.perf_counter() - started
+    return timings
+
+def _proc_status_kib(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise OSError(f"{field} not in /proc/self/status")
+
+def measure_peak_memory(path: str) -> Optional[int]:
+    """Runs in a fresh worker: peak RSS growth (bytes) caused by one conversion.
+
+    The RSS high-water mark survives fork/exec, so it is reset through
+    /proc/self/clear_refs first; without procfs there is no reliable number.
+    """
+    analyzer = _analyzer()
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        before = _proc_status_kib("VmRSS")
+    except OSError:
+        return None
+    run_stages(analyzer, path)
+    return max(0, _proc_status_kib("VmHWM") - before) * 1024
+
+def benchmark(cases: List[Dict], repeats: int) -> Dict[str, Dict]:
+    analyzer = _analyzer()
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for case in cases:
+            run_stages(analyzer, case["path"])  # warm-up: codec init, page cache
+            samples = {stage: [] for stage in STAGES}
+            for _ in range(repeats):
+                for stage, seconds in run_stages(analyzer, case["path"]).items():
+                    samples[stage].append(seconds * 1000)
+
+            stages = {stage: round(statistics.median(values), 3) for stage, values in samples.items()}
+            results[case["name"]] = {
+                "file_bytes": case["bytes"],
+                "stages_ms": stages,
+                "total_ms": round(sum(stages.values()), 3),
+                "peak_memory_bytes": pool.apply(measure_peak_memory, (case["path"],)),
+            }
+            print(f"  {case['name']:<22} total {results[case['name']]['total_ms']:>9.2f} ms  "
+                  + "  ".join(f"{s} {v:.2f}" for s, v in stages.items())
+                  + _format_memory(results[case["name"]]["peak_memory_bytes"]))
+    return results
+
+def _format_memory(peak: Optional[int]) -> str:
+    return f"  peak {peak / 2**20:.1f} MiB" if peak is not None else ""
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float,
+            memory_threshold: float, min_delta_ms: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for stage in STAGES + ("total",):
+            now = current["total_ms"] if stage == "total" else current["stages_ms"][stage]
+            before = previous["total_ms"] if stage == "total" else previous["stages_ms"].get(stage)
+            # Sub-millisecond stages are mostly timer noise; require an absolute change too
+            if before and now > before * (1 + threshold) and now - before >= min_delta_ms:
+                regressions.append(f"{name} {stage}: {before:.2f} -> {now:.2f} ms (+{(now / before - 1) * 100:.0f}%)")
+        before_mem = previous.get("peak_memory_bytes")
+        now_mem = current["peak_memory_bytes"]
+        if before_mem and now_mem is not None and now_mem > before_mem * (1 + memory_threshold):
+            regressions.append(f"{name} peak memory: {before_mem / 2**20:.1f} -> {now_mem / 2**20:.1f} MiB")
+    return regressions
+
+def machine_info() -> Dict[str, str]:
+    import PIL
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": str(os.cpu_count()),
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per case (median is kept)")
+    parser.add_argument("--quick", action="store_true", help="2 resolutions x 2 variants")
+    parser.add_argument("--only", help="run only cases whose name contains this substring")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown per stage (0.15 = 15%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.20)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="bench-preprocess-") as tmp:
+        print("Building fixtures...")
+        cases = build_fixtures(Path(tmp), args.quick)
+        if args.only:
+            cases = [case for case in cases if args.only in case["name"]]
+        print(f"Running {len(cases)} cases x {args.repeats} repeats")
+        results = benchmark(cases, args.repeats)
+
+    report = {"machine": machine_info(), "max_size": list(MAX_SIZE), "cases": results}
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        existing = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"cases": {}}
+        existing["cases"].update(results)
+        existing["machine"] = report["machine"]
+        existing["max_size"] = report["max_size"]
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(existing, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("machine") != report["machine"]:
+        print(f"Warning: baseline was recorded on {baseline.get('machine')}, "
+              f"this run is {report['machine']}; timings may not be comparable")
+
+    regressions = compare(results, baseline.get("cases", {}), args.threshold,
+                          args.memory_threshold, args.min_delta_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against baseline:")
+        for regression in regressions:
+            print(f"  ! {regression}")
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
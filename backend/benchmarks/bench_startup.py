@@ -0,0 +1,80 @@
+"""Worker startup cost: time to import the app and resident memory afterwards.
+
+Each run imports ``app.main`` in a fresh interpreter (what a new uvicorn worker
+pays before serving its first request) and reports wall time, RSS and which heavy
+third-party packages ended up loaded. Run from ``backend/``:
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Packages that only some endpoints need; ideally none of them load at startup
+HEAVY_MODULES = ("google.generativeai", "grpc", "PyPDF2", "PIL.Image", "numpy", "requests")
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+status = dict(line.split(":", 1) for line in open("/proc/self/status") if ":" in line)
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "rss_kib": int(status["VmRSS"].split()[0]),
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+    "modules": len(sys.modules),
+}}))
+"""
+
+def run_once(module: str) -> Dict:
+    env = dict(os.environ)
+    # Settings need these to exist; the values are never used during import
+    for key in ("OPENAI_API_KEY", "UNSPLASH_API_KEY"):
+        env.setdefault(key, "bench")
+    env["PYTHONWARNINGS"] = "ignore"
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="app.main", help="module to import")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    run_once(args.module)  # warm the filesystem and bytecode caches
+    runs: List[Dict] = [run_once(args.module) for _ in range(args.runs)]
+    import_ms = [run["import_ms"] for run in runs]
+    rss_mib = [run["rss_kib"] / 1024 for run in runs]
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms": {"median": round(statistics.median(import_ms), 1), "min": round(min(import_ms), 1)},
+        "rss_mib": {"median": round(statistics.median(rss_mib), 1)},
+        "modules_loaded": runs[-1]["modules"],
+        "heavy_loaded": runs[-1]["loaded"],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\n=== Startup cost of `import {args.module}` ({args.runs} runs) ===")
+    print(f"Import time:   median {report['import_ms']['median']:.0f}ms  min {report['import_ms']['min']:.0f}ms")
+    print(f"RSS:           median {report['rss_mib']['median']:.1f} MiB")
+    print(f"Modules:       {report['modules_loaded']}")
+    print(f"Heavy loaded:  {', '.join(report['heavy_loaded']) or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Local stand-ins for Unsplash, Pexels, OpenAI, Gemini and S3 used by the benchmarks.
+
+Everything runs on one aiohttp app in a background thread with its own event loop,
+so the stand-ins never compete with the code under test for the benchmark's loop.
+Each upstream gets its own latency/jitter/429 settings.
+"""
+import asyncio
+import io
+import json
+import random
+import re
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from aiohttp import web
+from PIL import Image
+
+from app.core.aws_sigv4 import verify as verify_sigv4
+
+@dataclass
+class UpstreamBehavior:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_429: float = 0.0
+    retry_after_s: float = 1.0
+    # Heavy tail: this fraction of requests takes tail_ms longer (slow replica, GC, queueing)
+    tail_rate: float = 0.0
+    tail_ms: float = 0.0
+
+    async def apply(self) -> Optional[web.Response]:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if self.tail_rate and random.random() < self.tail_rate:
+            delay += self.tail_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if self.rate_429 and random.random() < self.rate_429:
+            return web.json_response(
+                {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit"}},
+                status=429,
+                headers={"Retry-After": str(self.retry_after_s)}
+            )
+        return None
+
+@dataclass
+class FakeServerConfig:
+    search: UpstreamBehavior = field(default_factory=UpstreamBehavior)
+    images: UpstreamBehavior = field(default_factory=UpstreamBehavior)
+    openai: UpstreamBehavior = field(default_factory=UpstreamBehavior)
+    gemini: UpstreamBehavior = field(default_factory=UpstreamBehavior)
+    storage: UpstreamBehavior = field(default_factory=UpstreamBehavior)
+    image_size: Tuple[int, int] = (3000, 2000)
+    image_quality: int = 90
+    completion_tokens_per_image: int = 25
+
+S3_BUCKET = "bench"
+S3_REGION = "us-east-1"
+S3_ACCESS_KEY = "BENCHACCESSKEY"
+S3_SECRET_KEY = "bench-secret-key"
+
+_IMAGE_LINE = re.compile(r"^Image (\d+): (.+)$", re.MULTILINE)
+
+class FakeProviderServer:
+    def __init__(self, config: Optional[FakeServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeServerConfig()
+        self.host = host
+        self.port = port
+        self.request_counts: Dict[str, int] = {}
+        self._jpeg_cache: Dict[Tuple[int, int, int], bytes] = {}
+        self.s3_objects: Dict[str, bytes] = {}
+        self._s3_uploads: Dict[str, Dict[int, bytes]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def env(self) -> Dict[str, str]:
+        """Settings overrides that point every provider at this server."""
+        return {
+            "UNSPLASH_BASE_URL": f"{self.base_url}/unsplash",
+            "PEXELS_BASE_URL": f"{self.base_url}/pexels",
+            "OPENAI_BASE_URL": f"{self.base_url}/openai/v1",
+            "GEMINI_API_ENDPOINT": f"{self.base_url}/gemini",
+            "S3_ENDPOINT_URL": f"{self.base_url}/s3",
+            "S3_BUCKET": S3_BUCKET,
+            "S3_REGION": S3_REGION,
+            "S3_ACCESS_KEY_ID": S3_ACCESS_KEY,
+            "S3_SECRET_ACCESS_KEY": S3_SECRET_KEY,
+        }
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def start(self) -> "FakeProviderServer":
+        self._thread = threading.Thread(target=self._run, name="fake-provider-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=10)
+        return self
+
+    def stop(self) -> None:
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def __enter__(self) -> "FakeProviderServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self._build_app(), access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    def _build_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/unsplash/search/photos", self.unsplash_search)
+        app.router.add_get("/pexels/search", self.pexels_search)
+        app.router.add_get("/images/{image_id}.jpg", self.image)
+        app.router.add_post("/openai/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/gemini/{version}/models/{model}:generateContent", self.gemini_generate)
+        app.router.add_route("*", "/s3/{bucket}", self.s3_bucket)
+        app.router.add_route("*", "/s3/{bucket}/{key:.+}", self.s3_object)
+        return app
+
+    def _count(self, name: str) -> None:
+        self.request_counts[name] = self.request_counts.get(name, 0) + 1
+
+    # --- image search ------------------------------------------------------
+
+    def _image_url(self, image_id: str) -> str:
+        return f"{self.base_url}/images/{image_id}.jpg"
+
+    async def unsplash_search(self, request: web.Request) -> web.Response:
+        self._count("search")
+        rejected = await self.config.search.apply()
+        if rejected is not None:
+            return rejected
+
+        per_page = int(request.query.get("per_page", 10))
+        width, height = self.config.image_size
+        results = [{
+            "id": f"u{i}",
+            "description": f"Synthetic photo {i}",
+            "alt_description": f"synthetic photo {i}",
+            "urls": {"regular": self._image_url(f"u{i}"), "full": self._image_url(f"u{i}")},
+            "user": {"name": "Bench"},
+            "width": width,
+            "height": height
+        } for i in range(per_page)]
+        return web.json_response({"total": per_page, "results": results})
+
+    async def pexels_search(self, request: web.Request) -> web.Response:
+        self._count("search")
+        rejected = await self.config.search.apply()
+        if rejected is not None:
+            return rejected
+
+        per_page = int(request.query.get("per_page", 10))
+        width, height = self.config.image_size
+        photos = [{
+            "id": i,
+            "alt": f"Synthetic photo {i}",
+            "src": {"large": self._image_url(f"p{i}"), "original": self._image_url(f"p{i}")},
+            "photographer": "Bench",
+            "width": width,
+            "height": height
+        } for i in range(per_page)]
+        return web.json_response({"photos": photos})
+
+    def _synthetic_jpeg(self, seed: int) -> bytes:
+        width, height = self.config.image_size
+        key = (width, height, seed % 8)
+        if key not in self._jpeg_cache:
+            rng = random.Random(seed % 8)
+            # Gradient plus noise compresses like a photo rather than a flat fill
+            base = Image.linear_gradient("L").resize((width, height))
+            noise = Image.effect_noise((width, height), 40)
+            tint = tuple(rng.randint(40, 220) for _ in range(3))
+            img = Image.merge("RGB", [
+                Image.blend(base, noise, 0.3).point(lambda v, t=t: (v + t) % 256) for t in tint
+            ])
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=self.config.image_quality)
+            self._jpeg_cache[key] = buffer.getvalue()
+        return self._jpeg_cache[key]
+
+    async def image(self, request: web.Request) -> web.Response:
+        self._count("image")
+        rejected = await self.config.images.apply()
+        if rejected is not None:
+            return rejected
+
+        seed = sum(map(ord, request.match_info["image_id"]))
+        body = await asyncio.get_running_loop().run_in_executor(None, self._synthetic_jpeg, seed)
+        return web.Response(body=body, content_type="image/jpeg")
+
+    # --- vision models -----------------------------------------------------
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        self._count("openai")
+        payload = await request.json()
+        rejected = await self.config.openai.apply()
+        if rejected is not None:
+            return rejected
+
+        user_content = payload["messages"][-1]["content"]
+        if isinstance(user_content, str):
+            user_content = [{"type": "text", "text": user_content}]
+        text = "\n".join(part.get("text", "") for part in user_content if part.get("type") == "text")
+        image_count = sum(1 for part in user_content if part.get("type") == "image_url")
+        filenames = [name.strip() for _, name in _IMAGE_LINE.findall(text)] or [
+            f"image_{i + 1}.jpg" for i in range(image_count)
+        ]
+
+        scores = [random.randint(0, 10) for _ in range(image_count)]
+        if payload.get("response_format", {}).get("type") == "json_schema":
+            content = json.dumps({"ratings": [
+                {"i": i + 1, "s": score, "r": "Synthetic rating"} for i, score in enumerate(scores)
+            ]})
+        else:
+            content = "\n".join(
+                f"{filenames[i] if i < len(filenames) else f'image_{i + 1}.jpg'}: {score} - Synthetic rating"
+                for i, score in enumerate(scores)
+            )
+
+        prompt_tokens = len(json.dumps(payload["messages"][0])) // 4 + 85 * image_count
+        completion_tokens = self.config.completion_tokens_per_image * image_count
+        return web.json_response({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": 0}
+            }
+        })
+
+    async def gemini_generate(self, request: web.Request) -> web.Response:
+        self._count("gemini")
+        payload = await request.json()
+        rejected = await self.config.gemini.apply()
+        if rejected is not None:
+            return rejected
+
+        parts = payload.get("contents", [{}])[-1].get("parts", [])
+        image_count = sum(1 for part in parts if "inline_data" in part or "inlineData" in part)
+        if image_count:
+            text = json.dumps({"ratings": [
+                {"i": i + 1, "s": random.randint(0, 10), "r": "Synthetic rating"} for i in range(image_count)
+            ]})
+        else:
+            text = json.dumps([
+                {"url": f"{self.base_url}/images/insp{i}.jpg", "description": "Synthetic reference"} for i in range(5)
+            ])
+        return web.json_response({
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 100 + 258 * image_count, "candidatesTokenCount": 20 * max(image_count, 1)}
+        })
+
+    # --- object storage ----------------------------------------------------
+
+    def _s3_error(self, status: int, code: str) -> web.Response:
+        return web.Response(status=status, content_type="application/xml",
+                            text=f"<?xml version=\"1.0\"?><Error><Code>{code}</Code></Error>")
+
+    async def _s3_check(self, request: web.Request) -> Optional[web.Response]:
+        self._count("storage")
+        rejected = await self.config.storage.apply()
+        if rejected is not None:
+            return rejected
+        if request.match_info["bucket"] != S3_BUCKET:
+            return self._s3_error(404, "NoSuchBucket")
+        if not verify_sigv4(request.method, request.path, dict(request.query), request.headers,
+                            S3_SECRET_KEY, S3_REGION):
+            return self._s3_error(403, "SignatureDoesNotMatch")
+        return None
+
+    async def s3_bucket(self, request: web.Request) -> web.Response:
+        """ListObjectsV2, two keys per page so clients have to follow continuation tokens."""
+        rejected = await self._s3_check(request)
+        if rejected is not None:
+            return rejected
+        prefix = request.query.get("prefix", "")
+        keys = sorted(key for key in self.s3_objects if key.startswith(prefix))
+        start = int(request.query.get("continuation-token", 0))
+        page = keys[start:start + 2]
+        truncated = start + 2 < len(keys)
+        contents = "".join(f"<Contents><Key>{key}</Key><Size>{len(self.s3_objects[key])}</Size></Contents>"
+                           for key in page)
+        token = f"<NextContinuationToken>{start + 2}</NextContinuationToken>" if truncated else ""
+        return web.Response(content_type="application/xml", text=(
+            '<?xml version="1.0"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Prefix>{prefix}</Prefix><IsTruncated>{str(truncated).lower()}</IsTruncated>"
+            f"{token}{contents}</ListBucketResult>"
+        ))
+
+    async def s3_object(self, request: web.Request) -> web.Response:
+        rejected = await self._s3_check(request)
+        if rejected is not None:
+            return rejected
+        key, query = request.match_info["key"], request.query
+
+        if request.method == "POST" and "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            self._s3_uploads[upload_id] = {}
+            return web.Response(content_type="application/xml", text=(
+                f"<InitiateMultipartUploadResult><Key>{key}</Key>"
+                f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            ))
+        if "uploadId" in query:
+            parts = self._s3_uploads.get(query["uploadId"])
+            if parts is None:
+                return self._s3_error(404, "NoSuchUpload")
+            if request.method == "PUT":
+                body = await request.read()
+                parts[int(query["partNumber"])] = body
+                return web.Response(headers={"ETag": f'"{uuid.uuid4().hex}"'})
+            if request.method == "POST":
+                self.s3_objects[key] = b"".join(parts[number] for number in sorted(parts))
+                del self._s3_uploads[query["uploadId"]]
+                return web.Response(content_type="application/xml",
+                                    text=f"<CompleteMultipartUploadResult><Key>{key}</Key></CompleteMultipartUploadResult>")
+            if request.method == "DELETE":
+                del self._s3_uploads[query["uploadId"]]
+                return web.Response(status=204)
+
+        if request.method == "PUT":
+            self.s3_objects[key] = await request.read()
+            return web.Response(headers={"ETag": f'"{uuid.uuid4().hex}"'})
+        if request.method == "DELETE":
+            self.s3_objects.pop(key, None)
+            return web.Response(status=204)
+
+        body = self.s3_objects.get(key)
+        if body is None:
+            return self._s3_error(404, "NoSuchKey")
+        if request.method == "HEAD":
+            return web.Response(headers={"Content-Length": str(len(body))})
+        if request.http_range.start is not None or request.http_range.stop is not None:
+            chunk = body[request.http_range]
+            start = request.http_range.start or 0
+            return web.Response(status=206, body=chunk, headers={
+                "Content-Range": f"bytes {start}-{start + len(chunk) - 1}/{len(body)}"
+            })
+        return web.Response(body=body, content_type="application/octet-stream")
@@ -0,0 +1,38 @@
+"""Index existing ``data/results/<job_id>_analysis.json`` files into the results catalog.
+
+New analyses are recorded as they are saved; this is for results written before the
+catalog existed (or to rebuild it). Safe to re-run: each job's rows are replaced.
+Run from ``backend/``:
+
+    python -m scripts.backfill_results_catalog
+"""
+import argparse
+import time
+from pathlib import Path
+
+from app.services.results_catalog import ResultsCatalog
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results-dir", type=Path, help="defaults to data/results")
+    parser.add_argument("--db", type=Path, help="defaults to RESULTS_CATALOG_PATH")
+    args = parser.parse_args()
+
+    catalog = ResultsCatalog(args.db)
+    results_dir = args.results_dir or catalog.project_root / "data" / "results"
+
+    started = time.perf_counter()
+    files = sorted(results_dir.glob("*_analysis.json"))
+    indexed = ratings = 0
+    for results_file in files:
+        try:
+            ratings += catalog.backfill_file(results_file)
+            indexed += 1
+        except Exception as e:
+            print(f"Skipping {results_file.name}: {e}")
+
+    print(f"Indexed {ratings} ratings from {indexed}/{len(files)} result files into {catalog.db_path} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+
+# Settings() requires the API keys; tests never call the real APIs
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("UNSPLASH_API_KEY", "test")
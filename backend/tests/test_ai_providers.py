@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import get_settings
+from app.core.resilience import get_circuit_breaker
+from app.providers.ai_providers import (
+    AIProviderFactory, HedgedAIProvider, OpenAIProvider, RetryingBatchAIProvider, get_latency_window
+)
+from app.providers.prompt_compiler import PromptCompiler
+
+VALID = b"x" * 200
+
+def test_invalid_images_are_dropped_with_their_filenames():
+    compiled = PromptCompiler().compile("BRAND GUIDELINES:\nUse blue.", structured=True)
+    filenames = ["001_a.jpg", "002_b.jpg", "003_c.jpg"]
+    images, prompt, names = OpenAIProvider()._valid_inputs(
+        [VALID, b"", VALID], compiled.batch_tail(filenames), compiled, filenames
+    )
+    assert images == [VALID, VALID]
+    assert names == ["001_a.jpg", "003_c.jpg"]
+    # The model is told about the images it actually receives, in that order
+    assert prompt == compiled.batch_tail(["001_a.jpg", "003_c.jpg"])
+
+def test_all_valid_keeps_inputs_untouched():
+    compiled = PromptCompiler().compile("BRAND GUIDELINES:\nUse blue.", structured=True)
+    filenames = ["001_a.jpg", "002_b.jpg"]
+    tail = compiled.batch_tail(filenames)
+    assert OpenAIProvider()._valid_inputs([VALID, VALID], tail, compiled, filenames) == ([VALID, VALID], tail, filenames)
+
+class StubProvider(RetryingBatchAIProvider):
+    """Answers every batch after ``delay`` seconds, or fails it with a 503."""
+    MAX_RETRIES = 1
+
+    def __init__(self, name, delay, success=True):
+        self.name = name
+        self.delay = delay
+        self.success = success
+        self.calls = 0
+        self.cancelled = 0
+        self.payload_profile = None
+
+    async def _process_single_batch(self, images_base64, prompt, batch_num=None, compiled=None, filenames=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if not self.success:
+            return {'success': False, 'error': 'HTTP 503', 'status': 503, 'response': None}
+        return {'success': True, 'response': f"answer from {self.name}", 'usage': {}}
+
+@pytest.fixture
+def hedge(monkeypatch):
+    """A HedgedAIProvider over two stubs: ``hedge(primary_delay, secondary_delay, ...)``."""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "AI_HEDGE_PRIMARY", "stub-primary")
+    monkeypatch.setattr(settings, "AI_HEDGE_SECONDARY", "stub-secondary")
+    monkeypatch.setattr(settings, "AI_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "AI_HEDGE_PERCENTILE", 90)
+    monkeypatch.setattr(settings, "AI_HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+    get_latency_window.cache_clear()
+    get_circuit_breaker.cache_clear()
+
+    def build(primary_delay, secondary_delay, primary_success=True):
+        primary = StubProvider("stub-primary", primary_delay, primary_success)
+        secondary = StubProvider("stub-secondary", secondary_delay)
+        monkeypatch.setitem(AIProviderFactory._providers, "stub-primary", lambda: primary)
+        monkeypatch.setitem(AIProviderFactory._providers, "stub-secondary", lambda: secondary)
+        return HedgedAIProvider(), primary, secondary
+
+    yield build
+    get_latency_window.cache_clear()
+    get_circuit_breaker.cache_clear()
+
+def run_batch(provider):
+    async def main():
+        started = time.perf_counter()
+        result = await provider._run_batch([VALID], "prompt", 1)
+        return result, time.perf_counter() - started
+    return asyncio.run(main())
+
+def test_hedge_delay_follows_the_primary_latency_percentile(hedge):
+    provider, _, _ = hedge(0, 0)
+    window = get_latency_window("stub-primary")
+    for seconds in (1, 2, 3, 4):
+        window.add(seconds)
+    assert provider.hedge_delay() == 0.05
+
+    for seconds in range(5, 11):
+        window.add(seconds)
+    assert provider.hedge_delay() == 9
+
+def test_fast_primary_is_not_hedged(hedge):
+    provider, primary, secondary = hedge(0, 0)
+    result, _ = run_batch(provider)
+
+    assert result['provider'] == "stub-primary"
+    assert (primary.calls, secondary.calls) == (1, 0)
+    assert len(get_latency_window("stub-primary")) == 1
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled(hedge):
+    provider, primary, secondary = hedge(5, 0.01)
+    result, elapsed = run_batch(provider)
+
+    assert result['success'] and result['provider'] == "stub-secondary"
+    assert result['response'] == "answer from stub-secondary"
+    assert primary.cancelled == 1
+    assert elapsed < 1
+    # The cancelled attempt still counts towards the primary's latency window
+    assert len(get_latency_window("stub-primary")) == 1
+
+def test_failed_primary_fails_over_without_waiting_for_the_hedge(hedge, monkeypatch):
+    monkeypatch.setattr(get_settings(), "AI_HEDGE_DEFAULT_DELAY_SECONDS", 5)
+    provider, primary, secondary = hedge(0, 0, primary_success=False)
+    result, elapsed = run_batch(provider)
+
+    assert result['provider'] == "stub-secondary"
+    assert (primary.calls, secondary.calls) == (1, 1)
+    assert elapsed < 1
+
+def test_open_primary_circuit_fails_over_without_calling_it(hedge, monkeypatch):
+    monkeypatch.setattr(get_settings(), "AI_HEDGE_DEFAULT_DELAY_SECONDS", 5)
+    provider, primary, secondary = hedge(0, 0)
+    breaker = get_circuit_breaker("stub-primary")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    result, elapsed = run_batch(provider)
+
+    assert result['success'] and result['provider'] == "stub-secondary"
+    assert (primary.calls, secondary.calls) == (0, 1)
+    assert elapsed < 1
+
+def test_both_failing_returns_the_failure(hedge):
+    provider, primary, secondary = hedge(0, 0, primary_success=False)
+    secondary.success = False
+    result, _ = run_batch(provider)
+
+    assert not result['success']
+    assert 'provider' not in result
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import SingleFlight, TTLCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+def test_entries_expire(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=100)
+
+    clock[0] += 11
+    assert cache.get("a") is None
+    assert "a" not in cache
+    assert cache.get("b") == 2
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(ttl=10, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+def test_snapshot_round_trips_through_persist_path(clock, tmp_path):
+    path = tmp_path / "cache.json"
+    cache = TTLCache(ttl=10, persist_path=path)
+    cache.set("old", 1)
+    cache.set("new", {"score": 9})
+    cache.set("short", 3, ttl=1)
+    clock[0] += 2
+    cache.save()
+
+    restored = TTLCache(ttl=10, max_entries=1, persist_path=path)
+    assert restored.snapshot() == [["new", 1010.0, {"score": 9}]]
+
+def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    async def main():
+        flights = SingleFlight()
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("key", compute) for _ in range(5)))
+        return results, len(flights)
+
+    results, inflight = asyncio.run(main())
+    assert results == ["result"] * 5
+    assert calls == [1]
+    assert inflight == 0
+
+def test_follower_survives_leader_cancellation():
+    async def main():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "result"
+
+        leader = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("key", compute))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        result = await follower
+        return leader.cancelled(), result
+
+    leader_cancelled, result = asyncio.run(main())
+    assert leader_cancelled
+    assert result == "result"
+
+def test_work_is_cancelled_once_every_caller_is_gone():
+    async def main():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flights.do("key", compute)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return len(flights)
+
+    assert asyncio.run(main()) == 0
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    async def main():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(flights.do("key", fail), flights.do("key", fail), return_exceptions=True)
+
+        async def succeed():
+            return "ok"
+
+        return results, await flights.do("key", succeed)
+
+    results, retried = asyncio.run(main())
+    assert [str(error) for error in results] == ["boom", "boom"]
+    assert retried == "ok"
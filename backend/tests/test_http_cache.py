@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.core.http_cache import _parse_range, cached_file_response, file_etag
+
+def make_request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+def body(response):
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "001_a.jpg"
+    path.write_bytes(bytes(range(256)) * 4)
+    return path
+
+def test_parse_range_forms():
+    assert _parse_range("bytes=0-99", 1000) == (0, 99)
+    assert _parse_range("bytes=900-", 1000) == (900, 999)
+    assert _parse_range("bytes=-100", 1000) == (900, 999)
+    assert _parse_range("bytes=-5000", 1000) == (0, 999)
+    assert _parse_range("bytes=990-5000", 1000) == (990, 999)
+
+def test_parse_range_ignores_other_units_and_multiple_ranges():
+    assert _parse_range("items=0-5", 1000) is None
+    assert _parse_range("bytes=0-5,10-20", 1000) is None
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=500-100", "bytes=-0", "bytes=abc-", "bytes=0-x"])
+def test_parse_range_rejects_unsatisfiable_or_malformed(header):
+    with pytest.raises(ValueError):
+        _parse_range(header, 1000)
+
+def test_range_request_returns_partial_content(image):
+    response = cached_file_response(make_request(range="bytes=-10"), image)
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 1014-1023/1024"
+    assert response.headers["content-length"] == "10"
+    assert body(response) == image.read_bytes()[-10:]
+
+def test_open_ended_range(image):
+    response = cached_file_response(make_request(range="bytes=1000-"), image)
+
+    assert response.status_code == 206
+    assert body(response) == image.read_bytes()[1000:]
+
+def test_unsatisfiable_range_returns_416(image):
+    response = cached_file_response(make_request(range="bytes=2048-"), image)
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+def test_stale_if_range_serves_full_body(image):
+    response = cached_file_response(make_request(range="bytes=0-9", if_range='"stale"'), image)
+
+    assert response.status_code == 200
+
+def test_conditional_get(image):
+    etag = file_etag(image.stat())
+
+    assert cached_file_response(make_request(if_none_match=f'W/{etag}, "other"'), image).status_code == 304
+    assert cached_file_response(make_request(if_none_match='"other"'), image).status_code == 200
+    fresh = cached_file_response(make_request(), image)
+    assert fresh.headers["etag"] == etag
+    since = fresh.headers["last-modified"]
+    assert cached_file_response(make_request(if_modified_since=since), image).status_code == 304
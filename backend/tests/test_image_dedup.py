@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image_dedup import ImageDeduplicator, MultiIndexHash, dhash
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+@pytest.mark.parametrize("radius", [0, 1, 4, 10, 20])
+def test_radius_query_matches_brute_force(radius):
+    rng = random.Random(radius)
+    # Clusters of nearby hashes plus unrelated ones, so every distance band is hit
+    centres = [rng.getrandbits(64) for _ in range(20)]
+    hashes = [flip_bits(rng.choice(centres), rng.randint(0, 24), rng) for _ in range(400)]
+    hashes += [rng.getrandbits(64) for _ in range(100)]
+
+    index = MultiIndexHash(radius)
+    for item, value in enumerate(hashes):
+        index.add(value, item)
+    assert len(index) == len(hashes)
+
+    for query in centres + hashes[:50]:
+        expected = sorted((bin(query ^ value).count("1"), item) for item, value in enumerate(hashes)
+                          if bin(query ^ value).count("1") <= radius)
+        found = index.query(query)
+        assert sorted(found) == expected
+        assert [distance for distance, _ in found] == sorted(distance for distance, _ in found)
+
+def test_radius_larger_than_hash_width():
+    index = MultiIndexHash(radius=100)
+    index.add(0, "zero")
+    index.add((1 << 64) - 1, "ones")
+
+    assert sorted(item for _, item in index.query(0)) == ["ones", "zero"]
+
+def test_dhash_of_identical_thumbnails_is_identical():
+    pixels = np.random.default_rng(0).random((2, 8, 9)).astype(np.float32)
+    pixels[1] = pixels[0]
+
+    first, second = dhash(pixels)
+    assert first == second
+
+def test_find_duplicates_keeps_first_of_cluster(tmp_path):
+    gradient = np.tile(np.linspace(0, 255, 256, dtype=np.uint8), (256, 1))
+    paths = []
+    for name, array in [("001_a.jpg", gradient), ("002_b.jpg", gradient[:, ::-1]), ("003_c.jpg", gradient)]:
+        path = tmp_path / name
+        Image.fromarray(array).convert("RGB").save(path, quality=70 if name == "003_c.jpg" else 95)
+        paths.append(path)
+    paths.append(tmp_path / "missing.jpg")
+
+    duplicates = ImageDeduplicator(algorithm="dhash", max_distance=4).find_duplicates(paths)
+
+    assert duplicates == {"003_c.jpg": "001_a.jpg"}
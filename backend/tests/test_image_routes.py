@@ -0,0 +1,70 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from app.providers.storage_providers import MemoryStorageProvider
+from app.routes import images
+
+def jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (30, 90, 200)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+class PresigningStorage(MemoryStorageProvider):
+    """Memory storage that redirects like S3 does."""
+
+    def presigned_url(self, file_path):
+        return f"https://bucket.example/{file_path}?X-Amz-Signature=test"
+
+@pytest.fixture
+def storage(monkeypatch):
+    def use(storage):
+        monkeypatch.setattr(images, "get_storage_provider", lambda: storage)
+        monkeypatch.setattr(images, "_narrow_originals", images.TTLCache(ttl=60))
+        asyncio.run(storage.save_many([
+            ("images/job/wide.jpg", jpeg(1600, 1200)),
+            ("images/job/small.jpg", jpeg(300, 200)),
+        ]))
+        return storage
+    return use
+
+def get_image(filename, w=None):
+    return asyncio.run(images.get_image(None, "job", filename, w))
+
+def test_presigned_redirect_points_at_the_rendition(storage):
+    store = storage(PresigningStorage())
+    response = get_image("wide.jpg", w=480)
+    assert response.status_code == 307
+    assert response.headers["location"].startswith("https://bucket.example/renditions/job/480/wide.jpg?")
+    with Image.open(io.BytesIO(asyncio.run(store.get_file("renditions/job/480/wide.jpg")))) as img:
+        assert img.size == (480, 360)
+
+    # Originals (no w) and images narrower than w redirect to the original
+    assert get_image("wide.jpg").headers["location"].startswith("https://bucket.example/images/job/wide.jpg?")
+    assert get_image("small.jpg", w=480).headers["location"].startswith("https://bucket.example/images/job/small.jpg?")
+    assert not asyncio.run(store.exists("renditions/job/480/small.jpg"))
+
+def test_rendition_is_rendered_once(storage, monkeypatch):
+    storage(PresigningStorage())
+    calls = []
+    render = images._renditions.render
+    monkeypatch.setattr(images._renditions, "render", lambda content, w: calls.append(w) or render(content, w))
+    for _ in range(3):
+        get_image("wide.jpg", w=400)  # snapped to 480
+        get_image("small.jpg", w=400)
+    assert calls == [400, 400]
+
+def test_storage_without_urls_serves_rendition_bytes(storage):
+    storage(MemoryStorageProvider())
+    response = get_image("wide.jpg", w=640)
+    with Image.open(io.BytesIO(response.body)) as img:
+        assert img.width == 640
+    assert len(get_image("wide.jpg").body) > len(response.body)
+
+def test_missing_image_is_404(storage):
+    storage(MemoryStorageProvider())
+    with pytest.raises(images.HTTPException) as error:
+        get_image("missing.jpg", w=480)
+    assert error.value.status_code == 404
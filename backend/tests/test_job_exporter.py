@@ -0,0 +1,58 @@
+import asyncio
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from app.providers.storage_providers import MemoryStorageProvider
+from app.services import job_exporter
+from app.services.job_exporter import JobExporter
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture
+def exporter(monkeypatch):
+    monkeypatch.setattr(job_exporter, "get_storage_provider", MemoryStorageProvider)
+    exporter = JobExporter()
+    results = {"ratings": [{"filename": "001_a.jpg", "score": 9}, {"filename": "002_b.jpg", "score": 3}]}
+
+    async def seed():
+        await exporter.storage.save_many([
+            ("images/job/001_a.jpg", b"a" * 300_000),
+            ("images/job/002_b.jpg", b"b" * 10),
+            ("results/job_analysis.json", json.dumps(results).encode()),
+        ])
+    run(seed())
+    return exporter
+
+async def archive(exporter, job_id, archive_format, min_score=None):
+    entries = await exporter.collect_entries(job_id, min_score)
+    return b"".join([chunk async for chunk in exporter.stream(entries, archive_format)])
+
+def test_unknown_or_invalid_job(exporter):
+    assert run(exporter.collect_entries("missing")) is None
+    assert run(exporter.collect_entries("..")) is None
+
+def test_zip_export_reads_from_storage(exporter):
+    zipped = zipfile.ZipFile(io.BytesIO(run(archive(exporter, "job", "zip"))))
+    assert zipped.namelist() == ["job/images/001_a.jpg", "job/images/002_b.jpg", "job/job_analysis.json"]
+    assert zipped.testzip() is None
+    assert zipped.read("job/images/001_a.jpg") == b"a" * 300_000
+
+def test_tar_export_with_min_score(exporter):
+    tarred = tarfile.open(fileobj=io.BytesIO(run(archive(exporter, "job", "tar", min_score=5))))
+    assert [(member.name, member.size) for member in tarred.getmembers()] == [
+        ("job/images/001_a.jpg", 300_000), ("job/job_analysis.json", 91)
+    ]
+
+def test_objects_removed_after_listing_are_skipped(exporter):
+    async def scenario():
+        entries = await exporter.collect_entries("job")
+        await exporter.storage.delete_file("images/job/002_b.jpg")
+        return b"".join([chunk async for chunk in exporter.stream(entries, "zip")])
+
+    zipped = zipfile.ZipFile(io.BytesIO(run(scenario())))
+    assert "job/images/002_b.jpg" not in zipped.namelist()
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.core import jobs
+from app.core.cache import TTLCache
+from app.core.jobs import find_job, record_completed, start_job
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(jobs, "_jobs", TTLCache(ttl=60))
+
+async def work(job_id, finished):
+    try:
+        for step in range(100):
+            await asyncio.sleep(0.01)
+            finished.append(step)
+        return "done"
+    except asyncio.CancelledError:
+        record_completed(job_id, {"steps": len(finished)})
+        raise
+
+def test_deadline_cancels_the_job_with_reason_deadline():
+    async def main():
+        finished = []
+        control = start_job("job", work("job", finished), deadline_seconds=0.05)
+        with pytest.raises(asyncio.CancelledError):
+            await control.task
+        return control, finished
+
+    control, finished = asyncio.run(main())
+    assert control.reason == "deadline"
+    assert not control.running
+    assert control.completed == {"steps": len(finished)}
+    assert 0 < len(finished) < 100
+
+def test_cancel_records_reason_once():
+    async def main():
+        control = start_job("job", work("job", []))
+        await asyncio.sleep(0.02)
+        first = control.cancel()
+        second = control.cancel("deadline")
+        with pytest.raises(asyncio.CancelledError):
+            await control.task
+        return control, first, second, control.cancel()
+
+    control, first, second, after = asyncio.run(main())
+    assert (first, second, after) == (True, False, False)
+    assert control.reason == "cancelled"
+    assert find_job("job") is control
+
+def test_finishing_before_the_deadline_stops_the_timer():
+    async def main():
+        async def quick():
+            return "done"
+
+        control = start_job("job", quick(), deadline_seconds=0.02)
+        result = await control.task
+        await asyncio.sleep(0.05)
+        return control, result
+
+    control, result = asyncio.run(main())
+    assert result == "done"
+    assert control.reason is None
+    assert control.deadline_at is not None
@@ -0,0 +1,50 @@
+import asyncio
+import base64
+import json
+
+from app.providers.payload_builder import JsonBody, build_json_body, image_part, inline_image_part
+
+IMAGES = [base64.b64encode(bytes([n]) * (100 + n)) for n in range(3)]
+
+def openai_payload(parts):
+    return {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": "Guías de marca: \"azul\" \\ ñ\n"},
+            {"role": "user", "content": [{"type": "text", "text": "Image 1: a.jpg"}, *parts]},
+        ],
+        "max_tokens": 1000,
+        "temperature": 0.1,
+    }
+
+def test_spliced_body_decodes_equal_to_json_dumps():
+    body = build_json_body(openai_payload([image_part(i) for i in range(len(IMAGES))]), IMAGES)
+
+    expected = openai_payload([
+        {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64," + image.decode(), "detail": "low"}}
+        for image in IMAGES
+    ])
+    assert json.loads(body.to_bytes()) == json.loads(json.dumps(expected))
+    assert body.size == len(body.to_bytes())
+
+def test_inline_parts_without_data_url_and_repeated_refs():
+    payload = {"contents": [{"parts": [{"text": "hola"}, inline_image_part(2, "image/webp"), inline_image_part(0)]}]}
+    body = build_json_body(payload, IMAGES, data_url=False)
+
+    decoded = json.loads(body.to_bytes())
+    parts = decoded["contents"][0]["parts"]
+    assert parts[1] == {"inlineData": {"mimeType": "image/webp", "data": IMAGES[2].decode()}}
+    assert parts[2]["inlineData"]["data"] == IMAGES[0].decode()
+
+def test_images_are_referenced_not_copied():
+    body = build_json_body(openai_payload([image_part(0)]), IMAGES)
+
+    assert any(chunk is IMAGES[0] for chunk in body.chunks)
+
+def test_stream_yields_every_chunk():
+    body = JsonBody([b"{", b'"a":', b"1}"])
+
+    async def collect():
+        return [chunk async for chunk in body.stream()]
+
+    assert b"".join(asyncio.run(collect())) == b'{"a":1}'
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from app.providers.prompt_compiler import TASK_INSTRUCTIONS, TEXT_FORMAT_INSTRUCTIONS, PromptCompiler
+from app.providers.rating_schema import STRUCTURED_FORMAT_INSTRUCTIONS
+
+TEMPLATE = (Path(__file__).parent.parent / "prompts_images.txt").read_text()
+
+def render(filenames, pdf_content="Use the blue logo.\nNever red."):
+    # Same placeholders as ImageAnalyzer._create_batch_prompt
+    return TEMPLATE.format(
+        image_count=len(filenames),
+        pdf_content=pdf_content,
+        filenames_text="\n".join(f"- {name}" for name in filenames),
+        filename_example_1=filenames[0],
+        filename_example_2=filenames[1] if len(filenames) > 1 else "example2.jpg",
+    )
+
+def test_prefix_uses_template_task_and_format():
+    prefix = PromptCompiler().compile(render(["001_a.jpg", "002_b.jpg"])).prefix
+
+    assert prefix.startswith("BRAND GUIDELINES:\nUse the blue logo.\nNever red.\n\nTASK:")
+    assert "how well it complies with the brand guidelines" in prefix
+    assert "RATINGS:\n<filename>: [score] - [brief explanation]" in prefix
+    assert "001_a.jpg" not in prefix
+    assert "I am sending you" not in prefix
+    assert "IMAGES TO ANALYZE" not in prefix
+
+def test_prefix_is_byte_stable_across_jobs():
+    compiler = PromptCompiler()
+    first = compiler.compile(render(["001_a.jpg", "002_b.jpg"]))
+    second = compiler.compile(render(["zz.jpg"], pdf_content="Use the blue logo.  \r\nNever red.\r\n"))
+
+    assert first.prefix == second.prefix
+    assert first.prefix_hash == second.prefix_hash
+
+def test_structured_output_replaces_only_the_response_format():
+    prefix = PromptCompiler().compile(render(["001_a.jpg"]), structured=True).prefix
+
+    assert "how well it complies with the brand guidelines" in prefix
+    assert prefix.endswith(STRUCTURED_FORMAT_INSTRUCTIONS)
+    assert "[score]" not in prefix
+
+def test_guideline_headings_do_not_end_the_guidelines():
+    prefix = PromptCompiler().compile(render(["a.jpg"], pdf_content="Colours\nRESPONSE FORMAT of ads: square")).prefix
+
+    assert "RESPONSE FORMAT of ads: square\n\nTASK:" in prefix
+    assert prefix.count("RESPONSE FORMAT") == 2
+
+def test_missing_sections_fall_back_to_defaults():
+    prefix = PromptCompiler().compile("Rate these images for the blue brand.").prefix
+
+    assert prefix == f"BRAND GUIDELINES:\nRate these images for the blue brand.\n\n{TASK_INSTRUCTIONS}\n\n{TEXT_FORMAT_INSTRUCTIONS}"
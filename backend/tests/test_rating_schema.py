@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from app.providers.rating_schema import RatingValidationError, parse_structured_ratings
+
+FILENAMES = ["001_a.jpg", "002_b.jpg", "003_c.jpg"]
+
+def response(*entries):
+    return json.dumps({"ratings": [{"i": i, "s": s, "r": r} for i, s, r in entries]})
+
+def test_maps_indices_back_to_filenames_in_order():
+    ratings = parse_structured_ratings(response((3, 2, "off-brand"), (1, 9, "great"), (2, 0, "")), FILENAMES)
+    assert ratings == [
+        {"filename": "001_a.jpg", "score": 9, "explanation": "great"},
+        {"filename": "002_b.jpg", "score": 0, "explanation": ""},
+        {"filename": "003_c.jpg", "score": 2, "explanation": "off-brand"},
+    ]
+
+@pytest.mark.parametrize("content", ["", "not json", '{"ratings": [', None])
+def test_malformed_json(content):
+    with pytest.raises(RatingValidationError, match="not valid JSON"):
+        parse_structured_ratings(content, FILENAMES)
+
+@pytest.mark.parametrize("content", ["[]", '{"scores": []}', '{"ratings": {"i": 1}}'])
+def test_missing_ratings_array(content):
+    with pytest.raises(RatingValidationError, match="'ratings'"):
+        parse_structured_ratings(content, FILENAMES)
+
+def test_entry_that_is_not_an_object():
+    with pytest.raises(RatingValidationError, match="Invalid rating entry"):
+        parse_structured_ratings('{"ratings": [7]}', FILENAMES)
+
+@pytest.mark.parametrize("index", [0, 4, -1, "1", 1.0, True, None])
+def test_image_number_out_of_range(index):
+    content = json.dumps({"ratings": [{"i": index, "s": 5, "r": ""}]})
+    with pytest.raises(RatingValidationError, match="out of range"):
+        parse_structured_ratings(content, FILENAMES)
+
+@pytest.mark.parametrize("score", [-1, 11, 7.5, "8", True, None])
+def test_score_outside_0_to_10(score):
+    content = json.dumps({"ratings": [{"i": 1, "s": score, "r": ""}]})
+    with pytest.raises(RatingValidationError, match="Score out of range"):
+        parse_structured_ratings(content, FILENAMES)
+
+def test_duplicate_index():
+    with pytest.raises(RatingValidationError, match="more than once"):
+        parse_structured_ratings(response((1, 5, ""), (2, 5, ""), (1, 6, "")), FILENAMES)
+
+def test_missing_coverage_names_the_unrated_images():
+    with pytest.raises(RatingValidationError, match="Missing ratings for: 002_b.jpg, 003_c.jpg"):
+        parse_structured_ratings(response((1, 5, "")), FILENAMES)
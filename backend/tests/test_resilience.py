@@ -0,0 +1,150 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core import resilience
+from app.core.resilience import (
+    CircuitBreaker, CircuitOpenError, UpstreamError, call_with_retries, classify,
+    get_circuit_breaker, get_retry_budget, job_retry_budget, parse_retry_after
+)
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt, retry_after=None: 0)
+    get_circuit_breaker.cache_clear()
+    yield
+    get_circuit_breaker.cache_clear()
+
+def failing(*errors, result="ok"):
+    """An operation that raises ``errors`` in turn, then returns ``result``."""
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return operation, calls
+
+def test_classify_statuses():
+    assert classify(UpstreamError("bad request", status=400)) == (False, False)
+    assert classify(UpstreamError("slow down", status=429)) == (True, False)
+    assert classify(UpstreamError("unavailable", status=503)) == (True, True)
+    assert classify(asyncio.TimeoutError()) == (True, True)
+    assert classify(KeyError("choices")) == (False, False)
+
+def test_client_error_is_not_retried():
+    operation, calls = failing(UpstreamError("bad request", status=400))
+    with pytest.raises(UpstreamError):
+        asyncio.run(call_with_retries("test", operation, max_attempts=3))
+    assert len(calls) == 1
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_statuses_are_retried(status):
+    operation, calls = failing(UpstreamError("transient", status=status))
+    assert asyncio.run(call_with_retries("test", operation, max_attempts=3)) == "ok"
+    assert len(calls) == 2
+
+def test_gives_up_after_max_attempts():
+    operation, calls = failing(*[UpstreamError("unavailable", status=503)] * 5)
+    with pytest.raises(UpstreamError):
+        asyncio.run(call_with_retries("test", operation, max_attempts=3))
+    assert len(calls) == 3
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after("-3") == 0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=120), usegmt=True)
+    assert 100 < parse_retry_after(later) <= 120
+
+def test_retry_after_above_cap_gives_up():
+    cap = resilience.get_settings().RETRY_MAX_RETRY_AFTER_SECONDS
+    operation, calls = failing(UpstreamError("slow down", status=429, retry_after=cap + 1))
+    with pytest.raises(UpstreamError):
+        asyncio.run(call_with_retries("test", operation, max_attempts=3))
+    assert len(calls) == 1
+
+def test_retries_stop_when_job_budget_is_spent():
+    get_retry_budget("budget-job").limit = 2
+    errors = [UpstreamError("unavailable", status=503)] * 10
+
+    async def run_job():
+        with job_retry_budget("budget-job"):
+            first, first_calls = failing(*errors)
+            with pytest.raises(UpstreamError):
+                await call_with_retries("test", first, max_attempts=2)
+            second, second_calls = failing(*errors)
+            with pytest.raises(UpstreamError):
+                await call_with_retries("test", second, max_attempts=5)
+        return len(first_calls), len(second_calls)
+
+    # One retry in the first call, the last one in the second, then nothing left
+    assert asyncio.run(run_job()) == (2, 2)
+
+def test_breaker_opens_half_opens_with_one_probe_and_closes():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=30)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    breaker.opened_at -= 31
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # a single probe at a time
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    breaker.opened_at -= 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+def test_open_circuit_fails_fast():
+    breaker = get_circuit_breaker("test")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    operation, calls = failing()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_retries("test", operation, max_attempts=3))
+    assert calls == []
+
+def test_local_errors_do_not_close_the_circuit():
+    breaker = get_circuit_breaker("test")
+    breaker.failure_threshold = 3
+    breaker.record_failure()
+    breaker.record_failure()
+    operation, calls = failing(KeyError("choices"))
+    with pytest.raises(KeyError):
+        asyncio.run(call_with_retries("test", operation, max_attempts=3))
+    assert len(calls) == 1
+    assert breaker.failures == 2
+
+    # A half-open probe that hits a local bug leaves the circuit half-open for the next probe
+    breaker.record_failure()
+    breaker.opened_at -= breaker.reset_seconds + 1
+    operation, calls = failing(KeyError("choices"))
+    with pytest.raises(KeyError):
+        asyncio.run(call_with_retries("test", operation, max_attempts=3))
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+def test_client_error_counts_as_upstream_reachable():
+    breaker = get_circuit_breaker("test")
+    breaker.record_failure()
+    operation, _ = failing(UpstreamError("bad request", status=400))
+    with pytest.raises(UpstreamError):
+        asyncio.run(call_with_retries("test", operation, max_attempts=3))
+    assert breaker.failures == 0
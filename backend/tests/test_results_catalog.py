@@ -0,0 +1,70 @@
+import pytest
+
+from app.services.results_catalog import InvalidCursorError, ResultsCatalog
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ResultsCatalog(tmp_path / "catalog.db")
+
+def rating(filename, score, **extra):
+    return {"filename": filename, "score": score, **extra}
+
+def test_hedged_jobs_record_the_provider_of_each_rating(catalog):
+    catalog.record_analysis({"job_id": "job", "provider": "hedged", "analyzed_at": 1.0, "ratings": [
+        rating("a.jpg", 9, provider="openai"),
+        rating("b.jpg", 7, provider="gemini"),
+        rating("c.jpg", 2, estimated=True),
+    ]})
+    providers = {r["filename"]: r["provider"] for r in catalog.query()["ratings"]}
+    assert providers == {"a.jpg": "openai", "b.jpg": "gemini", "c.jpg": "hedged"}
+    assert [r["filename"] for r in catalog.query(provider="gemini")["ratings"]] == ["b.jpg"]
+
+def seed(catalog):
+    # Few distinct scores and timestamps, so every page boundary falls inside a tie
+    for job in range(3):
+        catalog.record_analysis({"job_id": f"job{job}", "guideline_hash": "g1" if job < 2 else "g2",
+                                 "analyzed_at": 1000.5 + job % 2, "ratings": [
+            rating(f"{n:03d}.jpg", n % 3 + 7, estimated=n % 5 == 0) for n in range(20)
+        ]})
+
+def pages(catalog, limit, **filters):
+    seen, cursor = [], None
+    while True:
+        page = catalog.query(limit=limit, cursor=cursor, **filters)
+        assert len(page["ratings"]) <= limit
+        seen.extend(page["ratings"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+@pytest.mark.parametrize("sort,column", [("score", "score"), ("recent", "analyzed_at")])
+@pytest.mark.parametrize("limit", [1, 7, 20, 60, 100])
+def test_cursor_pages_have_no_gaps_or_duplicates_across_ties(catalog, sort, column, limit):
+    seed(catalog)
+    walked = pages(catalog, limit, sort=sort)
+
+    ids = [r["id"] for r in walked]
+    assert len(ids) == len(set(ids)) == 60
+    assert [(r[column], r["id"]) for r in walked] == sorted(((r[column], r["id"]) for r in walked), reverse=True)
+
+def test_cursor_pages_respect_filters(catalog):
+    seed(catalog)
+    walked = pages(catalog, 4, guideline_hash="g1", min_score=8, include_estimated=False)
+
+    expected = catalog.query(guideline_hash="g1", min_score=8, include_estimated=False, limit=1000)["ratings"]
+    assert walked == expected
+    assert all(r["guideline_hash"] == "g1" and r["score"] >= 8 and not r["estimated"] for r in walked)
+
+def test_invalid_cursor_is_rejected(catalog):
+    with pytest.raises(InvalidCursorError):
+        catalog.query(cursor="not-a-cursor")
+    with pytest.raises(InvalidCursorError):
+        catalog.query(sort="score", cursor="1.5:3")
+
+def test_rerecording_replaces_and_delete_removes_a_job(catalog):
+    seed(catalog)
+    catalog.record_analysis({"job_id": "job0", "ratings": [rating("a.jpg", 5)]})
+
+    assert [r["filename"] for r in catalog.query(job_id="job0")["ratings"]] == ["a.jpg"]
+    assert catalog.delete_job("job0") == 1
+    assert catalog.query(job_id="job0")["ratings"] == []
@@ -0,0 +1,116 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from app.core.config import get_settings
+from app.core.http_client import close_http_session
+from app.providers.storage_providers import MemoryStorageProvider, S3Error, S3StorageProvider
+from benchmarks.fake_servers import FakeProviderServer
+
+def run(coro):
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await close_http_session()
+    return asyncio.run(wrapper())
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeProviderServer() as server:
+        yield server
+
+@pytest.fixture
+def s3_env(server, monkeypatch):
+    def apply(**overrides):
+        for name, value in {**server.env(), **overrides}.items():
+            monkeypatch.setenv(name, str(value))
+        get_settings.cache_clear()
+    apply()
+    yield apply
+    get_settings.cache_clear()
+
+async def exercise_basic_operations(storage):
+    await storage.save_file("images/job/b.jpg", b"bbb")
+    await storage.save_many([("images/job/a.jpg", b"aaaa"), ("images/other/c.jpg", b"c")])
+
+    assert await storage.get_file("images/job/a.jpg") == b"aaaa"
+    assert await storage.exists("images/job/b.jpg")
+    assert not await storage.exists("images/job/missing.jpg")
+    assert await storage.list_files("images/job") == ["images/job/a.jpg", "images/job/b.jpg"]
+    assert await storage.get_many(["images/job/a.jpg", "images/job/missing.jpg"]) == {
+        "images/job/a.jpg": b"aaaa", "images/job/missing.jpg": None
+    }
+    assert await storage.get_range("images/job/a.jpg", 1, 2) == b"aa"
+    with pytest.raises(FileNotFoundError):
+        await storage.get_file("images/job/missing.jpg")
+    with pytest.raises(ValueError):
+        await storage.get_file("../etc/passwd")
+
+    async with storage.local_files(["images/job/a.jpg", "images/job/missing.jpg"]) as local:
+        assert list(local) == ["images/job/a.jpg"]
+        assert local["images/job/a.jpg"].read_bytes() == b"aaaa"
+    assert not local["images/job/a.jpg"].exists()
+
+    assert await storage.delete_file("images/job/b.jpg")
+    assert await storage.list_files("images/job") == ["images/job/a.jpg"]
+
+def test_memory_provider():
+    run(exercise_basic_operations(MemoryStorageProvider()))
+
+def test_s3_provider_round_trip(server, s3_env):
+    run(exercise_basic_operations(S3StorageProvider()))
+
+def test_s3_list_follows_continuation_tokens(server, s3_env):
+    storage = S3StorageProvider()
+    keys = [f"results/page/{i}.json" for i in range(5)]
+
+    async def scenario():
+        await storage.save_many((key, b"{}") for key in keys)
+        return await storage.list_files("results/page")
+
+    # The stand-in returns two keys per page
+    assert run(scenario()) == keys
+
+def test_s3_multipart_upload(server, s3_env, tmp_path):
+    s3_env(S3_MULTIPART_THRESHOLD_MB=1, S3_MULTIPART_PART_SIZE_MB=5)
+    storage = S3StorageProvider()
+    content = bytes(range(256)) * (11 * 1024 * 1024 // 256)  # three 5 MB parts
+    source = tmp_path / "guideline.pdf"
+    source.write_bytes(content)
+
+    async def scenario():
+        await storage.save_file("uploads/in-memory.pdf", content)
+        await storage.import_file("uploads/from-disk.pdf", source)
+        return await storage.get_file("uploads/in-memory.pdf"), await storage.get_file("uploads/from-disk.pdf")
+
+    before = server.request_counts.get("storage", 0)
+    assert run(scenario()) == (content, content)
+    # initiate + 3 parts + complete, twice, plus the two reads
+    assert server.request_counts["storage"] - before == 12
+    assert source.exists()  # only the local backend moves the source
+
+def test_s3_presigned_url(server, s3_env):
+    storage = S3StorageProvider()
+
+    async def scenario():
+        await storage.save_file("images/job/shared.jpg", b"jpeg bytes")
+        session = aiohttp.ClientSession()
+        try:
+            async with session.get(storage.presigned_url("images/job/shared.jpg")) as response:
+                good = response.status, await response.read()
+            tampered = storage.presigned_url("images/job/shared.jpg").replace("shared", "other")
+            async with session.get(tampered) as response:
+                bad = response.status
+        finally:
+            await session.close()
+        return good, bad
+
+    assert run(scenario()) == ((200, b"jpeg bytes"), 403)
+
+def test_s3_rejects_wrong_credentials(server, s3_env):
+    s3_env(S3_SECRET_ACCESS_KEY="not-the-secret")
+    with pytest.raises(S3Error) as error:
+        run(S3StorageProvider().save_file("images/job/a.jpg", b"a"))
+    assert error.value.status == 403
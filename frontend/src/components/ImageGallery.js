@@ -45,7 +45,7 @@ const ImageGallery = ({ images, jobId }) => {
                 <CardMedia
                   component="img"
                   height="200"
-                  image={`http://localhost:8000/api/image/${encodeURIComponent(jobId)}/${encodeURIComponent(image.filename)}`}
+                  image={`http://localhost:8000/api/image/${encodeURIComponent(jobId)}/${encodeURIComponent(image.filename)}?w=480`}
                   alt={image.description || `Image ${index + 1}`}
                   sx={{
                     objectFit: 'cover',
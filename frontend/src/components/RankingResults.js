@@ -114,7 +114,7 @@ const RankingResults = ({ ratings, jobId }) => {
                   <CardMedia
                     component="img"
                     height="240"
-                    image={`http://localhost:8000/api/image/${encodeURIComponent(jobId)}/${encodeURIComponent(rating.filename)}`}
+                    image={`http://localhost:8000/api/image/${encodeURIComponent(jobId)}/${encodeURIComponent(rating.filename)}?w=480`}
                     alt={rating.filename}
                     sx={{
                       objectFit: 'cover',
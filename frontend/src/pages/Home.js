@@ -529,10 +529,12 @@ const Home = () => {
     
     try {
       let guidelinePath;
+      let guidelineName;
       
       const defaultGuideline = guidelines.find(g => g.isDefault);
       if (defaultGuideline) {
         guidelinePath = defaultGuideline.path;
+        guidelineName = defaultGuideline.name;
         setProgress(20);
       } else {
         setProgressMessage('Uploading guidelines...');
@@ -541,6 +543,7 @@ const Home = () => {
         formData.append('file', guidelines[0].file);
         const uploadResponse = await api.uploadGuideline(formData);
         guidelinePath = uploadResponse.file_path;
+        guidelineName = uploadResponse.filename;
         setProgress(20);
       }
 
@@ -582,12 +585,22 @@ const Home = () => {
           setProgressMessage('Images downloaded! Starting AI analysis...');
           
           setTimeout(() => {
-            startImageAnalysis(response.job_id, guidelinePath);
+            startImageAnalysis(response.job_id, guidelinePath, guidelineName);
           }, 1000);
         } 
         else if (data.status === 'analyzing') {
           setProgress(70 + (data.progress * 0.3));
           setProgressMessage(`Analyzing with AI... ${data.progress}%`);
+
+          if (data.partial_ratings && data.partial_ratings.length > 0) {
+            setImageRatings(prevRatings => {
+              const ratingsMap = new Map(prevRatings);
+              data.partial_ratings.forEach(rating => {
+                ratingsMap.set(rating.filename, rating);
+              });
+              return ratingsMap;
+            });
+          }
         }
         else if (data.status === 'completed' && data.result && data.result.ratings) {
           // Cambio: guardar ratings completos con explanation
@@ -653,11 +666,12 @@ const Home = () => {
     }
   };
 
-  const startImageAnalysis = async (jobId, guidelinePath) => {
+  const startImageAnalysis = async (jobId, guidelinePath, guidelineName) => {
     try {
       await api.analyzeImages({
         job_id: jobId,
-        guideline_path: guidelinePath
+        guideline_path: guidelinePath,
+        guideline_name: guidelineName
       });
     } catch (error) {
       console.error('Error starting analysis:', error);
@@ -1286,7 +1300,7 @@ const Home = () => {
                           <CardMedia
                             component="img"
                             height="260"
-                            image={`http://localhost:8000/api/image/${encodeURIComponent(currentJobId)}/${encodeURIComponent(image.filename)}`}
+                            image={`http://localhost:8000/api/image/${encodeURIComponent(currentJobId)}/${encodeURIComponent(image.filename)}?w=640`}
                             alt={image.description}
                           />
                           